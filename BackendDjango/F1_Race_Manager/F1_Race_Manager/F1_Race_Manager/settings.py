@@ -206,3 +206,80 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+
+# Cache
+# LocMemCache évince les entrées les moins récemment utilisées au-delà de MAX_ENTRIES
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'incidents': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'incident-predictions',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+}
+
+# Prédicteur IA d'incidents
+# Backend d'inférence : 'keras' (TensorFlow) ou 'numpy' (sans TensorFlow)
+INCIDENT_PREDICTOR_BACKEND = os.environ.get('F1_PREDICTOR_BACKEND', 'keras')
+
+# Précision des poids du backend numpy : float32, float16 ou int8 (manage.py bench_quantization)
+INCIDENT_PREDICTOR_PRECISION = os.environ.get('F1_PREDICTOR_PRECISION', 'float32')
+
+# Backend numpy servi depuis un fichier mmap en lecture seule, partagé par tous les workers
+# (manage.py export_shared_weights, mesure: manage.py bench_shared_memory)
+INCIDENT_PREDICTOR_SHARED = os.environ.get('F1_PREDICTOR_SHARED', '0') == '1'
+# Dossier de ces fichiers (un par version et précision), jamais le dossier des poids source
+INCIDENT_PREDICTOR_SHARED_DIR = os.environ.get('F1_PREDICTOR_SHARED_DIR', os.path.join(BASE_DIR, 'shared_weights'))
+
+# Chargé au premier usage ; F1_PREDICTOR_WARMUP=1 le préchauffe en arrière-plan au démarrage
+INCIDENT_PREDICTOR_WARMUP = os.environ.get('F1_PREDICTOR_WARMUP', '0') == '1'
+
+# Fenêtre de micro-batching entre requêtes concurrentes
+INCIDENT_BATCH_WINDOW_MS = 5
+INCIDENT_BATCH_MAX_ROWS = 64
+
+# Registre versionné des modèles (manage.py model_registry) ; vérification du pointeur ACTIVE
+INCIDENT_MODEL_REGISTRY_DIR = os.path.join(BASE_DIR, 'model_registry')
+INCIDENT_MODEL_POLL_SECONDS = 2
+
+# Stockage colonnaire mmap des temps au tour (manage.py build_lapstore)
+INCIDENT_LAPSTORE_DIR = os.path.join(BASE_DIR, 'lapstore')
+
+# Cache des prédictions par course (durée de vie en secondes)
+INCIDENT_CACHE_ALIAS = 'incidents'
+INCIDENT_CACHE_TTL = 300
+
+# Réponse expirée encore servie pendant ce délai, le temps qu'un seul appel la recalcule
+INCIDENT_CACHE_STALE_SECONDS = 60
+
+# Verrou de calcul partagé entre workers par le cache (cache commun requis : Redis, Memcached, base)
+INCIDENT_CACHE_LOCKS = os.environ.get('F1_CACHE_LOCKS', '0') == '1'
+INCIDENT_CACHE_LOCK_TIMEOUT = 10
+
+# Session en direct (live/race/<id>/...) retirée après cette durée sans nouveau tour
+INCIDENT_LIVE_IDLE_SECONDS = 1800
+
+# Points maximum d'un balayage de scénarios (produit des tailles des axes, une passe du modèle)
+INCIDENT_SCENARIO_MAX_POINTS = 2048
+
+# Prédiction en masse (POST predict/bulk/) : items par requête et lignes par passe du modèle
+INCIDENT_BULK_MAX_ITEMS = 10000
+INCIDENT_BULK_CHUNK_ROWS = 256
+
+# Vues asynchrones (async/...) : threads d'inférence, tâches admises avant 503, attente d'une place
+INCIDENT_ASYNC_INFERENCE_THREADS = 8
+INCIDENT_ASYNC_MAX_PENDING = 64
+INCIDENT_ASYNC_QUEUE_TIMEOUT_MS = 100
+
+# Serveur d'inférence hors processus (manage.py run_inference_server) : les vues l'utilisent
+# si le socket répond, sinon inférence locale. Vide = toujours local
+INCIDENT_INFERENCE_SOCKET = os.environ.get('F1_INFERENCE_SOCKET', '')
+INCIDENT_INFERENCE_WORKERS = int(os.environ.get('F1_INFERENCE_WORKERS', '2'))
+INCIDENT_INFERENCE_POOL_SIZE = 8
+INCIDENT_INFERENCE_TIMEOUT = 5
+INCIDENT_INFERENCE_RETRY_SECONDS = 5
+# Au plus un avertissement par type (injoignable, repli local) sur cette période
+INCIDENT_INFERENCE_LOG_INTERVAL = 60
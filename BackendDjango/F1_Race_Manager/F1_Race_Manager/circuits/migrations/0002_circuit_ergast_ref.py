@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuits', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='circuit',
+            name='ergast_ref',
+            field=models.CharField(blank=True, help_text='circuitRef Ergast (ex: monza)', max_length=100, null=True, unique=True, verbose_name='Référence Ergast'),
+        ),
+    ]
@@ -61,6 +61,14 @@ class Circuit(models.Model):
         verbose_name="Circuit actif",
         help_text="Indique si le circuit est utilisé cette saison"
     )
+    ergast_ref = models.CharField(
+        max_length=100,
+        unique=True,
+        blank=True,
+        null=True,
+        verbose_name="Référence Ergast",
+        help_text="circuitRef Ergast (ex: monza)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
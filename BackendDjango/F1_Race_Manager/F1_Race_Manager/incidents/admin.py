@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import IncidentPrediction, IncidentRiskRollup
 
-# Register your models here.
+@admin.register(IncidentPrediction)
+class IncidentPredictionAdmin(admin.ModelAdmin):
+    list_display = ['race', 'pilot', 'model_version', 'risque_total', 'risk_level', 'created_at']
+    list_filter = ['model_version', 'risk_level', 'race__season']
+    search_fields = ['pilot__nom', 'race__nom']
+    list_select_related = ['race', 'pilot']
+
+
+@admin.register(IncidentRiskRollup)
+class IncidentRiskRollupAdmin(admin.ModelAdmin):
+    list_display = ['circuit', 'constructor', 'season', 'model_version', 'n_predictions', 'mean_risque_total', 'max_risque_total']
+    list_filter = ['model_version', 'season']
+    search_fields = ['circuit__nom', 'constructor']
+    list_select_related = ['circuit', 'season']
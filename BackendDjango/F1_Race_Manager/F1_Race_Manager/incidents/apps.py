@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class IncidentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "incidents"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Poids partagés : fichier mmap exporté une seule fois avant le fork des workers
+        if getattr(settings, 'INCIDENT_PREDICTOR_SHARED', False):
+            from . import loader
+            loader.prepare_shared()
+
+        # Préchauffage optionnel en arrière-plan (workers web uniquement)
+        if getattr(settings, 'INCIDENT_PREDICTOR_WARMUP', False):
+            from . import loader
+            loader.warm_up(background=True)
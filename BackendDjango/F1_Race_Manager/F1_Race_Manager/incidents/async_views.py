@@ -0,0 +1,208 @@
+# incidents/async_views.py
+
+"""
+Variantes asynchrones de predict_race_incidents, predict_pilot_risk et health_check
+
+Servies par asgi.py : les données sont lues par l'ORM asynchrone et le
+travail bloquant (passe avant via le micro-batcher) part dans
+l'exécuteur borné ; au-delà de INCIDENT_ASYNC_MAX_PENDING la réponse est 503.
+"""
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from pilots.models import Pilote
+from races.models import Race
+
+from . import inference_client, loader, prediction_cache
+from .features import apilot_results, apilot_rows, arace_rows
+from .inference_executor import Saturated, get_executor
+from .ml import metrics
+from .models import IncidentPrediction
+from .views import (
+    _compute_race_predictions, _generate_smart_risks, _health_info, _pilot_payload,
+    _prediction_entry, _race_payload, pilot_flight, race_flight,
+)
+
+
+def _saturated(e):
+    response = JsonResponse({'error': f'Serveur saturé: {e}'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+async def _aget_serving():
+    """
+    loader.get_serving sans bloquer la boucle
+
+    Serveur d'inférence connecté : sa version en mémoire (infos relues en
+    arrière-plan). Sinon chargement du modèle ou connexion au serveur dans
+    un thread, sauf modèle local déjà prêt sans serveur configuré.
+    """
+    remote = inference_client.current()
+    if remote is not None:
+        inference_client.refresh_in_background()
+        return remote
+    if not getattr(settings, 'INCIDENT_INFERENCE_SOCKET', '') and loader.predictor_status()['state'] == loader.READY:
+        return loader.get_serving()
+    return await sync_to_async(loader.get_serving, thread_sensitive=False)()
+
+
+async def _ascore(serving, rows):
+    """Risques des lignes (micro-batcher dans l'exécuteur borné), None si le modèle échoue"""
+    if serving is None:
+        return None
+    try:
+        return await get_executor().run(serving.batcher.submit, rows)
+    except Saturated:
+        raise
+    except Exception:
+        return None
+
+
+async def predict_race_incidents(request, race_id):
+    """predict_race_incidents asynchrone (même réponse, mêmes caches)"""
+    start = time.perf_counter()
+    source = 'error'
+    try:
+        (payload, source), shared = await race_flight.ado(race_id, lambda: _arace_response(race_id))
+        if shared:
+            source = 'coalesced'
+        return JsonResponse(payload)
+    except Race.DoesNotExist:
+        return JsonResponse({'error': f'Course {race_id} introuvable'}, status=404)
+    except Saturated as e:
+        return _saturated(e)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    finally:
+        metrics.observe_request('predict_race_async', source, time.perf_counter() - start)
+
+
+async def _arace_response(race_id):
+    """views._race_response par l'ORM asynchrone : (payload, source)"""
+    with metrics.stage('db_fetch'):
+        race = await Race.objects.select_related('season', 'circuit').aget(id=race_id)
+    serving = await _aget_serving()
+    predictor = serving.predictor if serving is not None else None
+
+    if predictor is None:
+        payload, _ = await sync_to_async(_compute_race_predictions)(race, serving)
+        return payload, 'fallback'
+
+    model_version = predictor.get_info()['version']
+    with metrics.stage('db_fetch'):
+        fingerprint = await prediction_cache.arace_fingerprint(race)
+    with metrics.stage('cache_lookup'):
+        cached, stale = await prediction_cache.aget_race_prediction(race.id, model_version, fingerprint)
+    if cached is not None and not stale:
+        return cached, 'cache'
+
+    locked = await prediction_cache.alock_race(race.id, model_version, fingerprint)
+    if not locked:
+        if cached is not None:
+            return cached, 'stale'
+        with metrics.stage('cache_lookup'):
+            published = await prediction_cache.await_race_prediction(race.id, model_version, fingerprint)
+        if published is not None:
+            return published, 'coalesced'
+
+    try:
+        with metrics.stage('stored_lookup'):
+            stored = [
+                p async for p in IncidentPrediction.objects
+                .filter(race_id=race.id, model_version=model_version, fingerprint=fingerprint)
+                .select_related('pilot')
+            ]
+        if stored:
+            with metrics.stage('response_build'):
+                payload = _race_payload(race, predictor, [_prediction_entry(p.pilot, p.risks()) for p in stored])
+            await prediction_cache.aset_race_prediction(race.id, model_version, fingerprint, payload)
+            return payload, 'stored'
+
+        with metrics.stage('db_fetch'):
+            results = [r async for r in race.results.select_related('pilot')]
+        if not results:
+            # Course sans résultats : même repli que la vue synchrone
+            payload, _ = await sync_to_async(_compute_race_predictions)(race, serving)
+            return payload, 'fallback'
+
+        rows = await arace_rows(race, results, predictor.get_info()['seq_length'])
+        all_risks = await _ascore(serving, rows)
+        ai_scored = all_risks is not None
+        if not ai_scored:
+            all_risks = [_generate_smart_risks(row[3]['grid_position']) for row in rows]
+
+        with metrics.stage('response_build'):
+            payload = _race_payload(
+                race, predictor, [_prediction_entry(result.pilot, risks) for result, risks in zip(results, all_risks)]
+            )
+        if ai_scored:
+            await prediction_cache.aset_race_prediction(race.id, model_version, fingerprint, payload)
+        return payload, 'live' if ai_scored else 'fallback'
+    finally:
+        if locked:
+            await prediction_cache.aunlock_race(race.id, model_version, fingerprint)
+
+
+async def predict_pilot_risk(request, pilot_id):
+    """predict_pilot_risk asynchrone (?race_id= ou ?season=)"""
+    start = time.perf_counter()
+    source = 'error'
+    try:
+        try:
+            race_id = int(request.GET['race_id']) if request.GET.get('race_id') else None
+            season = int(request.GET['season']) if request.GET.get('season') else None
+        except ValueError:
+            return JsonResponse({'error': 'race_id et season doivent être numériques'}, status=400)
+        if race_id is None and season is None:
+            return JsonResponse({'error': 'race_id ou season requis'}, status=400)
+
+        key = (pilot_id, race_id, season)
+        (payload, code, source), shared = await pilot_flight.ado(key, lambda: _apilot_response(pilot_id, race_id, season))
+        if shared:
+            source = 'coalesced'
+        return JsonResponse(payload, status=code)
+    except Pilote.DoesNotExist:
+        return JsonResponse({'error': f'Pilote {pilot_id} introuvable'}, status=404)
+    except Saturated as e:
+        return _saturated(e)
+    finally:
+        metrics.observe_request('predict_pilot_async', source, time.perf_counter() - start)
+
+
+async def _apilot_response(pilot_id, race_id, season):
+    """views._pilot_response par l'ORM asynchrone : (payload, statut HTTP, source)"""
+    with metrics.stage('db_fetch'):
+        pilot = await Pilote.objects.aget(id=pilot_id)
+        results = await apilot_results(pilot.id, race_id=race_id, season=season)
+    if not results:
+        scope = f'la course {race_id}' if race_id is not None else f'la saison {season}'
+        return {'error': f'Aucun résultat du pilote {pilot_id} pour {scope}'}, 404, 'error'
+
+    serving = await _aget_serving()
+    predictor = serving.predictor if serving is not None else None
+    seq_length = predictor.get_info()['seq_length'] if predictor is not None else 10
+    rows = await apilot_rows(pilot, results, seq_length)
+
+    all_risks = await _ascore(serving, rows)
+    source = 'live' if all_risks is not None else 'fallback'
+    if all_risks is None:
+        all_risks = [_generate_smart_risks(row[3]['grid_position']) for row in rows]
+
+    with metrics.stage('response_build'):
+        payload = _pilot_payload(pilot, results, all_risks, predictor)
+        if race_id is not None:
+            payload.update({k: payload['timeline'][0][k] for k in ('race_id', 'race_name', 'risks')})
+        payload['season'] = season
+    return payload, 200, source
+
+
+async def health_check(request):
+    """health_check asynchrone, avec l'état de l'exécuteur d'inférence"""
+    info = _health_info()
+    info['executor'] = get_executor().get_stats()
+    return JsonResponse(info, json_dumps_params={'ensure_ascii': False})
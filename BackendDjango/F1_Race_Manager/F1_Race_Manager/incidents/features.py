@@ -0,0 +1,423 @@
+# incidents/features.py
+
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, F, Max, OuterRef, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils.text import slugify
+
+from races.models import LapTime, PitStop, RaceResult
+
+from .ml import metrics
+from .ml.lapstore import MANIFEST, LapStore
+
+_lap_store = None
+_lap_store_mtime = None
+
+# Conversion des modèles Django en entrées du prédicteur
+
+
+def _ref(name):
+    """Nom libre -> référence de style Ergast ('Red Bull' -> 'red_bull')"""
+    return slugify(name or '').replace('-', '_') or 'unknown'
+
+
+def pilot_features(driver):
+    """pilot_data attendu par F1IncidentPredictor.predict (références Ergast du vocabulaire)"""
+    return {
+        'code': getattr(driver, 'ergast_ref', None) or 'UNK',
+        # constructorRef importé ('haas'), sinon dérivé du nom saisi à la main
+        'team_slug': getattr(driver, 'equipe_ref', None) or _ref(driver.equipe)
+    }
+
+
+def grid_position(result):
+    """
+    grid_position d'un RaceResult pour le modèle, commune à tous les constructeurs de lignes
+
+    Sans grille connue (ou départ des stands, grille 0) : rang d'arrivée,
+    sinon 10 ; une même (course, pilote) donne ainsi la même ligne partout.
+    """
+    return result.grid_position or result.position or 10
+
+
+def circuit_features(race):
+    """circuit_data attendu par F1IncidentPredictor.predict"""
+    return {
+        'slug': getattr(race.circuit, 'ergast_ref', None) or 'unknown'
+    }
+
+
+def get_lap_store():
+    """LapStore de INCIDENT_LAPSTORE_DIR, rechargé quand son manifest change (None si absent)"""
+    global _lap_store, _lap_store_mtime
+
+    path = getattr(settings, 'INCIDENT_LAPSTORE_DIR', None)
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(os.path.join(path, MANIFEST))
+    except OSError:
+        return None
+
+    if _lap_store is None or mtime != _lap_store_mtime:
+        _lap_store = LapStore(path)
+        _lap_store_mtime = mtime
+    return _lap_store
+
+
+def lap_fingerprints(race_ids=None):
+    """Empreinte des temps au tour de chaque course (nombre, dernier id) en une requête"""
+    queryset = LapTime.objects.all()
+    if race_ids is not None:
+        queryset = queryset.filter(race_id__in=race_ids)
+    return {
+        race_id: f'{n}:{last}'
+        for race_id, n, last in (
+            queryset.values('race_id').annotate(n=Count('id'), last=Max('id')).values_list('race_id', 'n', 'last')
+        )
+    }
+
+
+def race_lap_windows(race_id, n_laps, use_store=False):
+    """
+    Derniers n_laps temps au tour de chaque pilote d'une course, en une requête
+
+    Avec use_store (courses terminées), lus depuis le LapStore mmap si la course y est.
+
+    Returns:
+        {pilot_id: ([ms, ...] dans l'ordre des tours, nombre total de tours)}
+    """
+    store = get_lap_store() if use_store else None
+    if store is not None and race_id in store:
+        return store.last_laps(race_id, n_laps)
+    return _windows(_race_laps(race_id, n_laps))
+
+
+async def arace_lap_windows(race_id, n_laps, use_store=False):
+    """race_lap_windows par l'ORM asynchrone"""
+    store = get_lap_store() if use_store else None
+    if store is not None and race_id in store:
+        return store.last_laps(race_id, n_laps)
+    return _windows([row async for row in _race_laps(race_id, n_laps)])
+
+
+def _race_laps(race_id, n_laps):
+    return (
+        LapTime.objects
+        .filter(race_id=race_id)
+        .annotate(
+            rank=Window(RowNumber(), partition_by=[F('pilot_id')], order_by=F('lap').desc()),
+            total=Window(Count('id'), partition_by=[F('pilot_id')]),
+        )
+        .filter(rank__lte=n_laps)
+        .order_by('pilot_id', 'lap')
+        .values_list('pilot_id', 'milliseconds', 'total')
+    )
+
+
+def _windows(rows):
+    """(clé, ms, total) triés par clé puis tour -> {clé: ([ms, ...], total)}"""
+    windows = defaultdict(list)
+    totals = {}
+    for key, milliseconds, total in rows:
+        windows[key].append(milliseconds)
+        totals[key] = total
+    return {key: (laps, totals[key]) for key, laps in windows.items()}
+
+
+def race_pit_counts(race_id):
+    """Nombre d'arrêts au stand par pilote"""
+    return dict(_race_pits(race_id))
+
+
+async def arace_pit_counts(race_id):
+    return dict([row async for row in _race_pits(race_id)])
+
+
+def _race_pits(race_id):
+    return (
+        PitStop.objects
+        .filter(race_id=race_id)
+        .values('pilot_id')
+        .annotate(n=Count('id'))
+        .values_list('pilot_id', 'n')
+    )
+
+
+def race_rows(race, results, seq_length):
+    """
+    Lignes predict_batch de toute la grille d'une course (2 requêtes quel que soit le nombre de pilotes)
+
+    Args:
+        race: Race avec season et circuit chargés
+        results: RaceResult de la course (pilot chargé), dans l'ordre d'affichage
+    """
+    with metrics.stage('db_fetch'):
+        lap_windows = race_lap_windows(race.id, seq_length, use_store=race.statut == 'termine')
+        pit_counts = race_pit_counts(race.id)
+
+    with metrics.stage('feature_assembly'):
+        return _assemble_rows(race, results, lap_windows, pit_counts)
+
+
+async def arace_rows(race, results, seq_length):
+    """race_rows par l'ORM asynchrone"""
+    with metrics.stage('db_fetch'):
+        lap_windows = await arace_lap_windows(race.id, seq_length, use_store=race.statut == 'termine')
+        pit_counts = await arace_pit_counts(race.id)
+
+    with metrics.stage('feature_assembly'):
+        return _assemble_rows(race, results, lap_windows, pit_counts)
+
+
+def _assemble_rows(race, results, lap_windows, pit_counts):
+    circuit_data = circuit_features(race)
+    rows = []
+    for result in results:
+        driver = result.pilot
+
+        # Temps au tour enregistrés (séquence par défaut si aucun)
+        lap_times, laps_completed = lap_windows.get(driver.id, ([], result.tours_completés))
+
+        race_data = {
+            'grid_position': grid_position(result),
+            'year': race.season.annee,
+            'laps_completed': laps_completed,
+            'num_pit_stops': pit_counts.get(driver.id, 0),
+            'position_change': 0
+        }
+        rows.append((pilot_features(driver), circuit_data, lap_times, race_data))
+    return rows
+
+
+def _pit_stop_count():
+    """Nombre d'arrêts du pilote dans la course d'un RaceResult (sous-requête corrélée)"""
+    pit_stops = (
+        PitStop.objects
+        .filter(race_id=OuterRef('race_id'), pilot_id=OuterRef('pilot_id'))
+        .order_by()
+        .values('pilot_id')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return Coalesce(Subquery(pit_stops), 0)
+
+
+def pilot_results(pilot_id, race_id=None, season=None):
+    """
+    Résultats d'un pilote (une course ou une saison) avec son nombre d'arrêts, en une requête
+
+    Course, saison et circuit sont chargés ; ordre chronologique.
+    """
+    return list(_pilot_results(pilot_id, race_id, season))
+
+
+async def apilot_results(pilot_id, race_id=None, season=None):
+    """pilot_results par l'ORM asynchrone"""
+    return [result async for result in _pilot_results(pilot_id, race_id, season)]
+
+
+def _pilot_results(pilot_id, race_id, season):
+    queryset = (
+        RaceResult.objects
+        .filter(pilot_id=pilot_id)
+        .select_related('race__season', 'race__circuit')
+        .annotate(num_pit_stops=_pit_stop_count())
+        .order_by('race__date', 'race__numero_manche')
+    )
+    if race_id is not None:
+        queryset = queryset.filter(race_id=race_id)
+    if season is not None:
+        queryset = queryset.filter(race__season__annee=season)
+    return queryset
+
+
+def pilot_lap_windows(pilot_id, races, n_laps):
+    """
+    Derniers n_laps temps au tour d'un pilote dans plusieurs courses, en une requête
+
+    Les courses terminées présentes dans le LapStore sont lues en mmap.
+
+    Returns:
+        {race_id: ([ms, ...] dans l'ordre des tours, nombre total de tours)}
+    """
+    windows, remaining = _stored_pilot_windows(pilot_id, races, n_laps)
+    if remaining:
+        windows.update(_windows(_pilot_laps(pilot_id, remaining, n_laps)))
+    return windows
+
+
+async def apilot_lap_windows(pilot_id, races, n_laps):
+    """pilot_lap_windows par l'ORM asynchrone"""
+    windows, remaining = _stored_pilot_windows(pilot_id, races, n_laps)
+    if remaining:
+        windows.update(_windows([row async for row in _pilot_laps(pilot_id, remaining, n_laps)]))
+    return windows
+
+
+def _stored_pilot_windows(pilot_id, races, n_laps):
+    """Fenêtres lues dans le LapStore et courses restant à lire en base"""
+    store = get_lap_store()
+    windows = {}
+    remaining = []
+    for race in races:
+        if store is not None and race.statut == 'termine' and race.id in store:
+            window = store.last_laps(race.id, n_laps).get(pilot_id)
+            if window is not None:
+                windows[race.id] = window
+        else:
+            remaining.append(race.id)
+    return windows, remaining
+
+
+def _pilot_laps(pilot_id, race_ids, n_laps):
+    return (
+        LapTime.objects
+        .filter(pilot_id=pilot_id, race_id__in=race_ids)
+        .annotate(
+            rank=Window(RowNumber(), partition_by=[F('race_id')], order_by=F('lap').desc()),
+            total=Window(Count('id'), partition_by=[F('race_id')]),
+        )
+        .filter(rank__lte=n_laps)
+        .order_by('race_id', 'lap')
+        .values_list('race_id', 'milliseconds', 'total')
+    )
+
+
+def pilot_rows(driver, results, seq_length):
+    """
+    Lignes predict_batch d'un pilote sur plusieurs courses (une ligne par résultat)
+
+    Args:
+        results: pilot_results() du pilote
+    """
+    with metrics.stage('db_fetch'):
+        lap_windows = pilot_lap_windows(driver.id, [result.race for result in results], seq_length)
+
+    with metrics.stage('feature_assembly'):
+        return _assemble_pilot_rows(driver, results, lap_windows)
+
+
+async def apilot_rows(driver, results, seq_length):
+    """pilot_rows par l'ORM asynchrone"""
+    with metrics.stage('db_fetch'):
+        lap_windows = await apilot_lap_windows(driver.id, [result.race for result in results], seq_length)
+
+    with metrics.stage('feature_assembly'):
+        return _assemble_pilot_rows(driver, results, lap_windows)
+
+
+def _assemble_pilot_rows(driver, results, lap_windows):
+    pilot_data = pilot_features(driver)
+    rows = []
+    for result in results:
+        race = result.race
+        lap_times, laps_completed = lap_windows.get(race.id, ([], result.tours_completés))
+        rows.append((
+            pilot_data,
+            circuit_features(race),
+            lap_times,
+            {
+                'grid_position': grid_position(result),
+                'year': race.season.annee,
+                'laps_completed': laps_completed,
+                'num_pit_stops': result.num_pit_stops,
+                'position_change': 0
+            }
+        ))
+    return rows
+
+
+def pair_rows(pairs, seq_length):
+    """
+    Lignes predict_batch de couples (course, pilote) quelconques, en deux requêtes au plus
+
+    Les résultats sont lus sur le produit courses x pilotes demandés puis
+    filtrés ; les tours viennent d'une seule requête fenêtrée par
+    (course, pilote), ou du LapStore pour les courses terminées.
+
+    Returns:
+        {(race_id, pilot_id): ligne} ; les couples sans RaceResult sont absents
+    """
+    wanted = set(pairs)
+    if not wanted:
+        return {}
+
+    with metrics.stage('db_fetch'):
+        results = [
+            result for result in (
+                RaceResult.objects
+                .filter(race_id__in={race_id for race_id, _ in wanted}, pilot_id__in={pilot_id for _, pilot_id in wanted})
+                .select_related('race__season', 'race__circuit', 'pilot')
+                .annotate(num_pit_stops=_pit_stop_count())
+            )
+            if (result.race_id, result.pilot_id) in wanted
+        ]
+        lap_windows = _pair_lap_windows(results, seq_length)
+
+    with metrics.stage('feature_assembly'):
+        circuits = {}
+        rows = {}
+        for result in results:
+            race = result.race
+            if race.id not in circuits:
+                circuits[race.id] = circuit_features(race)
+            lap_times, laps_completed = lap_windows.get((race.id, result.pilot_id), ([], result.tours_completés))
+            rows[(race.id, result.pilot_id)] = (
+                pilot_features(result.pilot),
+                circuits[race.id],
+                lap_times,
+                {
+                    'grid_position': grid_position(result),
+                    'year': race.season.annee,
+                    'laps_completed': laps_completed,
+                    'num_pit_stops': result.num_pit_stops,
+                    'position_change': 0
+                }
+            )
+        return rows
+
+
+def _pair_lap_windows(results, n_laps):
+    """{(race_id, pilot_id): (derniers n_laps temps, nombre total de tours)} des résultats donnés"""
+    store = get_lap_store()
+    stored = {}
+    windows = {}
+    remaining = set()
+    for result in results:
+        race = result.race
+        if store is not None and race.statut == 'termine' and race.id in store:
+            if race.id not in stored:
+                stored[race.id] = store.last_laps(race.id, n_laps)
+            window = stored[race.id].get(result.pilot_id)
+            if window is not None:
+                windows[(race.id, result.pilot_id)] = window
+        else:
+            remaining.add((race.id, result.pilot_id))
+
+    if not remaining:
+        return windows
+
+    rows = (
+        LapTime.objects
+        .filter(race_id__in={race_id for race_id, _ in remaining}, pilot_id__in={pilot_id for _, pilot_id in remaining})
+        .annotate(
+            rank=Window(RowNumber(), partition_by=[F('race_id'), F('pilot_id')], order_by=F('lap').desc()),
+            total=Window(Count('id'), partition_by=[F('race_id'), F('pilot_id')]),
+        )
+        .filter(rank__lte=n_laps)
+        .order_by('race_id', 'pilot_id', 'lap')
+        .values_list('race_id', 'pilot_id', 'milliseconds', 'total')
+    )
+    laps = defaultdict(list)
+    totals = {}
+    for race_id, pilot_id, milliseconds, total in rows.iterator():
+        key = (race_id, pilot_id)
+        if key in remaining:
+            laps[key].append(milliseconds)
+            totals[key] = total
+    windows.update((key, (values, totals[key])) for key, values in laps.items())
+    return windows
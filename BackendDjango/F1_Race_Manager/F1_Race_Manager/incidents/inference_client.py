@@ -0,0 +1,320 @@
+# incidents/inference_client.py
+
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+from django.conf import settings
+
+from . import loader
+from .ml import inference_protocol as protocol
+from .ml import metrics
+from .ml.predictor import format_risks
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client = None
+_serving = None
+_info_checked = 0.0
+_retry_at = 0.0
+_refresh_thread = None
+_stats = {'connects': 0, 'requests': 0, 'rows': 0, 'errors': 0, 'server_errors': 0, 'fallbacks': 0}
+_warned = {}  # type d'avertissement -> (dernière émission, messages retenus depuis)
+
+
+class Unavailable(Exception):
+    """Serveur d'inférence injoignable, trop lent ou arrêté"""
+
+
+class ServerError(Exception):
+    """Erreur levée par le serveur pendant la requête (message du serveur)"""
+
+
+def _count(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def _warn(kind, message, *args):
+    """
+    logger.warning limité à un message par type toutes les INCIDENT_INFERENCE_LOG_INTERVAL secondes
+
+    Le message suivant indique combien ont été retenus entre-temps.
+    """
+    now = time.monotonic()
+    with _lock:
+        last, suppressed = _warned.get(kind, (None, 0))
+        if last is not None and now - last < getattr(settings, 'INCIDENT_INFERENCE_LOG_INTERVAL', 60):
+            _warned[kind] = (last, suppressed + 1)
+            return
+        _warned[kind] = (now, 0)
+    if suppressed:
+        message += ' (%d messages similaires retenus)'
+        args += (suppressed,)
+    logger.warning(message, *args)
+
+
+class InferenceClient:
+    """
+    Client du serveur d'inférence (manage.py run_inference_server)
+
+    Garde au plus pool_size connexions ouvertes vers le socket Unix ; un
+    thread emprunte une connexion le temps d'une requête. Une connexion
+    en erreur est fermée, les autres restent dans le pool.
+    """
+
+    def __init__(self, path, pool_size=8, timeout=5.0):
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def info(self):
+        return protocol.decode_json(self._call(protocol.OP_INFO))
+
+    def predict(self, rows, seq_length):
+        """Probabilités float32 [lignes, classes] des lignes"""
+        reply = self._call(protocol.OP_PREDICT, protocol.encode_rows(rows, seq_length))
+        try:
+            proba = protocol.decode_proba(reply)
+        except protocol.ProtocolError as e:
+            raise ServerError(str(e)) from e
+        if len(proba) != len(rows):
+            raise ServerError(f"{len(proba)} résultats pour {len(rows)} lignes")
+        return proba
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _call(self, op, body=b''):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise Unavailable(f"Pool de {self.pool_size} connexions épuisé")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+            if conn is not None:
+                try:
+                    return self._exchange(conn, op, body)
+                except TimeoutError as e:
+                    raise Unavailable(f"{self.path}: {e}") from e
+                except (OSError, protocol.ProtocolError):
+                    pass  # Connexion d'un serveur redémarré depuis : un essai sur une neuve
+            try:
+                return self._exchange(self._connect(), op, body)
+            except (OSError, protocol.ProtocolError) as e:
+                raise Unavailable(f"{self.path}: {e}") from e
+        finally:
+            self._slots.release()
+
+    def _exchange(self, conn, op, body):
+        """Une requête sur conn ; conn retourne au pool si l'échange a abouti, fermée sinon"""
+        try:
+            protocol.write_frame(conn, op, body)
+            status, reply = protocol.read_frame(conn)
+        except BaseException:
+            conn.close()
+            raise
+        self._idle.put(conn)
+        if status != protocol.STATUS_OK:
+            raise ServerError(bytes(reply).decode(errors='replace'))
+        return reply
+
+    def _connect(self):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(self.timeout)
+        try:
+            conn.connect(self.path)
+        except OSError:
+            conn.close()
+            raise
+        _count('connects')
+        return conn
+
+
+class RemotePredictor:
+    """
+    Interface de F1IncidentPredictor utilisée par les vues, servie par le serveur d'inférence
+
+    get_info et get_encoding_stats viennent de la dernière réponse INFO du
+    serveur. predict_sweep reste local (voir loader.get_local_serving).
+    """
+
+    backend = 'remote'
+
+    def __init__(self, client, info):
+        self.client = client
+        self.info = info
+
+    def predict(self, pilot_data, circuit_data, lap_times, race_data):
+        return self.predict_batch([(pilot_data, circuit_data, lap_times, race_data)])[0]
+
+    def predict_batch(self, rows):
+        if not rows:
+            return []
+        model_info = self.info['model_info']
+        start = time.perf_counter()
+        try:
+            proba = self.client.predict(rows, model_info['seq_length'])
+        except Unavailable:
+            _count('errors')
+            _mark_unavailable()
+            raise
+        except ServerError:
+            _count('server_errors')
+            raise
+        metrics.observe_stage('remote_inference', time.perf_counter() - start)
+        _count('requests')
+        _count('rows', len(rows))
+        return [format_risks(model_info['classes'], p) for p in proba]
+
+    def predict_sweep(self, row, axes):
+        local = loader.get_local_serving()
+        if local is None:
+            raise Unavailable("Balayage impossible : ni serveur d'inférence ni modèle local")
+        return local.predictor.predict_sweep(row, axes)
+
+    def get_info(self):
+        return self.info['model_info']
+
+    def get_encoding_stats(self, top=10):
+        return {
+            name: {**stats, 'top_unknown': dict(list(stats['top_unknown'].items())[:top])}
+            for name, stats in self.info['encoding'].items()
+        }
+
+
+class RemoteBatcher:
+    """
+    submit() des vues vers le serveur (qui regroupe lui-même les requêtes)
+
+    Si le serveur ne répond plus ou renvoie une erreur, la requête est
+    servie par le modèle local (chargé à ce moment-là si besoin).
+    """
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def submit(self, rows, timeout=None):
+        try:
+            return self.predictor.predict_batch(rows)
+        except (Unavailable, ServerError) as e:
+            local = loader.get_local_serving()
+            if local is None:
+                raise
+            _count('fallbacks')
+            _warn('fallback', "Serveur d'inférence en échec, inférence locale: %s", e)
+            return local.batcher.submit(rows, timeout)
+
+    def close(self):
+        pass
+
+    def get_stats(self):
+        """Micro-batcher du worker serveur qui a répondu à la dernière requête INFO"""
+        return self.predictor.info['batching']
+
+
+def _mark_unavailable():
+    global _serving, _retry_at
+    with _lock:
+        _serving = None
+        _retry_at = time.monotonic() + getattr(settings, 'INCIDENT_INFERENCE_RETRY_SECONDS', 5)
+
+
+def _get_client(path):
+    global _client
+    if _client is None or _client.path != path:
+        if _client is not None:
+            _client.close()
+        _client = InferenceClient(
+            path,
+            pool_size=getattr(settings, 'INCIDENT_INFERENCE_POOL_SIZE', 8),
+            timeout=getattr(settings, 'INCIDENT_INFERENCE_TIMEOUT', 5),
+        )
+    return _client
+
+
+def get_serving():
+    """
+    Version servie par le serveur d'inférence, ou None (pas de socket configuré, serveur injoignable)
+
+    Un échec n'est retenté qu'après INCIDENT_INFERENCE_RETRY_SECONDS ; les
+    infos du modèle sont relues toutes les INCIDENT_MODEL_POLL_SECONDS
+    (bascule de version côté serveur).
+    """
+    global _serving, _info_checked
+
+    path = getattr(settings, 'INCIDENT_INFERENCE_SOCKET', '')
+    if not path:
+        return None
+
+    now = time.monotonic()
+    serving = _serving
+    if serving is not None and now < _info_checked:
+        return serving
+    if serving is None and now < _retry_at:
+        return None
+    if serving is None and not os.path.exists(path):
+        _mark_unavailable()
+        return None
+
+    with _lock:
+        client = _get_client(path)
+    try:
+        info = client.info()
+    except (Unavailable, ServerError) as e:
+        _warn('unavailable', "Serveur d'inférence injoignable (%s), inférence locale: %s", path, e)
+        _count('errors')
+        _mark_unavailable()
+        return None
+
+    with _lock:
+        if serving is not None and serving.version == info['model_info']['version']:
+            serving.predictor.info = info
+        else:
+            predictor = RemotePredictor(client, info)
+            serving = _serving = loader.Serving(predictor, RemoteBatcher(predictor), info['model_info']['version'])
+        _info_checked = now + getattr(settings, 'INCIDENT_MODEL_POLL_SECONDS', 2)
+    return serving
+
+
+def current():
+    """Version distante déjà connectée (sans tenter de connexion), ou None"""
+    return _serving
+
+
+def refresh_in_background():
+    """
+    Relit les infos du serveur dans un thread si elles ont expiré
+
+    Pour les vues asynchrones : elles servent current() et ne font jamais
+    l'aller-retour INFO (bloquant) sur la boucle d'événements.
+    """
+    global _refresh_thread
+
+    if _serving is None or time.monotonic() < _info_checked:
+        return
+    with _lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        _refresh_thread = threading.Thread(target=get_serving, name='inference-info-refresh', daemon=True)
+        _refresh_thread.start()
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+    result['socket'] = getattr(settings, 'INCIDENT_INFERENCE_SOCKET', '') or None
+    result['connected'] = _serving is not None
+    result['pool_size'] = _client.pool_size if _client is not None else None
+    return result
@@ -0,0 +1,98 @@
+# incidents/inference_executor.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .ml import metrics
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Saturated(Exception):
+    """Plus de place dans l'exécuteur : la vue répond 503 (Retry-After)"""
+
+
+class InferenceExecutor:
+    """
+    Pool de threads borné pour le travail bloquant des vues asynchrones
+
+    Au plus max_pending tâches admises (en cours + en file d'attente du pool).
+    Une tâche refusée attend une place au plus queue_timeout secondes sans
+    bloquer la boucle d'événements, puis lève Saturated : la pression remonte
+    jusqu'au client au lieu d'allonger la file indéfiniment.
+    """
+
+    def __init__(self, max_workers=8, max_pending=64, queue_timeout=0.1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='f1-inference')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._max_seen = 0
+        self._submitted = 0
+        self._rejected = 0
+
+    async def run(self, fn, *args):
+        """Exécute fn(*args) dans le pool et attend son résultat"""
+        start = time.perf_counter()
+        acquired = self._slots.acquire(blocking=False)
+        deadline = start + self.queue_timeout
+        while not acquired and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self._rejected += 1
+            raise Saturated(f"{self.max_pending} tâches d'inférence en attente")
+
+        with self._lock:
+            self._submitted += 1
+            self._pending += 1
+            self._max_seen = max(self._max_seen, self._pending)
+        metrics.observe_stage('executor_wait', time.perf_counter() - start)
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Place rendue quand fn se termine, pas quand l'appelant abandonne (déconnexion, timeout) :
+        # une tâche déjà lancée continue d'occuper le pool
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'max_pending_seen': self._max_seen,
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+            }
+
+
+def get_executor():
+    """Exécuteur du processus (INCIDENT_ASYNC_INFERENCE_THREADS, INCIDENT_ASYNC_MAX_PENDING)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = InferenceExecutor(
+                    max_workers=getattr(settings, 'INCIDENT_ASYNC_INFERENCE_THREADS', 8),
+                    max_pending=getattr(settings, 'INCIDENT_ASYNC_MAX_PENDING', 64),
+                    queue_timeout=getattr(settings, 'INCIDENT_ASYNC_QUEUE_TIMEOUT_MS', 100) / 1000.0,
+                )
+    return _executor
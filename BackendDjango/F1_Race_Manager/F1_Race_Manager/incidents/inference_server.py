@@ -0,0 +1,142 @@
+# incidents/inference_server.py
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+import numpy as np
+
+from . import loader
+from .ml import inference_protocol as protocol
+
+
+class InferenceServer:
+    """
+    Processus d'inférence hors des workers web (manage.py run_inference_server)
+
+    Le processus maître ouvre le socket Unix puis lance n_workers processus
+    qui acceptent tous sur ce socket. Chaque worker charge le modèle une
+    fois (poids mmap partagés avec INCIDENT_PREDICTOR_SHARED), sert chaque
+    connexion dans un thread et regroupe les requêtes concurrentes dans
+    son micro-batcher. Un worker mort est relancé.
+    """
+
+    def __init__(self, path, n_workers=2, backlog=128, log=print):
+        self.path = path
+        self.n_workers = n_workers
+        self.backlog = backlog
+        self.log = log
+        self._listener = None
+        self._workers = []
+        self._stopping = False
+
+    def serve_forever(self):
+        # Les poids partagés éventuels sont déjà exportés (IncidentsConfig.ready, avant le fork)
+        loader.serve_locally()
+        self._listener = self._bind()
+        context = multiprocessing.get_context('fork')
+        try:
+            self._workers = [self._spawn(context) for _ in range(self.n_workers)]
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.log(f"✅ Serveur d'inférence sur {self.path} ({self.n_workers} workers)")
+
+            while not self._stopping:
+                time.sleep(0.5)
+                for i, worker in enumerate(self._workers):
+                    if not worker.is_alive() and not self._stopping:
+                        self.log(f"⚠️ Worker {worker.pid} arrêté (code {worker.exitcode}), relance")
+                        self._workers[i] = self._spawn(context)
+        finally:
+            for worker in self._workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in self._workers:
+                worker.join(5)
+            self._listener.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.log("🔄 Serveur d'inférence arrêté")
+
+    def _bind(self):
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)  # Socket d'un serveur précédent
+            else:
+                raise RuntimeError(f"❌ Un serveur d'inférence écoute déjà sur {self.path}")
+            finally:
+                probe.close()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        os.chmod(self.path, 0o660)
+        listener.listen(self.backlog)
+        return listener
+
+    def _spawn(self, context):
+        worker = context.Process(target=_worker_main, args=(self._listener,), name='f1-inference-worker', daemon=True)
+        worker.start()
+        return worker
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+
+def _worker_main(listener):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Arrêt piloté par le maître
+
+    if loader.warm_up() is None:
+        print(f"❌ Worker {os.getpid()}: modèle indisponible ({loader.predictor_status()['error']})")
+        os._exit(1)
+
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=_serve_connection, args=(conn,), name='f1-inference-conn', daemon=True).start()
+
+
+def _serve_connection(conn):
+    """Requêtes d'une connexion du pool client, une à la fois, jusqu'à sa fermeture"""
+    with conn:
+        while True:
+            try:
+                op, body = protocol.read_frame(conn)
+            except (OSError, protocol.ProtocolError):
+                return
+            try:
+                status, reply = protocol.STATUS_OK, _handle(op, body)
+            except Exception as e:
+                status, reply = protocol.STATUS_ERROR, str(e).encode()
+            try:
+                protocol.write_frame(conn, status, reply)
+            except OSError:
+                return
+
+
+def _handle(op, body):
+    serving = loader.get_serving()
+    if serving is None:
+        raise RuntimeError(f"Modèle indisponible: {loader.predictor_status()['error']}")
+
+    if op == protocol.OP_PREDICT:
+        rows = protocol.decode_rows(body)
+        classes = serving.predictor.get_info()['classes']
+        risks = serving.batcher.submit(rows)
+        proba = np.array([[r[cls] for cls in classes] for r in risks], dtype=np.float32)
+        return protocol.encode_proba(proba.reshape(len(risks), len(classes)))
+
+    if op == protocol.OP_INFO:
+        return protocol.encode_json({
+            'pid': os.getpid(),
+            'model_info': serving.predictor.get_info(),
+            'encoding': serving.predictor.get_encoding_stats(),
+            'batching': serving.batcher.get_stats(),
+        })
+
+    raise protocol.ProtocolError(f"Opération inconnue: {op}")
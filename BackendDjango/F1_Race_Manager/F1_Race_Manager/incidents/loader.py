@@ -0,0 +1,271 @@
+# incidents/loader.py
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .ml.batching import MicroBatcher
+
+# États du prédicteur exposés par health_check
+IDLE = 'idle'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+# Version servie : prédicteur et micro-batcher remplacés ensemble
+Serving = namedtuple('Serving', ['predictor', 'batcher', 'version'])
+
+_lock = threading.Lock()
+_serving = None
+_state = IDLE
+_error = None
+_load_seconds = None
+
+# Serveur d'inférence (INCIDENT_INFERENCE_SOCKET) consulté avant le modèle local,
+# sauf dans les workers du serveur lui-même (serve_locally)
+_remote = True
+
+# Rechargement à chaud (pointeur ACTIVE du registre)
+_pointer = None
+_next_check = 0.0
+_swap_thread = None
+_swap_error = None
+_swaps = 0
+
+
+def get_registry():
+    """Registre des versions (INCIDENT_MODEL_REGISTRY_DIR), weights/ livré par défaut"""
+    from .ml.predictor import DEFAULT_WEIGHTS_DIR
+    from .ml.registry import ModelRegistry
+
+    path = getattr(settings, 'INCIDENT_MODEL_REGISTRY_DIR', None)
+    return ModelRegistry(path or os.path.join(os.path.dirname(DEFAULT_WEIGHTS_DIR), 'registry'), DEFAULT_WEIGHTS_DIR)
+
+
+def get_serving():
+    """
+    Version servie (None si le chargement a échoué)
+
+    Une requête garde le même Serving du début à la fin : une bascule vers
+    une nouvelle version n'affecte que les requêtes suivantes. Avec un
+    serveur d'inférence joignable, le modèle n'est pas chargé dans le processus.
+    """
+    if _remote and getattr(settings, 'INCIDENT_INFERENCE_SOCKET', ''):
+        from . import inference_client
+
+        serving = inference_client.get_serving()
+        if serving is not None:
+            return serving
+    return get_local_serving()
+
+
+def get_local_serving():
+    """Version chargée dans ce processus (repli quand le serveur d'inférence est injoignable)"""
+    if _state == READY:
+        _check_pointer()
+        return _serving
+    if _state == FAILED:
+        return None
+    return _load()
+
+
+def get_predictor():
+    """
+    Retourne le prédicteur, chargé au premier appel (None si le chargement a échoué)
+
+    Les appels concurrents pendant le chargement attendent le même chargement.
+    """
+    serving = get_serving()
+    return serving.predictor if serving is not None else None
+
+
+def get_batcher():
+    """Micro-batcher devant le prédicteur (None si le prédicteur est indisponible)"""
+    serving = get_serving()
+    return serving.batcher if serving is not None else None
+
+
+def get_shared_dir():
+    """Dossier des fichiers de poids partagés (None : défaut de ml.shared_weights)"""
+    return getattr(settings, 'INCIDENT_PREDICTOR_SHARED_DIR', None)
+
+
+def _build(weights_dir):
+    """Charge une version et son micro-batcher"""
+    from .ml.predictor import F1IncidentPredictor
+
+    predictor = F1IncidentPredictor(
+        backend=getattr(settings, 'INCIDENT_PREDICTOR_BACKEND', 'keras'),
+        weights_dir=weights_dir,
+        precision=getattr(settings, 'INCIDENT_PREDICTOR_PRECISION', 'float32'),
+        shared=getattr(settings, 'INCIDENT_PREDICTOR_SHARED', False),
+        shared_dir=get_shared_dir(),
+    )
+    # Regroupe les lignes des requêtes concurrentes en une seule passe
+    batcher = MicroBatcher(
+        predictor.predict_batch,
+        max_wait_ms=getattr(settings, 'INCIDENT_BATCH_WINDOW_MS', 5),
+        max_batch_rows=getattr(settings, 'INCIDENT_BATCH_MAX_ROWS', 64),
+    )
+    return Serving(predictor, batcher, predictor.get_info()['version'])
+
+
+def _load(force=False):
+    global _serving, _state, _error, _load_seconds, _pointer
+
+    with _lock:
+        if _state == READY or (_state == FAILED and not force):
+            return _serving
+
+        _state = LOADING
+        _error = None
+        start = time.perf_counter()
+        try:
+            registry = get_registry()
+            _pointer = registry.pointer_token()
+            _serving = _build(registry.resolve())
+            _load_seconds = round(time.perf_counter() - start, 3)
+            _state = READY
+            print(f"✅ Prédicteur IA activé (version {_serving.version})")
+        except Exception as e:
+            _serving = None
+            _error = str(e)
+            _state = FAILED
+            print(f"⚠️ Prédicteur non disponible (mode test): {e}")
+
+    return _serving
+
+
+def load_predictor(force=False):
+    """Charge le prédicteur une seule fois ; force=True relance après un échec"""
+    serving = _load(force)
+    return serving.predictor if serving is not None else None
+
+
+def _check_pointer():
+    """Démarre un rechargement en arrière-plan si la version active du registre a changé"""
+    global _next_check
+
+    now = time.monotonic()
+    if now < _next_check:
+        return
+    _next_check = now + getattr(settings, 'INCIDENT_MODEL_POLL_SECONDS', 2)
+
+    if get_registry().pointer_token() != _pointer:
+        reload_async()
+
+
+def reload_async():
+    """Charge la version active en arrière-plan puis bascule (sans bloquer les requêtes)"""
+    global _swap_thread
+
+    with _lock:
+        if _swap_thread is not None and _swap_thread.is_alive():
+            return _swap_thread
+        _swap_thread = threading.Thread(target=_swap, name='incident-model-swap', daemon=True)
+        _swap_thread.start()
+        return _swap_thread
+
+
+def _swap():
+    global _serving, _pointer, _swap_error, _swaps
+
+    registry = get_registry()
+    pointer = registry.pointer_token()
+    try:
+        weights_dir = registry.resolve()
+        current = _serving
+        if current is not None and current.predictor.weights_dir == weights_dir:
+            _pointer = pointer
+            return
+
+        start = time.perf_counter()
+        serving = _build(weights_dir)
+        _warm(serving.predictor)
+    except Exception as e:
+        # La version en service continue de répondre
+        _swap_error = f"{e}"
+        _pointer = pointer
+        print(f"⚠️ Bascule de modèle impossible: {e}")
+        return
+
+    with _lock:
+        previous, _serving = _serving, serving
+        _pointer = pointer
+        _swap_error = None
+        _swaps += 1
+
+    # Les requêtes en cours terminent sur l'ancienne version
+    if previous is not None:
+        previous.batcher.close()
+        if previous.predictor.weights_dir != weights_dir:
+            type(previous.predictor).release(previous.predictor.weights_dir)
+    print(f"✅ Modèle {serving.version} en service ({time.perf_counter() - start:.1f}s)")
+
+
+def _warm(predictor):
+    dummy_row = (
+        {'code': 'unknown', 'team_slug': 'unknown'},
+        {'slug': 'unknown'},
+        [],
+        {'grid_position': 10, 'year': 2024},
+    )
+    predictor.predict_batch([dummy_row])
+
+
+def prepare_shared():
+    """
+    Exporte une fois le fichier de poids partagé de la version active
+
+    Appelé au démarrage (processus maître avec --preload) : les workers
+    forkés ensuite ouvrent tous le même fichier en mmap au lieu de l'écrire.
+    """
+    from .ml.shared_weights import ensure_shared
+
+    try:
+        return ensure_shared(
+            get_registry().resolve(),
+            getattr(settings, 'INCIDENT_PREDICTOR_PRECISION', 'float32'),
+            get_shared_dir(),
+        )
+    except Exception as e:
+        # Chaque worker retentera l'export à son premier chargement
+        print(f"⚠️ Export des poids partagés impossible: {e}")
+        return None
+
+
+def warm_up(background=False):
+    """Charge le prédicteur puis lance une passe factice pour préchauffer le modèle"""
+    if background:
+        thread = threading.Thread(target=warm_up, name='incident-predictor-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    predictor = get_predictor()
+    if predictor is None:
+        return None
+
+    _warm(predictor)
+    return predictor
+
+
+def serve_locally():
+    """Ignore INCIDENT_INFERENCE_SOCKET : le processus charge et sert lui-même le modèle"""
+    global _remote
+    _remote = False
+
+
+def predictor_status():
+    """État du chargement sans le déclencher"""
+    return {
+        'state': _state,
+        'error': _error,
+        'load_seconds': _load_seconds,
+        'serving_version': _serving.version if _serving is not None else None,
+        'swaps': _swaps,
+        'swap_error': _swap_error,
+        'swap_in_progress': _swap_thread is not None and _swap_thread.is_alive(),
+    }
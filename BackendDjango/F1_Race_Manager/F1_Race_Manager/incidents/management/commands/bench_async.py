@@ -0,0 +1,197 @@
+import asyncio
+import io
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from races.models import RaceResult
+
+
+def _asgi_request(app, path, query):
+    """Une requête GET envoyée directement à l'application ASGI : statut HTTP"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    sent = False
+    status = {}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()  # Pas de déconnexion du client
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    return app(scope, receive, send), status
+
+
+def _wsgi_request(app, path, query):
+    """Une requête GET envoyée directement à l'application WSGI : statut HTTP"""
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = {}
+
+    def start_response(line, headers, exc_info=None):
+        status['code'] = int(line.split()[0])
+
+    response = app(environ, start_response)
+    b''.join(response)
+    response.close()
+    return status['code']
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge les vues synchrones (WSGI, pool de threads fixe) et asynchrones (ASGI) "
+        "à concurrence croissante : débit, p50/p99, réponses 503"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=['pilot', 'race', 'health'], default='pilot')
+        parser.add_argument('--season', type=int, default=None, help="Saison des requêtes pilote (défaut : la plus récente)")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+        parser.add_argument('--requests', type=int, default=256, help="Requêtes par niveau de concurrence")
+        parser.add_argument('--wsgi-threads', type=int, default=8, help="Threads du serveur WSGI simulé")
+        parser.add_argument('--modes', nargs='+', choices=['wsgi', 'asgi-sync', 'asgi'],
+                            default=['wsgi', 'asgi-sync', 'asgi'])
+
+    def handle(self, *args, **options):
+        targets = self._targets(options)
+        wsgi_app = get_wsgi_application()
+        asgi_app = get_asgi_application()
+
+        # Warm-up : modèle chargé, connexions ouvertes, caches dans le même état pour tous les modes
+        for sync_target, async_target in targets:
+            _wsgi_request(wsgi_app, *sync_target)
+            asyncio.run(self._run_asgi(asgi_app, [async_target], 1, 1))
+
+        self.stdout.write(
+            f"🔄 {options['endpoint']} : {len(targets)} cibles, {options['requests']} requêtes par niveau, "
+            f"{options['wsgi_threads']} threads WSGI"
+        )
+        self.stdout.write(
+            f"{'mode':>10} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'statuts':>20}"
+        )
+        for concurrency in options['concurrency']:
+            for mode in options['modes']:
+                if mode == 'wsgi':
+                    elapsed, latencies, statuses = self._run_wsgi(
+                        wsgi_app, [t[0] for t in targets], concurrency, options['requests'], options['wsgi_threads']
+                    )
+                else:
+                    chosen = [t[0] if mode == 'asgi-sync' else t[1] for t in targets]
+                    elapsed, latencies, statuses = asyncio.run(
+                        self._run_asgi(asgi_app, chosen, concurrency, options['requests'])
+                    )
+                lat = np.array(latencies) * 1000
+                codes = ' '.join(f'{code}:{n}' for code, n in sorted(statuses.items()))
+                self.stdout.write(
+                    f"{mode:>10} {concurrency:>5} {len(latencies) / elapsed:>9.1f} "
+                    f"{np.percentile(lat, 50):>9.1f} {np.percentile(lat, 99):>9.1f} {codes:>20}"
+                )
+
+    def _targets(self, options):
+        """[((chemin, query) synchrone, (chemin, query) asynchrone), ...]"""
+        endpoint = options['endpoint']
+        if endpoint == 'health':
+            return [((reverse('health_check'), ''), (reverse('health_check_async'), ''))]
+
+        results = RaceResult.objects.select_related('race__season')
+        season = options['season']
+        if season is None:
+            latest = results.order_by('-race__season__annee').first()
+            if latest is None:
+                raise CommandError("Aucun résultat de course en base")
+            season = latest.race.season.annee
+
+        if endpoint == 'race':
+            race_ids = sorted(set(results.filter(race__season__annee=season).values_list('race_id', flat=True)))
+            return [
+                ((reverse('predict_race', args=[race_id]), ''), (reverse('predict_race_async', args=[race_id]), ''))
+                for race_id in race_ids
+            ]
+
+        # Pilotes différents : la coalescence ne masque pas le coût de chaque requête
+        pilot_ids = sorted(set(results.filter(race__season__annee=season).values_list('pilot_id', flat=True)))
+        if not pilot_ids:
+            raise CommandError(f"Aucun pilote pour la saison {season}")
+        query = f'season={season}'
+        return [
+            ((reverse('predict_pilot', args=[pilot_id]), query), (reverse('predict_pilot_async', args=[pilot_id]), query))
+            for pilot_id in pilot_ids
+        ]
+
+    @staticmethod
+    def _run_wsgi(app, targets, concurrency, n_requests, n_threads):
+        """
+        concurrency clients face à n_threads workers WSGI
+
+        La latence inclut l'attente d'un worker libre (file d'accept du serveur).
+        """
+        workers = threading.Semaphore(n_threads)
+        latencies = []
+        statuses = Counter()
+        lock = threading.Lock()
+        counter = iter(range(n_requests))
+        barrier = threading.Barrier(concurrency + 1)
+
+        def client():
+            barrier.wait()
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                start = time.perf_counter()
+                with workers:
+                    code = _wsgi_request(app, *targets[i % len(targets)])
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    statuses[code] += 1
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start, latencies, statuses
+
+    @staticmethod
+    async def _run_asgi(app, targets, concurrency, n_requests):
+        """concurrency clients servis par une seule boucle d'événements"""
+        latencies = []
+        statuses = Counter()
+        counter = iter(range(n_requests))
+
+        async def client():
+            for i in counter:
+                coroutine, status = _asgi_request(app, *targets[i % len(targets)])
+                start = time.perf_counter()
+                await coroutine
+                latencies.append(time.perf_counter() - start)
+                statuses[status.get('code', 0)] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies, statuses
@@ -0,0 +1,72 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from incidents.ml.batching import MicroBatcher
+
+
+def _random_row():
+    """Ligne synthétique au format de F1IncidentPredictor.predict"""
+    return (
+        {'code': 'hamilton', 'team_slug': 'mercedes'},
+        {'slug': 'monza'},
+        [90000 + random.randint(-2000, 2000) for _ in range(10)],
+        {'grid_position': random.randint(1, 20), 'year': 2024, 'num_pit_stops': 2, 'position_change': 0},
+    )
+
+
+class Command(BaseCommand):
+    help = "Compare le débit du prédicteur avec et sans micro-batching (1, 8, 64 clients)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 64])
+        parser.add_argument('--requests', type=int, default=20, help="Requêtes par client")
+        parser.add_argument('--rows', type=int, default=1, help="Lignes par requête")
+        parser.add_argument('--window-ms', type=float, default=5)
+        parser.add_argument('--max-rows', type=int, default=64)
+
+    def handle(self, *args, **options):
+        from incidents.ml.predictor import F1IncidentPredictor
+
+        predictor = F1IncidentPredictor()
+        rows = [_random_row() for _ in range(options['rows'])]
+        predictor.predict_batch(rows)  # Warm-up
+
+        self.stdout.write(f"{'clients':>8} {'direct req/s':>14} {'batched req/s':>14} {'gain':>7} {'avg batch':>10}")
+        for n_clients in options['clients']:
+            direct = self._run(predictor.predict_batch, n_clients, options['requests'], rows)
+
+            batcher = MicroBatcher(
+                predictor.predict_batch,
+                max_wait_ms=options['window_ms'],
+                max_batch_rows=options['max_rows'],
+            )
+            batched = self._run(batcher.submit, n_clients, options['requests'], rows)
+            stats = batcher.get_stats()
+
+            self.stdout.write(
+                f"{n_clients:>8} {direct:>14.1f} {batched:>14.1f} "
+                f"{batched / direct:>6.2f}x {stats['avg_batch_size']:>10}"
+            )
+
+    @staticmethod
+    def _run(fn, n_clients, n_requests, rows):
+        """Lance n_clients threads qui appellent fn et retourne le débit en req/s"""
+        barrier = threading.Barrier(n_clients + 1)
+
+        def client():
+            barrier.wait()
+            for _ in range(n_requests):
+                fn(rows)
+
+        threads = [threading.Thread(target=client) for _ in range(n_clients)]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        return n_clients * n_requests / elapsed
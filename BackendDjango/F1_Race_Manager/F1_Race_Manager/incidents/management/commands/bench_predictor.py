@@ -0,0 +1,262 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from incidents.ml.predictor import BACKENDS, PRECISIONS
+
+# Variables lues par OpenBLAS / MKL / OpenMP au démarrage du processus (backend numpy)
+BLAS_THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# Métriques comparées à la baseline : True si une valeur plus haute est meilleure
+# (p95 / p99 figurent dans le rapport mais sont trop bruités pour bloquer)
+HIGHER_IS_BETTER = {
+    'cold_load_s': False,
+    'peak_rss_mb': False,
+    'single_row_p50_ms': False,
+    'grid_p50_ms': False,
+    'throughput_rows_s': True,
+}
+
+
+def synthetic_grid(rng, n_drivers, vocabularies, max_laps=70):
+    """
+    Grille synthétique au format predict_batch
+
+    Pilotes, circuits et écuries tirés du vocabulaire d'entraînement (un sur
+    huit hors vocabulaire), historiques de 0 à max_laps tours.
+    """
+    def pick(name):
+        values = vocabularies[name]
+        return values[rng.integers(len(values))] if rng.random() > 0.125 else 'unknown'
+
+    circuit_data = {'slug': pick('circuit')}
+    year = int(rng.integers(1990, 2025))
+    rows = []
+    for position in range(1, n_drivers + 1):
+        n_laps = int(rng.integers(0, max_laps + 1))
+        base = rng.normal(90000, 4000)
+        lap_times = (base + rng.normal(0, 1500, size=n_laps)).astype(np.int64).tolist()
+        rows.append((
+            {'code': pick('driver'), 'team_slug': pick('constructor')},
+            circuit_data,
+            lap_times,
+            {
+                'grid_position': position,
+                'year': year,
+                'laps_completed': n_laps,
+                'num_pit_stops': int(rng.integers(0, 4)),
+                'position_change': int(rng.integers(-5, 6)),
+            },
+        ))
+    return rows
+
+
+def _percentiles(timings):
+    ms = np.asarray(timings) * 1000
+    return float(np.percentile(ms, 50)), float(np.percentile(ms, 95)), float(np.percentile(ms, 99))
+
+
+def _run_config(config, options, results):
+    """Exécuté dans un processus neuf : chargement à froid, latences, débit et pic de RSS"""
+    start = time.perf_counter()
+    if config['backend'] == 'keras' and (config['intra'] or config['inter']):
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(config['intra'])
+        tf.config.threading.set_inter_op_parallelism_threads(config['inter'])
+
+    from incidents.ml.predictor import F1IncidentPredictor
+    predictor = F1IncidentPredictor(
+        backend=config['backend'], weights_dir=options['weights_dir'], precision=config['precision'], shared=False
+    )
+    cold_load_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(options['seed'])
+    vocabularies = {name: list(table) for name, table in predictor.encoder_tables.items()}
+    predictor.predict_batch(synthetic_grid(rng, 20, vocabularies))  # Warm-up
+
+    # Une ligne (un pilote) : chemin complet prétraitement + passe avant
+    singles = [synthetic_grid(rng, 1, vocabularies) for _ in range(64)]
+    timings = []
+    for i in range(options['repeats']):
+        rows = singles[i % len(singles)]
+        t = time.perf_counter()
+        predictor.predict_batch(rows)
+        timings.append(time.perf_counter() - t)
+    single_p50, single_p95, single_p99 = _percentiles(timings)
+
+    # Grilles de 1 à 26 pilotes
+    grids = {}
+    for n_drivers in options['sizes']:
+        samples = [synthetic_grid(rng, n_drivers, vocabularies) for _ in range(16)]
+        timings = []
+        for i in range(options['repeats']):
+            t = time.perf_counter()
+            predictor.predict_batch(samples[i % len(samples)])
+            timings.append(time.perf_counter() - t)
+        p50, p95, p99 = _percentiles(timings)
+        grids[str(n_drivers)] = {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'rows_s': n_drivers / (p50 / 1000)}
+
+    # Débit : saison entière en lots de batch_rows lignes
+    season = [row for _ in range(options['batch_rows'] // 20 + 1) for row in synthetic_grid(rng, 20, vocabularies)]
+    season = season[:options['batch_rows']]
+    timings = []
+    for _ in range(max(5, options['repeats'] // 10)):
+        t = time.perf_counter()
+        predictor.predict_batch(season)
+        timings.append(time.perf_counter() - t)
+    throughput = len(season) / float(np.median(timings))
+
+    reference = str(max(options['sizes']))
+    results.put({
+        'config': config,
+        'cold_load_s': cold_load_s,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'single_row_p50_ms': single_p50,
+        'single_row_p95_ms': single_p95,
+        'single_row_p99_ms': single_p99,
+        'grid_p50_ms': grids[reference]['p50_ms'],
+        'throughput_rows_s': throughput,
+        'grids': grids,
+    })
+
+
+@contextmanager
+def _thread_env(config):
+    """Variables BLAS héritées par le processus enfant (lues à l'import de numpy)"""
+    values = {}
+    if config['backend'] == 'numpy' and config['intra']:
+        values = {name: str(config['intra']) for name in BLAS_THREAD_VARS}
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _config_key(config):
+    threads = f"intra{config['intra']}-inter{config['inter']}" if config['intra'] or config['inter'] else 'threads-défaut'
+    return f"{config['backend']}/{config['precision']}/{threads}"
+
+
+class Command(BaseCommand):
+    help = "Latence, débit, chargement à froid et pic de RSS de F1IncidentPredictor (rapport JSON, baseline)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=BACKENDS, nargs='+', default=['numpy'])
+        parser.add_argument('--precision', choices=PRECISIONS, nargs='+', default=['float32'])
+        parser.add_argument('--threads', nargs='+', default=['0:0'],
+                            help="Couples intra:inter (TensorFlow ; threads BLAS pour numpy), 0 = défaut")
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10, 20, 26], help="Pilotes par grille")
+        parser.add_argument('--batch-rows', type=int, default=512, help="Lignes du lot de débit")
+        parser.add_argument('--repeats', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--weights-dir', help="Dossier de poids (défaut: version active du registre)")
+        parser.add_argument('--output', help="Rapport JSON")
+        parser.add_argument('--baseline', help="Rapport JSON de référence à comparer")
+        parser.add_argument('--save-baseline', help="Écrit aussi le rapport comme nouvelle baseline")
+        parser.add_argument('--threshold', type=float, default=0.10, help="Régression tolérée (0.10 = 10 %%)")
+
+    def handle(self, *args, **options):
+        from incidents import loader
+
+        options['weights_dir'] = options['weights_dir'] or loader.get_registry().resolve()
+        configs = self._configs(options)
+
+        # Un processus neuf par configuration : chargement à froid et pic de RSS isolés
+        ctx = multiprocessing.get_context('spawn')
+        measures = {}
+        for config in configs:
+            results = ctx.Queue()
+            proc = ctx.Process(target=_run_config, args=(config, options, results))
+            with _thread_env(config):
+                proc.start()
+            measures[_config_key(config)] = results.get()
+            proc.join()
+            if proc.exitcode:
+                raise CommandError(f"❌ Échec de la configuration {_config_key(config)}")
+
+        report = {
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+            'weights_dir': options['weights_dir'],
+            'sizes': options['sizes'],
+            'repeats': options['repeats'],
+            'results': measures,
+        }
+        self._print(report)
+
+        for path in (options['output'], options['save_baseline']):
+            if path:
+                with open(path, 'w') as f:
+                    json.dump(report, f, indent=2)
+                self.stdout.write(f"✅ Rapport écrit: {path}")
+
+        if options['baseline']:
+            self._compare(report, options['baseline'], options['threshold'])
+
+    def _configs(self, options):
+        configs = []
+        for backend in options['backend']:
+            for precision in options['precision']:
+                if backend == 'keras' and precision != 'float32':
+                    continue
+                for threads in options['threads']:
+                    try:
+                        intra, inter = (int(v) for v in threads.split(':'))
+                    except ValueError:
+                        raise CommandError(f"❌ --threads attend intra:inter, reçu {threads!r}")
+                    configs.append({'backend': backend, 'precision': precision, 'intra': intra, 'inter': inter})
+        if not configs:
+            raise CommandError("❌ Aucune configuration (le backend keras n'accepte que float32)")
+        return configs
+
+    def _print(self, report):
+        sizes = [str(n) for n in report['sizes']]
+        self.stdout.write(
+            f"{'configuration':<34} {'load (s)':>8} {'RSS (Mo)':>8} {'1 ligne p50/p99 (ms)':>21} "
+            f"{'débit (lignes/s)':>17} " + ' '.join(f"{f'{n} pil. (ms)':>12}" for n in sizes)
+        )
+        for key, m in report['results'].items():
+            self.stdout.write(
+                f"{key:<34} {m['cold_load_s']:>8.2f} {m['peak_rss_mb']:>8.0f} "
+                f"{m['single_row_p50_ms']:>10.3f} / {m['single_row_p99_ms']:<8.3f} {m['throughput_rows_s']:>17.0f} "
+                + ' '.join(f"{m['grids'][n]['p50_ms']:>12.3f}" for n in sizes)
+            )
+
+    def _compare(self, report, baseline_path, threshold):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        self.stdout.write(f"\nComparaison avec {baseline_path} ({baseline.get('created_at', '?')}), seuil {threshold:.0%}")
+        for key, current in report['results'].items():
+            reference = baseline.get('results', {}).get(key)
+            if reference is None:
+                self.stdout.write(f"⚠️ {key}: absente de la baseline")
+                continue
+            for metric, higher_is_better in HIGHER_IS_BETTER.items():
+                before, after = reference.get(metric), current[metric]
+                if not before:
+                    continue
+                change = (after - before) / before
+                worse = -change if higher_is_better else change
+                flag = '❌' if worse > threshold else '✅'
+                if worse > threshold:
+                    regressions.append(f"{key} {metric}")
+                self.stdout.write(f"{flag} {key:<34} {metric:<20} {before:>10.3f} -> {after:>10.3f} ({change:+.1%})")
+
+        if regressions:
+            raise CommandError(f"❌ Régressions: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("✅ Aucune régression face à la baseline"))
@@ -0,0 +1,71 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+
+def _sklearn_preprocess(predictor, static_columns, lap_sequences):
+    """Ancien chemin : np.column_stack + StandardScaler.transform de sklearn"""
+    seq_length = predictor.metadata['seq_length']
+    X_static = np.column_stack(static_columns).astype(np.float64)
+    X_static_scaled = predictor.scaler_static.transform(X_static)
+
+    padded = []
+    for laps in lap_sequences:
+        if not laps:
+            laps = [90000] * seq_length
+        elif len(laps) < seq_length:
+            laps = [np.mean(laps)] * (seq_length - len(laps)) + list(laps)
+        padded.append(laps[-seq_length:])
+    X_seq = np.array(padded, dtype=np.float64)
+    X_seq_scaled = predictor.scaler_seq.transform(X_seq).reshape(len(lap_sequences), seq_length, 1)
+    return X_static_scaled, X_seq_scaled
+
+
+class Command(BaseCommand):
+    help = "Coût du prétraitement par ligne : sklearn contre noyau fusionné"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 20, 256])
+        parser.add_argument('--repeats', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        from incidents.ml.predictor import F1IncidentPredictor
+
+        predictor = F1IncidentPredictor(shared=False)
+
+        self.stdout.write(f"{'lignes':>7} {'sklearn µs/ligne':>17} {'fusionné µs/ligne':>18} {'gain':>7} {'écart max':>10}")
+        for n in options['sizes']:
+            static_columns = [
+                [random.randint(1, 20) for _ in range(n)],
+                [random.randint(0, 76) for _ in range(n)],
+                [random.randint(0, 863) for _ in range(n)],
+                [random.randint(0, 210) for _ in range(n)],
+                [2024] * n,
+                [random.randint(0, 70) for _ in range(n)],
+                [random.randint(0, 3) for _ in range(n)],
+                [random.randint(-5, 5) for _ in range(n)],
+            ]
+            lap_sequences = [
+                [90000 + random.randint(-2000, 2000) for _ in range(random.randint(0, 15))]
+                for _ in range(n)
+            ]
+
+            repeats = max(10, options['repeats'] // n)
+            before = self._per_row_us(lambda: _sklearn_preprocess(predictor, static_columns, lap_sequences), repeats, n)
+            after = self._per_row_us(lambda: predictor.preprocessor.transform(static_columns, lap_sequences), repeats, n)
+
+            ref_static, ref_seq = _sklearn_preprocess(predictor, static_columns, lap_sequences)
+            new_static, new_seq = predictor.preprocessor.transform(static_columns, lap_sequences)
+            diff = max(np.abs(ref_static - new_static).max(), np.abs(ref_seq - new_seq).max())
+
+            self.stdout.write(f"{n:>7} {before:>17.2f} {after:>18.2f} {before / after:>6.1f}x {diff:>10.1e}")
+
+    @staticmethod
+    def _per_row_us(fn, repeats, n):
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        return (time.perf_counter() - start) / repeats / n * 1e6
@@ -0,0 +1,125 @@
+import multiprocessing
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from incidents.management.commands.compare_backends import _rss_mb
+from incidents.ml.predictor import PRECISIONS
+
+
+def _measure_precision(precision, weights_dir, inputs, rows, repeats, results):
+    """Exécuté dans un processus neuf : mémoire, latence et probabilités d'une précision"""
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    from incidents.ml.predictor import F1IncidentPredictor
+    predictor = F1IncidentPredictor(backend='numpy', weights_dir=weights_dir, precision=precision)
+    load_s = time.perf_counter() - start
+
+    measure = {
+        'precision': precision,
+        'load_s': load_s,
+        'rss_mb': _rss_mb() - rss_before,
+        'weights_kb': predictor.model.weights_nbytes() / 1024,
+        'proba': {name: predictor._forward(X_static, X_seq) for name, (X_static, X_seq) in inputs.items()},
+    }
+
+    X_static, X_seq = inputs['random']
+    for label, n in (('grid_ms', rows), ('batch_ms', len(X_static))):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            predictor._forward(X_static[:n], X_seq[:n])
+            timings.append(time.perf_counter() - start)
+        measure[label] = float(np.median(timings) * 1000)
+
+    results.put(measure)
+
+
+class Command(BaseCommand):
+    help = "Écart de précision, mémoire et latence des poids float16 / int8 du backend NumPy"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help="CSV Ergast : précision sur le jeu de test (split du notebook)")
+        parser.add_argument('--weights-dir', help="Dossier de poids (défaut: version active du registre)")
+        parser.add_argument('--rows', type=int, default=20, help="Taille du lot (grille)")
+        parser.add_argument('--samples', type=int, default=512, help="Lignes aléatoires pour l'écart de probabilités")
+        parser.add_argument('--repeats', type=int, default=50)
+        parser.add_argument('--max-accuracy-drop', type=float, default=0.005,
+                            help="Perte de précision tolérée face au float32 mesuré")
+
+    def handle(self, *args, **options):
+        from incidents import loader
+        from incidents.ml.predictor import F1IncidentPredictor
+
+        weights_dir = options['weights_dir'] or loader.get_registry().resolve()
+        reference = F1IncidentPredictor(backend='numpy', weights_dir=weights_dir, precision='float32')
+        recorded_accuracy = reference.metadata.get('test_accuracy')
+
+        rng = np.random.default_rng(42)
+        n_static = reference.metadata.get('num_features_static', 8)
+        seq_length = reference.metadata['seq_length']
+        inputs = {'random': (
+            rng.normal(size=(options['samples'], n_static)).astype(np.float32),
+            rng.normal(size=(options['samples'], seq_length, 1)).astype(np.float32),
+        )}
+
+        y_test = None
+        if options['data_dir']:
+            from incidents.ml.training import build_dataset, held_out_inputs
+            dataset = build_dataset(
+                options['data_dir'], seq_length, cache_dir=f"{options['data_dir']}/.feature_cache", log=self.stdout.write
+            )
+            X_static, X_seq, y_test = held_out_inputs(dataset, reference)
+            inputs['test'] = (X_static, X_seq)
+            self.stdout.write(f"✅ Jeu de test: {len(y_test)} exemples")
+
+        # Un processus neuf par précision pour isoler le RSS
+        ctx = multiprocessing.get_context('spawn')
+        measures = {}
+        for precision in PRECISIONS:
+            results = ctx.Queue()
+            proc = ctx.Process(
+                target=_measure_precision,
+                args=(precision, weights_dir, inputs, options['rows'], options['repeats'], results),
+            )
+            proc.start()
+            measures[precision] = results.get()
+            proc.join()
+
+        baseline = measures['float32']
+        for m in measures.values():
+            m['max_diff'] = float(np.abs(m['proba']['random'] - baseline['proba']['random']).max())
+            m['same_class'] = float(
+                (m['proba']['random'].argmax(axis=1) == baseline['proba']['random'].argmax(axis=1)).mean()
+            )
+            if y_test is not None:
+                m['accuracy'] = float((m['proba']['test'].argmax(axis=1) == y_test).mean())
+
+        batch_label = f"lot {options['samples']} (ms)"
+        self.stdout.write(
+            f"{'précision':>9} {'poids (Ko)':>10} {'RSS (Mo)':>9} {'load (s)':>9} "
+            f"{'grille (ms)':>12} {batch_label:>13} {'écart max':>10} {'même classe':>12}"
+        )
+        for precision, m in measures.items():
+            self.stdout.write(
+                f"{precision:>9} {m['weights_kb']:>10.1f} {m['rss_mb']:>9.0f} {m['load_s']:>9.2f} "
+                f"{m['grid_ms']:>12.2f} {m['batch_ms']:>13.2f} {m['max_diff']:>10.2e} {m['same_class']:>12.1%}"
+            )
+
+        if y_test is None:
+            self.stdout.write("⚠️ --data-dir absent : écart de précision sur le jeu de test non mesuré")
+            return
+
+        self.stdout.write(f"\nPrécision sur le jeu de test (metadata.json: {recorded_accuracy:.4f})")
+        self.stdout.write(f"{'précision':>9} {'accuracy':>9} {'Δ float32':>10} {'Δ metadata':>11}")
+        for precision, m in measures.items():
+            self.stdout.write(
+                f"{precision:>9} {m['accuracy']:>9.4f} {m['accuracy'] - baseline['accuracy']:>+10.4f} "
+                f"{m['accuracy'] - recorded_accuracy:>+11.4f}"
+            )
+
+        worst = min(m['accuracy'] - baseline['accuracy'] for m in measures.values())
+        if -worst > options['max_accuracy_drop']:
+            raise CommandError(f"❌ Perte de précision {-worst:.4f} > {options['max_accuracy_drop']}")
+        self.stdout.write(self.style.SUCCESS("✅ Poids réduits dans la tolérance de précision"))
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from incidents.ml.predictor import PRECISIONS
+
+
+def _memory_kb(pid, mapping=None):
+    """
+    PSS / USS / RSS d'un processus en Ko (/proc/<pid>/smaps_rollup)
+
+    Avec mapping, PSS du seul fichier mappé dont le chemin est donné.
+    """
+    if mapping is None:
+        fields = {}
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+        return {
+            'rss': fields.get('Rss', 0),
+            'pss': fields.get('Pss', 0),
+            'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        }
+
+    pss, inside = 0, False
+    with open(f'/proc/{pid}/smaps') as f:
+        for line in f:
+            head = line.split()
+            if head and '-' in head[0] and not head[0].endswith(':'):
+                inside = head[-1] == mapping
+            elif inside and head[0] == 'Pss:':
+                pss += int(head[1])
+    return pss
+
+
+def _worker(weights_dir, precision, shared, shared_dir, ready, done):
+    """Worker forké : charge le prédicteur comme un worker web puis attend la mesure"""
+    from incidents.ml.predictor import F1IncidentPredictor
+
+    predictor = F1IncidentPredictor(
+        backend='numpy', weights_dir=weights_dir, precision=precision, shared=shared, shared_dir=shared_dir,
+    )
+    predictor.predict_batch([
+        ({'code': 'unknown', 'team_slug': 'unknown'}, {'slug': 'unknown'}, [90000] * 12, {'grid_position': i + 1})
+        for i in range(20)
+    ])
+    ready.put(os.getpid())
+    done.wait()
+
+
+def _export(weights_dir, precision, shared_dir):
+    from incidents.ml.shared_weights import ensure_shared
+    ensure_shared(weights_dir, precision, shared_dir)
+
+
+class Command(BaseCommand):
+    help = "PSS / USS par worker forké, poids privés contre fichier mmap partagé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+        parser.add_argument('--weights-dir', help="Dossier de poids (défaut: version active du registre)")
+        parser.add_argument('--precision', choices=PRECISIONS, default='float32')
+
+    def handle(self, *args, **options):
+        from incidents import loader
+        from incidents.ml.shared_weights import shared_path
+
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError("❌ /proc/<pid>/smaps_rollup indisponible (Linux requis)")
+
+        weights_dir = options['weights_dir'] or loader.get_registry().resolve()
+        precision = options['precision']
+        shared_dir = loader.get_shared_dir()
+
+        # Export dans un processus à part : le maître reste sans sklearn ni modèle, comme un maître gunicorn
+        spawn = multiprocessing.get_context('spawn')
+        exporter = spawn.Process(target=_export, args=(weights_dir, precision, shared_dir))
+        exporter.start()
+        exporter.join()
+        if exporter.exitcode != 0:
+            raise CommandError("❌ Export des poids partagés impossible")
+        mapping = os.path.abspath(shared_path(weights_dir, precision, shared_dir))
+        if 'sklearn' in sys.modules:
+            self.stdout.write("⚠️ sklearn déjà importé dans le maître : ses pages sont partagées dans les deux modes")
+
+        ctx = multiprocessing.get_context('fork')
+        rows = []
+        for shared in (False, True):
+            for n_workers in options['workers']:
+                ready, done = ctx.Queue(), ctx.Event()
+                procs = [
+                    ctx.Process(target=_worker, args=(weights_dir, precision, shared, shared_dir, ready, done))
+                    for _ in range(n_workers)
+                ]
+                for proc in procs:
+                    proc.start()
+                try:
+                    pids = [ready.get(timeout=120) for _ in procs]
+                    memory = [_memory_kb(pid) for pid in pids]
+                    mapped = [_memory_kb(pid, mapping) for pid in pids] if shared else [0] * n_workers
+                finally:
+                    done.set()
+                    for proc in procs:
+                        proc.join()
+
+                rows.append({
+                    'mode': 'partagé' if shared else 'privé',
+                    'workers': n_workers,
+                    'pss': sum(m['pss'] for m in memory) / n_workers / 1024,
+                    'uss': sum(m['uss'] for m in memory) / n_workers / 1024,
+                    'rss': sum(m['rss'] for m in memory) / n_workers / 1024,
+                    'total_pss': sum(m['pss'] for m in memory) / 1024,
+                    'mapped_pss': sum(mapped) / n_workers,
+                })
+
+        self.stdout.write(f"Poids: {weights_dir} ({precision}), fichier partagé {os.path.getsize(mapping) / 1024:.0f} Ko")
+        self.stdout.write(
+            f"{'mode':>8} {'workers':>8} {'PSS/worker (Mo)':>16} {'USS/worker (Mo)':>16} "
+            f"{'RSS/worker (Mo)':>16} {'PSS total (Mo)':>15} {'PSS mmap/worker (Ko)':>21}"
+        )
+        for r in rows:
+            self.stdout.write(
+                f"{r['mode']:>8} {r['workers']:>8} {r['pss']:>16.1f} {r['uss']:>16.1f} "
+                f"{r['rss']:>16.1f} {r['total_pss']:>15.1f} {r['mapped_pss']:>21.1f}"
+            )
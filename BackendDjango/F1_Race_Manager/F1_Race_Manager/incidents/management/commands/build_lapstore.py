@@ -0,0 +1,117 @@
+import csv
+import os
+import time
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from incidents.features import lap_fingerprints
+from incidents.ml.lapstore import LapStore
+from pilots.models import Pilote
+from races.models import LapTime, Race
+
+
+class Command(BaseCommand):
+    help = "Construit le stockage mmap des temps au tour (une matrice par course terminée)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Dossier du stockage (défaut: INCIDENT_LAPSTORE_DIR)")
+        parser.add_argument('--ergast-dir', help="Lit lap_times.csv Ergast au lieu de la base")
+        parser.add_argument('--races-per-batch', type=int, default=200)
+        parser.add_argument('--chunk-size', type=int, default=200000, help="Lignes CSV lues par bloc")
+        parser.add_argument('--force', action='store_true', help="Réécrit aussi les courses à jour")
+
+    def handle(self, *args, **options):
+        path = options['path'] or getattr(settings, 'INCIDENT_LAPSTORE_DIR', None)
+        if not path:
+            raise CommandError("❌ INCIDENT_LAPSTORE_DIR non configuré")
+
+        self.store = LapStore(path)
+        self.force = options['force']
+        start = time.perf_counter()
+
+        if options['ergast_dir']:
+            written, skipped = self._from_ergast(options['ergast_dir'], options['chunk_size'])
+        else:
+            written, skipped = self._from_db(options['races_per_batch'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ LapStore {path}: {written} courses écrites, {skipped} à jour ({elapsed:.1f}s)"
+        ))
+
+    def _stale(self, fingerprints):
+        return [
+            race_id for race_id, fingerprint in fingerprints.items()
+            if self.force or not self.store.is_current(race_id, fingerprint)
+        ]
+
+    def _from_db(self, races_per_batch):
+        """Réécrit les courses terminées dont les temps au tour ont changé"""
+        finished = Race.objects.filter(statut='termine').values_list('id', flat=True)
+        fingerprints = lap_fingerprints(race_ids=finished)
+        stale = self._stale(fingerprints)
+
+        written = 0
+        for i in range(0, len(stale), races_per_batch):
+            batch = stale[i:i + races_per_batch]
+            rows = np.array(
+                LapTime.objects.filter(race_id__in=batch).values_list('race_id', 'pilot_id', 'lap', 'milliseconds'),
+                dtype=np.int64,
+            ).reshape(-1, 4)
+            written += len(self.store.write_many(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], fingerprints))
+            self.stdout.write(f"🔄 {min(i + races_per_batch, len(stale))}/{len(stale)} courses")
+
+        return written, len(fingerprints) - len(stale)
+
+    def _from_ergast(self, directory, chunk_size):
+        """Lit lap_times.csv par blocs, avec les ids Django des courses et pilotes importés"""
+        lap_path = os.path.join(directory, 'lap_times.csv')
+        drivers_path = os.path.join(directory, 'drivers.csv')
+        if not os.path.exists(lap_path) or not os.path.exists(drivers_path):
+            raise CommandError(f"❌ lap_times.csv ou drivers.csv absent de {directory}")
+
+        races = dict(Race.objects.exclude(ergast_id__isnull=True).values_list('ergast_id', 'id'))
+        pilots = dict(Pilote.objects.exclude(ergast_ref__isnull=True).values_list('ergast_ref', 'id'))
+        with open(drivers_path, newline='', encoding='utf-8') as f:
+            drivers = {
+                int(row['driverId']): pilots[row['driverRef']]
+                for row in csv.DictReader(f) if row['driverRef'] in pilots
+            }
+
+        columns = []
+        with open(lap_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            while True:
+                chunk = list(islice(reader, chunk_size))
+                if not chunk:
+                    break
+                block = np.empty((len(chunk), 4), dtype=np.int64)
+                n = 0
+                for row in chunk:
+                    race_id = races.get(int(row['raceId']))
+                    pilot_id = drivers.get(int(row['driverId']))
+                    try:
+                        milliseconds = int(row['milliseconds'])
+                    except ValueError:
+                        continue
+                    if race_id is None or pilot_id is None:
+                        continue
+                    block[n] = (race_id, pilot_id, int(row['lap']), milliseconds)
+                    n += 1
+                columns.append(block[:n])
+
+        rows = np.concatenate(columns) if columns else np.empty((0, 4), dtype=np.int64)
+        race_ids, counts = np.unique(rows[:, 0], return_counts=True)
+        totals = np.bincount(np.searchsorted(race_ids, rows[:, 0]), weights=rows[:, 3], minlength=len(race_ids))
+        fingerprints = {
+            int(race_id): f'csv:{count}:{int(total)}'
+            for race_id, count, total in zip(race_ids, counts, totals)
+        }
+
+        stale = np.isin(rows[:, 0], self._stale(fingerprints))
+        rows = rows[stale]
+        written = self.store.write_many(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], fingerprints)
+        return len(written), len(fingerprints) - len(written)
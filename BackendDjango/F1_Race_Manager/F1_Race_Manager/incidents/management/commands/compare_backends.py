@@ -0,0 +1,98 @@
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _rss_mb():
+    """RSS courant du processus en Mo (pic si /proc indisponible)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure_backend(backend, X_static, X_seq, repeats, results):
+    """Exécuté dans un processus neuf : chargement, latence, RSS et probabilités"""
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    from incidents.ml.predictor import F1IncidentPredictor
+    predictor = F1IncidentPredictor(backend=backend)
+    load_s = time.perf_counter() - start
+
+    proba = np.asarray(predictor._forward(X_static, X_seq))
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predictor._forward(X_static, X_seq)
+        timings.append(time.perf_counter() - start)
+
+    results.put({
+        'backend': backend,
+        'load_s': load_s,
+        'latency_ms': float(np.median(timings) * 1000),
+        'rss_mb': _rss_mb() - rss_before,
+        'proba': proba,
+    })
+
+
+class Command(BaseCommand):
+    help = "Parité, latence et mémoire du backend NumPy face au backend Keras"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20, help="Taille du lot (grille)")
+        parser.add_argument('--samples', type=int, default=512, help="Lignes aléatoires pour la parité")
+        parser.add_argument('--repeats', type=int, default=50)
+        parser.add_argument('--tolerance', type=float, default=1e-4)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        X_static = rng.normal(size=(options['samples'], 8)).astype(np.float32)
+        X_seq = rng.normal(size=(options['samples'], 10, 1)).astype(np.float32)
+
+        # Un processus neuf par backend pour isoler le RSS
+        ctx = multiprocessing.get_context('spawn')
+        measures = {}
+        for backend in ('keras', 'numpy'):
+            results = ctx.Queue()
+            proc = ctx.Process(
+                target=_measure_backend,
+                args=(backend, X_static, X_seq, options['repeats'], results),
+            )
+            proc.start()
+            measures[backend] = results.get()
+            proc.join()
+
+        # Latence mesurée sur un lot de la taille d'une grille
+        for backend in ('keras', 'numpy'):
+            results = ctx.Queue()
+            proc = ctx.Process(
+                target=_measure_backend,
+                args=(backend, X_static[:options['rows']], X_seq[:options['rows']], options['repeats'], results),
+            )
+            proc.start()
+            measures[backend]['grid_latency_ms'] = results.get()['latency_ms']
+            proc.join()
+
+        keras_proba = measures['keras']['proba']
+        numpy_proba = measures['numpy']['proba']
+        max_diff = float(np.abs(keras_proba - numpy_proba).max())
+        same_class = float((keras_proba.argmax(axis=1) == numpy_proba.argmax(axis=1)).mean())
+
+        self.stdout.write(f"{'backend':>8} {'load (s)':>9} {'RSS (Mo)':>9} {'lot grille (ms)':>16} {f'lot {len(X_static)} (ms)':>14}")
+        for backend, m in measures.items():
+            self.stdout.write(
+                f"{backend:>8} {m['load_s']:>9.2f} {m['rss_mb']:>9.0f} "
+                f"{m['grid_latency_ms']:>16.2f} {m['latency_ms']:>14.2f}"
+            )
+        self.stdout.write(f"Écart max des probabilités: {max_diff:.2e} | Même classe: {same_class:.1%}")
+
+        if max_diff > options['tolerance']:
+            raise CommandError(f"❌ Parité non respectée ({max_diff:.2e} > {options['tolerance']:.0e})")
+        self.stdout.write(self.style.SUCCESS("✅ Parité NumPy / Keras respectée"))
@@ -0,0 +1,19 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from incidents.ml.numpy_engine import export_weights
+
+
+class Command(BaseCommand):
+    help = "Exporte les poids de f1_model.h5 en .npz pour le backend NumPy"
+
+    def add_arguments(self, parser):
+        weights_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'ml', 'weights')
+        parser.add_argument('--h5', default=os.path.join(weights_dir, 'f1_model.h5'))
+        parser.add_argument('--out', default=os.path.join(weights_dir, 'f1_model_weights.npz'))
+
+    def handle(self, *args, **options):
+        export_weights(options['h5'], options['out'])
+        size_kb = os.path.getsize(options['out']) / 1024
+        self.stdout.write(self.style.SUCCESS(f"✅ Poids exportés: {options['out']} ({size_kb:.0f} KB)"))
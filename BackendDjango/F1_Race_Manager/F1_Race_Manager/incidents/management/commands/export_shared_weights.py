@@ -0,0 +1,33 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from incidents.ml.predictor import PRECISIONS
+
+
+class Command(BaseCommand):
+    help = "Exporte les poids de la version active en un fichier mmap partagé par les workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weights-dir', help="Dossier de poids (défaut: version active du registre)")
+        parser.add_argument('--precision', choices=PRECISIONS, nargs='+', default=['float32'])
+        parser.add_argument('--force', action='store_true', help="Réexporte même si le fichier est à jour")
+
+    def handle(self, *args, **options):
+        from incidents import loader
+        from incidents.ml.shared_weights import SharedWeights, export_shared, is_current, shared_path
+
+        weights_dir = options['weights_dir'] or loader.get_registry().resolve()
+        shared_dir = loader.get_shared_dir()
+        for precision in options['precision']:
+            if options['force'] or not is_current(weights_dir, precision, shared_dir):
+                export_shared(weights_dir, precision, shared_dir=shared_dir)
+                status = "exporté"
+            else:
+                status = "déjà à jour"
+
+            path = shared_path(weights_dir, precision, shared_dir)
+            SharedWeights(path)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {path} {status} ({os.path.getsize(path) / 1024:.0f} KB)"
+            ))
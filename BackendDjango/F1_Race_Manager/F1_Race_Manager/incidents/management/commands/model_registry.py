@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from incidents import loader
+from incidents.ml.registry import RegistryError
+
+
+class Command(BaseCommand):
+    help = "Registre des modèles : list, register <dossier>, promote <version>, rollback"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+        subparsers.add_parser('list', help="Versions enregistrées")
+        register = subparsers.add_parser('register', help="Enregistre un dossier de poids")
+        register.add_argument('source_dir')
+        register.add_argument('--version', dest='model_version', help="Nom de version (défaut: metadata.json)")
+        register.add_argument('--promote', action='store_true', help="Active la version enregistrée")
+        promote = subparsers.add_parser('promote', help="Active une version")
+        promote.add_argument('model_version')
+        subparsers.add_parser('rollback', help="Réactive la version précédente")
+
+    def handle(self, *args, **options):
+        registry = loader.get_registry()
+        action = options['action']
+
+        try:
+            if action == 'list':
+                for entry in registry.versions():
+                    marker = '*' if entry['active'] else ' '
+                    accuracy = f"{entry['accuracy']:.2%}" if entry['accuracy'] is not None else '-'
+                    self.stdout.write(
+                        f"{marker} {entry['version']:<20} {entry['source']:<8} "
+                        f"accuracy {accuracy:<8} entraîné {entry['trained_date'] or '-'}"
+                    )
+                return
+
+            if action == 'register':
+                version = registry.register(options['source_dir'], options['model_version'])
+                self.stdout.write(self.style.SUCCESS(f"✅ Version {version} enregistrée"))
+                if getattr(settings, 'INCIDENT_PREDICTOR_SHARED', False):
+                    # Les workers n'auront qu'à ouvrir le fichier mmap à la bascule
+                    from incidents.ml.shared_weights import ensure_shared
+                    ensure_shared(
+                        registry.resolve(version),
+                        getattr(settings, 'INCIDENT_PREDICTOR_PRECISION', 'float32'),
+                        loader.get_shared_dir(),
+                    )
+                    self.stdout.write(self.style.SUCCESS(f"✅ Poids partagés exportés pour {version}"))
+                if options['promote']:
+                    registry.promote(version)
+                    self.stdout.write(self.style.SUCCESS(f"✅ Version {version} active"))
+                return
+
+            if action == 'promote':
+                version = registry.promote(options['model_version'])
+            else:
+                version = registry.rollback()
+        except RegistryError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Version active: {version or 'weights/ livré'} "
+            f"(les processus basculent sous {getattr(settings, 'INCIDENT_MODEL_POLL_SECONDS', 2)}s)"
+        ))
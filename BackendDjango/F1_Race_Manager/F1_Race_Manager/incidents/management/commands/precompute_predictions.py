@@ -0,0 +1,134 @@
+import os
+import time
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from incidents import risk_cube
+from incidents.models import IncidentPrediction
+from races.models import Race
+
+
+def _init_worker():
+    """Initialisation d'un processus : Django prêt, prédicteur chargé une fois par processus"""
+    import django
+    django.setup()
+
+    from incidents import loader
+    loader.get_predictor()
+
+
+def _predict_shard(race_ids):
+    """
+    Prédit un lot de courses dans un processus (lectures seules)
+
+    Returns:
+        (version du modèle, [(race_id, fingerprint, [(pilot_id, risks), ...]), ...])
+    """
+    from incidents import loader
+    from incidents.features import race_rows
+    from incidents.prediction_cache import race_fingerprint
+
+    predictor = loader.get_predictor()
+    seq_length = predictor.get_info()['seq_length']
+
+    races = Race.objects.select_related('season', 'circuit').in_bulk(race_ids)
+    shard_rows = []
+    spans = []
+    for race_id in race_ids:
+        race = races[race_id]
+        results = list(race.results.select_related('pilot'))
+        rows = race_rows(race, results, seq_length)
+        spans.append((race, [r.pilot_id for r in results], len(shard_rows), len(rows)))
+        shard_rows.extend(rows)
+
+    # Une seule passe du modèle pour tout le lot
+    all_risks = predictor.predict_batch(shard_rows)
+
+    output = []
+    for race, pilot_ids, start, n in spans:
+        output.append((race.id, race_fingerprint(race), list(zip(pilot_ids, all_risks[start:start + n]))))
+    return predictor.get_info()['version'], output
+
+
+class Command(BaseCommand):
+    help = "Précalcule et stocke les prédictions d'incidents de toutes les courses d'une saison"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', type=int, required=True, help="Année de la saison")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--races-per-shard', type=int, default=4)
+        parser.add_argument('--status', default=None, help="Filtre sur le statut des courses (ex: termine)")
+
+    def handle(self, *args, **options):
+        from incidents import loader
+        from incidents.views import _analyze_risk
+
+        races = Race.objects.filter(season__annee=options['season'], results__isnull=False)
+        if options['status']:
+            races = races.filter(statut=options['status'])
+        race_ids = sorted(set(races.values_list('id', flat=True)))
+        if not race_ids:
+            raise CommandError(f"❌ Aucune course avec résultats pour la saison {options['season']}")
+
+        size = options['races_per_shard']
+        shards = [race_ids[i:i + size] for i in range(0, len(race_ids), size)]
+        workers = max(1, min(options['workers'], len(shards)))
+
+        if workers == 1:
+            if loader.get_predictor() is None:
+                raise CommandError("❌ Prédicteur indisponible")
+            results = map(_predict_shard, shards)
+            pool = None
+        else:
+            # Backend NumPy : chargé avant le fork, partagé en copie sur écriture.
+            # TensorFlow ne supporte pas le fork : chaque processus charge alors son modèle.
+            if getattr(settings, 'INCIDENT_PREDICTOR_BACKEND', 'keras') == 'numpy' and loader.get_predictor() is None:
+                raise CommandError("❌ Prédicteur indisponible")
+            # Les connexions ouvertes ne doivent pas être partagées avec les processus
+            connections.close_all()
+            pool = get_context('fork').Pool(workers, initializer=_init_worker)
+            results = pool.imap_unordered(_predict_shard, shards)
+
+        start = time.perf_counter()
+        written = done = 0
+        model_version = None
+        try:
+            for model_version, shard in results:
+                objects = []
+                for race_id, fingerprint, entries in shard:
+                    for pilot_id, risks in entries:
+                        objects.append(IncidentPrediction(
+                            race_id=race_id,
+                            pilot_id=pilot_id,
+                            model_version=model_version,
+                            fingerprint=fingerprint,
+                            risque_total=risks['risque_total'],
+                            risk_level=_analyze_risk(risks['risque_total'])[0],
+                            **{name: risks.get(name, 0.0) for name in IncidentPrediction.PROBABILITY_FIELDS},
+                        ))
+
+                # Remplace les prédictions de ces courses pour cette version
+                with transaction.atomic():
+                    IncidentPrediction.objects.filter(
+                        race_id__in=[race_id for race_id, _, _ in shard], model_version=model_version
+                    ).delete()
+                    IncidentPrediction.objects.bulk_create(objects, batch_size=1000)
+                # Agrégats (circuit, écurie, saison) des courses du lot
+                risk_cube.refresh_races([race_id for race_id, _, _ in shard], model_version)
+
+                written += len(objects)
+                done += len(shard)
+                self.stdout.write(f"🔄 {done}/{len(race_ids)} courses")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Saison {options['season']}: {written} prédictions ({len(race_ids)} courses, "
+            f"{workers} processus, modèle {model_version}) en {elapsed:.1f}s"
+        ))
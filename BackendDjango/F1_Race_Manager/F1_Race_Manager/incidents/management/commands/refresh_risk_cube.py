@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from incidents import risk_cube
+
+
+class Command(BaseCommand):
+    help = "Recalcule le cube de risques (circuit, écurie, saison) depuis les prédictions stockées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', type=int, help="Année de la saison (défaut: toutes)")
+        parser.add_argument('--model-version', help="Version du modèle (défaut: toutes)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = risk_cube.rebuild(options['season'], options['model_version'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {written} agrégats recalculés en {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from incidents.inference_server import InferenceServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Sert le prédicteur IA sur un socket Unix (protocole binaire) depuis des processus dédiés ; "
+        "les workers web s'y connectent via INCIDENT_INFERENCE_SOCKET"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None, help="Chemin du socket (défaut: INCIDENT_INFERENCE_SOCKET)")
+        parser.add_argument('--workers', type=int, default=None, help="Processus d'inférence (défaut: INCIDENT_INFERENCE_WORKERS)")
+        parser.add_argument('--backlog', type=int, default=128)
+
+    def handle(self, *args, **options):
+        path = options['socket'] or getattr(settings, 'INCIDENT_INFERENCE_SOCKET', '')
+        if not path:
+            raise CommandError("❌ Socket requis : --socket ou F1_INFERENCE_SOCKET")
+        workers = options['workers'] or getattr(settings, 'INCIDENT_INFERENCE_WORKERS', 2)
+
+        server = InferenceServer(path, n_workers=workers, backlog=options['backlog'], log=self.stdout.write)
+        try:
+            server.serve_forever()
+        except RuntimeError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,54 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Construit le jeu de données Ergast et entraîne le modèle CNN+LSTM (artefacts weights/)"
+
+    def add_arguments(self, parser):
+        weights_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'ml', 'weights')
+        parser.add_argument('data_dir', help="Dossier contenant les CSV Ergast")
+        parser.add_argument('--output', default=weights_dir, help="Dossier des artefacts (défaut: ml/weights)")
+        parser.add_argument('--cache-dir', help="Cache des features (défaut: <data_dir>/.feature_cache)")
+        parser.add_argument('--no-cache', action='store_true')
+        parser.add_argument('--seq-length', type=int, default=10)
+        parser.add_argument('--epochs', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=64)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--model-version', default='1.0')
+        parser.add_argument('--dataset-only', action='store_true', help="Construit les features sans entraîner")
+
+    def handle(self, *args, **options):
+        from incidents.ml.training import build_dataset, export_artifacts, train_model
+
+        data_dir = options['data_dir']
+        if not os.path.isdir(data_dir):
+            raise CommandError(f"❌ Dossier introuvable: {data_dir}")
+
+        cache_dir = None
+        if not options['no_cache']:
+            cache_dir = options['cache_dir'] or os.path.join(data_dir, '.feature_cache')
+
+        start = time.perf_counter()
+        dataset = build_dataset(data_dir, options['seq_length'], cache_dir=cache_dir, log=self.stdout.write)
+        self.stdout.write(
+            f"✅ Features: {len(dataset['y'])} exemples, "
+            f"classes {', '.join(dataset['classes']['incident'])} ({time.perf_counter() - start:.2f}s)"
+        )
+        if options['dataset_only']:
+            return
+
+        trained = train_model(
+            dataset,
+            epochs=options['epochs'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        metadata = export_artifacts(options['output'], trained, dataset, model_version=options['model_version'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Modèle {metadata['model_version']} exporté dans {options['output']} "
+            f"(accuracy test: {metadata['test_accuracy']:.2%})"
+        ))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from incidents import loader
+
+
+class Command(BaseCommand):
+    help = "Charge le prédicteur IA et lance une passe factice de préchauffage"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        loader.load_predictor(force=True)
+        if loader.warm_up() is None:
+            raise CommandError(f"❌ Échec du chargement: {loader.predictor_status()['error']}")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"✅ Prédicteur prêt en {elapsed:.2f}s"))
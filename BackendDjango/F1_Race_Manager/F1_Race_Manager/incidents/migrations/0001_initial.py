@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('pilots', '0002_pilote_ergast_ref'),
+        ('races', '0004_ergast_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(max_length=50, verbose_name='Version du modèle')),
+                ('fingerprint', models.CharField(help_text='race_fingerprint() au moment du calcul', max_length=32, verbose_name='Empreinte des données')),
+                ('collision', models.FloatField(default=0.0, verbose_name='Collision')),
+                ('panne_moteur', models.FloatField(default=0.0, verbose_name='Panne moteur')),
+                ('probleme_pneus', models.FloatField(default=0.0, verbose_name='Problème pneus')),
+                ('safety_car', models.FloatField(default=0.0, verbose_name='Safety car')),
+                ('risque_total', models.FloatField(verbose_name='Risque total')),
+                ('risk_level', models.CharField(choices=[('LOW', 'Faible'), ('MODERATE', 'Modéré'), ('HIGH', 'Élevé'), ('CRITICAL', 'Critique')], max_length=10, verbose_name='Niveau de risque')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pilot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_predictions', to='pilots.pilote', verbose_name='Pilote')),
+                ('race', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_predictions', to='races.race', verbose_name='Course')),
+            ],
+            options={
+                'verbose_name': "Prédiction d'incident",
+                'verbose_name_plural': "Prédictions d'incidents",
+                'ordering': ['race', 'id'],
+                'indexes': [models.Index(fields=['race', 'model_version', 'fingerprint'], name='incident_pred_lookup_idx')],
+                'constraints': [models.UniqueConstraint(fields=('race', 'pilot', 'model_version'), name='unique_incident_prediction')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circuits', '0002_circuit_ergast_ref'),
+        ('incidents', '0001_initial'),
+        ('races', '0004_ergast_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentRiskRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('constructor', models.CharField(max_length=150, verbose_name='Écurie')),
+                ('model_version', models.CharField(max_length=50, verbose_name='Version du modèle')),
+                ('n_predictions', models.PositiveIntegerField(default=0, verbose_name='Prédictions')),
+                ('high_count', models.PositiveIntegerField(default=0, verbose_name='Risques élevés')),
+                ('critical_count', models.PositiveIntegerField(default=0, verbose_name='Risques critiques')),
+                ('mean_collision', models.FloatField(default=0.0)),
+                ('mean_panne_moteur', models.FloatField(default=0.0)),
+                ('mean_probleme_pneus', models.FloatField(default=0.0)),
+                ('mean_safety_car', models.FloatField(default=0.0)),
+                ('mean_risque_total', models.FloatField(default=0.0)),
+                ('max_collision', models.FloatField(default=0.0)),
+                ('max_panne_moteur', models.FloatField(default=0.0)),
+                ('max_probleme_pneus', models.FloatField(default=0.0)),
+                ('max_safety_car', models.FloatField(default=0.0)),
+                ('max_risque_total', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('circuit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_rollups', to='circuits.circuit', verbose_name='Circuit')),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_rollups', to='races.season', verbose_name='Saison')),
+            ],
+            options={
+                'verbose_name': 'Agrégat de risques',
+                'verbose_name_plural': 'Agrégats de risques',
+                'ordering': ['season', 'circuit', 'constructor'],
+                'indexes': [models.Index(fields=['model_version', 'season'], name='incident_rollup_season_idx'), models.Index(fields=['model_version', 'constructor'], name='incident_rollup_constr_idx')],
+                'constraints': [models.UniqueConstraint(fields=('circuit', 'season', 'constructor', 'model_version'), name='unique_incident_rollup')],
+            },
+        ),
+    ]
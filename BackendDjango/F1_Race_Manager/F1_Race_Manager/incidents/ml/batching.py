@@ -0,0 +1,161 @@
+# incidents/ml/batching.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from . import metrics
+
+
+class MicroBatcher:
+    """
+    Regroupe les lignes de plusieurs requêtes concurrentes en un seul lot
+
+    Chaque appelant soumet ses lignes via submit() et attend sa tranche de
+    résultats. Un thread de fond collecte les requêtes pendant au plus
+    max_wait_ms (ou jusqu'à max_batch_rows lignes), lance une seule passe
+    de prédiction puis redistribue les résultats.
+    """
+
+    def __init__(self, predict_fn, max_wait_ms=5, max_batch_rows=64):
+        """
+        Args:
+            predict_fn: fonction liste de lignes -> liste de résultats
+                        (ex: F1IncidentPredictor.predict_batch)
+            max_wait_ms: fenêtre de collecte en millisecondes
+            max_batch_rows: nombre de lignes qui déclenche la prédiction
+        """
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._closed = False
+
+        # Métriques
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._requests = 0
+        self._batches = 0
+        self._rows = 0
+        self._batch_sizes = {}
+
+    def submit(self, rows, timeout=None):
+        """Soumet des lignes et bloque jusqu'à obtenir leurs résultats"""
+        if not rows:
+            return []
+
+        self._ensure_worker()
+        future = Future()
+
+        with self._lock:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._requests += 1
+                self._queue_depth += len(rows)
+                self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+                self._queue.put((list(rows), future, time.perf_counter()))
+
+        # Batcher retiré (ancienne version du modèle) : prédiction directe
+        if closed:
+            return self.predict_fn(list(rows))
+        return future.result(timeout)
+
+    def close(self):
+        """Traite les requêtes déjà en file puis arrête le thread de fond"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+
+    def get_stats(self):
+        """Retourne les métriques de file et de taille de lot"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue_depth,
+                'max_queue_depth': self._max_queue_depth,
+                'requests': self._requests,
+                'batches': self._batches,
+                'rows': self._rows,
+                'avg_batch_size': round(self._rows / self._batches, 2) if self._batches else 0.0,
+                'batch_size_histogram': {
+                    f'<={bucket}': count
+                    for bucket, count in sorted(self._batch_sizes.items())
+                },
+                'max_wait_ms': self.max_wait * 1000.0,
+                'max_batch_rows': self.max_batch_rows,
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name='incident-microbatcher', daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            n_rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+
+            # Collecter jusqu'à la fin de la fenêtre ou N lignes
+            while n_rows < self.max_batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # close() : dernier lot puis arrêt
+                    stopping = True
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+
+            self._flush(batch, n_rows)
+
+    def _flush(self, batch, n_rows):
+        all_rows = [row for rows, _, _ in batch for row in rows]
+
+        # Attente de chaque requête dans la file avant la passe
+        now = time.perf_counter()
+        for _, _, enqueued in batch:
+            metrics.observe_stage('batch_wait', now - enqueued)
+
+        with self._lock:
+            self._queue_depth -= n_rows
+            self._batches += 1
+            self._rows += n_rows
+            bucket = 1
+            while bucket < n_rows:
+                bucket *= 2
+            self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+
+        try:
+            results = self.predict_fn(all_rows)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        # Renvoyer à chaque appelant sa tranche
+        offset = 0
+        for rows, future, _ in batch:
+            future.set_result(results[offset:offset + len(rows)])
+            offset += len(rows)
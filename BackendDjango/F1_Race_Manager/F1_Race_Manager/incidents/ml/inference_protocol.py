@@ -0,0 +1,190 @@
+# incidents/ml/inference_protocol.py
+
+"""
+Protocole binaire du serveur d'inférence (manage.py run_inference_server)
+
+Trame : en-tête fixe '<2sBBI' (magie b'F1', version, opération ou statut,
+longueur du corps) suivi du corps. Une connexion porte une requête à la
+fois ; le client garde ses connexions ouvertes (pool).
+
+PREDICT, requête :
+    '<III' lignes, chaînes, tours
+    table de chaînes : '<H' longueur + UTF-8, pour chaque chaîne
+    uint16 [lignes, 3]  : index (code pilote, écurie, circuit) dans la table
+    float32 [lignes, 5] : grid_position, year, laps_completed, num_pit_stops, position_change
+    uint16 [lignes]     : nombre de tours de chaque ligne
+    float32 [tours]     : temps au tour (ms), lignes à la suite
+
+PREDICT, réponse : '<II' lignes, classes puis float32 [lignes, classes].
+INFO : corps JSON (messages de contrôle, hors chemin chaud).
+
+Tout est en float32 comme X_static / X_seq : l'aller-retour ne change
+pas les entrées du modèle.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b'F1'
+VERSION = 1
+
+OP_INFO = 1
+OP_PREDICT = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# Colonnes numériques d'une ligne et valeurs par défaut de F1IncidentPredictor._build_inputs
+RACE_FIELDS = ('grid_position', 'year', 'laps_completed', 'num_pit_stops', 'position_change')
+RACE_DEFAULTS = {'grid_position': 10, 'year': 2024, 'num_pit_stops': 0, 'position_change': 0}
+
+_HEADER = struct.Struct('<2sBBI')
+_PREDICT = struct.Struct('<III')
+_PROBA = struct.Struct('<II')
+_STRING = struct.Struct('<H')
+
+
+class ProtocolError(Exception):
+    """Trame invalide ou serveur en erreur (message renvoyé par le serveur)"""
+
+
+class ConnectionClosed(ConnectionError):
+    """La connexion a été fermée par l'autre côté"""
+
+
+def write_frame(sock, code, body=b''):
+    sock.sendall(_HEADER.pack(MAGIC, VERSION, code, len(body)) + body)
+
+
+def read_frame(sock):
+    """(opération ou statut, corps) de la trame suivante"""
+    magic, version, code, length = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ProtocolError(f"Trame inconnue (magie {magic!r}, version {version})")
+    return code, _recv_exact(sock, length)
+
+
+def _recv_exact(sock, n):
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
+    while received < n:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionClosed("Connexion fermée")
+        received += count
+    return buffer
+
+
+def encode_rows(rows, seq_length):
+    """
+    Corps PREDICT des lignes (pilot_data, circuit_data, lap_times, race_data)
+
+    Seuls les seq_length derniers tours sont envoyés (le prétraitement
+    n'utilise pas les autres) ; laps_completed garde le total.
+    """
+    strings = {}
+
+    def index(value):
+        value = 'unknown' if value is None else str(value)
+        return strings.setdefault(value, len(strings))
+
+    n = len(rows)
+    codes = np.empty((n, 3), dtype=np.uint16)
+    numbers = np.empty((n, len(RACE_FIELDS)), dtype=np.float32)
+    lengths = np.empty(n, dtype=np.uint16)
+    laps = []
+    for i, (pilot, circuit, lap_times, race) in enumerate(rows):
+        codes[i] = (
+            index(pilot.get('code', 'unknown')),
+            index(pilot.get('team_slug', 'unknown')),
+            index(circuit.get('slug', 'unknown')),
+        )
+        lap_times = [] if lap_times is None else lap_times
+        numbers[i] = [
+            race.get(field, len(lap_times)) if field == 'laps_completed' else race.get(field, RACE_DEFAULTS[field])
+            for field in RACE_FIELDS
+        ]
+        kept = lap_times[-seq_length:] if len(lap_times) else []
+        lengths[i] = len(kept)
+        laps.extend(kept)
+
+    if len(strings) > 0xFFFF:
+        raise ProtocolError("Trop de chaînes distinctes dans un lot")
+    table = b''.join(_STRING.pack(len(raw)) + raw for raw in (s.encode() for s in strings))
+    return b''.join((
+        _PREDICT.pack(n, len(strings), len(laps)),
+        table,
+        codes.tobytes(),
+        numbers.tobytes(),
+        lengths.tobytes(),
+        np.asarray(laps, dtype=np.float32).tobytes(),
+    ))
+
+
+def decode_rows(body):
+    """Lignes au format de F1IncidentPredictor.predict_batch depuis un corps PREDICT"""
+    try:
+        return _decode_rows(memoryview(body))
+    except (struct.error, ValueError, IndexError, UnicodeDecodeError) as e:
+        raise ProtocolError(f"Corps PREDICT invalide: {e}") from e
+
+
+def _decode_rows(body):
+    n, n_strings, n_laps = _PREDICT.unpack_from(body)
+    offset = _PREDICT.size
+
+    strings = []
+    for _ in range(n_strings):
+        (length,) = _STRING.unpack_from(body, offset)
+        offset += _STRING.size
+        strings.append(bytes(body[offset:offset + length]).decode())
+        offset += length
+
+    def array(dtype, count, shape):
+        nonlocal offset
+        values = np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape)
+        offset += values.nbytes
+        return values
+
+    codes = array(np.uint16, n * 3, (n, 3))
+    numbers = array(np.float32, n * len(RACE_FIELDS), (n, len(RACE_FIELDS)))
+    lengths = array(np.uint16, n, (n,))
+    laps = array(np.float32, n_laps, (n_laps,))
+    if offset != len(body) or int(lengths.sum()) != n_laps:
+        raise ProtocolError("Corps PREDICT incohérent")
+
+    rows = []
+    bounds = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+    for i in range(n):
+        driver, team, circuit = (strings[j] for j in codes[i])
+        rows.append((
+            {'code': driver, 'team_slug': team},
+            {'slug': circuit},
+            laps[bounds[i]:bounds[i + 1]],
+            dict(zip(RACE_FIELDS, numbers[i].tolist())),
+        ))
+    return rows
+
+
+def encode_proba(proba):
+    proba = np.ascontiguousarray(proba, dtype=np.float32)
+    return _PROBA.pack(*proba.shape) + proba.tobytes()
+
+
+def decode_proba(body):
+    try:
+        n, n_classes = _PROBA.unpack_from(body)
+        return np.frombuffer(body, dtype=np.float32, count=n * n_classes, offset=_PROBA.size).reshape(n, n_classes)
+    except (struct.error, ValueError) as e:
+        raise ProtocolError(f"Réponse PREDICT invalide: {e}") from e
+
+
+def encode_json(payload):
+    return json.dumps(payload).encode()
+
+
+def decode_json(body):
+    return json.loads(bytes(body).decode())
@@ -0,0 +1,150 @@
+# incidents/ml/lapstore.py
+
+import json
+import os
+import threading
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+
+
+class LapStore:
+    """
+    Stockage colonnaire des temps au tour, une matrice mmap par course
+
+    Chaque course est écrite dans race_<id>.npy : matrice int32
+    [n_pilotes, n_tours] en millisecondes (colonne = numéro de tour - 1,
+    0 = tour non couru), et race_<id>.pilots.npy : ids des pilotes (lignes).
+    Les fichiers sont ouverts avec np.load(mmap_mode='r') : une fenêtre
+    [n_pilotes, seq_length] à un tour donné est une vue, sans copie.
+
+    manifest.json garde l'empreinte de la source de chaque course pour ne
+    réécrire que les courses nouvelles ou modifiées.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open = {}
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, f'{MANIFEST}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    def _file(self, race_id, suffix=''):
+        return os.path.join(self.path, f'race_{race_id}{suffix}.npy')
+
+    # --- Écriture ---
+
+    def is_current(self, race_id, fingerprint):
+        entry = self.manifest.get(str(race_id))
+        return entry is not None and entry.get('fingerprint') == fingerprint
+
+    def write_race(self, race_id, pilot_ids, laps, milliseconds, fingerprint=None, save_manifest=True):
+        """
+        Écrit (ou remplace) une course à partir de colonnes pilote / tour / ms
+        """
+        pilot_ids = np.asarray(pilot_ids, dtype=np.int64)
+        laps = np.asarray(laps, dtype=np.int64)
+        milliseconds = np.asarray(milliseconds, dtype=np.int32)
+
+        pilots, rows = np.unique(pilot_ids, return_inverse=True)
+        n_laps = int(laps.max()) if len(laps) else 0
+        matrix = np.zeros((len(pilots), n_laps), dtype=np.int32)
+        matrix[rows, laps - 1] = milliseconds
+
+        os.makedirs(self.path, exist_ok=True)
+        for suffix, array in (('', matrix), ('.pilots', pilots)):
+            tmp = self._file(race_id, suffix) + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, self._file(race_id, suffix))
+
+        with self._lock:
+            self._open.pop(int(race_id), None)
+            self.manifest[str(race_id)] = {
+                'fingerprint': fingerprint,
+                'n_drivers': int(len(pilots)),
+                'n_laps': n_laps,
+            }
+        if save_manifest:
+            self._save_manifest()
+
+    def write_many(self, race_ids, pilot_ids, laps, milliseconds, fingerprints=None):
+        """Écrit plusieurs courses à partir de colonnes concaténées (ex: lap_times.csv)"""
+        race_ids = np.asarray(race_ids, dtype=np.int64)
+        if len(race_ids) == 0:
+            return []
+        order = np.argsort(race_ids, kind='stable')
+        race_ids = race_ids[order]
+        pilot_ids = np.asarray(pilot_ids)[order]
+        laps = np.asarray(laps)[order]
+        milliseconds = np.asarray(milliseconds)[order]
+
+        starts = np.flatnonzero(np.r_[True, race_ids[1:] != race_ids[:-1]])
+        ends = np.r_[starts[1:], len(race_ids)]
+        written = []
+        for start, end in zip(starts, ends):
+            race_id = int(race_ids[start])
+            fingerprint = (fingerprints or {}).get(race_id)
+            self.write_race(
+                race_id, pilot_ids[start:end], laps[start:end], milliseconds[start:end],
+                fingerprint=fingerprint, save_manifest=False
+            )
+            written.append(race_id)
+        self._save_manifest()
+        return written
+
+    # --- Lecture ---
+
+    def __contains__(self, race_id):
+        return str(race_id) in self.manifest
+
+    def race(self, race_id):
+        """(pilot_ids, matrice [n_pilotes, n_tours]) en lecture seule via mmap"""
+        race_id = int(race_id)
+        opened = self._open.get(race_id)
+        if opened is None:
+            opened = (
+                np.load(self._file(race_id, '.pilots')),
+                np.load(self._file(race_id), mmap_mode='r'),
+            )
+            with self._lock:
+                self._open[race_id] = opened
+        return opened
+
+    def window(self, race_id, upto_lap, seq_length):
+        """
+        Fenêtre [n_pilotes, seq_length] des tours (upto_lap - seq_length, upto_lap]
+
+        Vue sans copie dès que upto_lap >= seq_length.
+        """
+        pilots, matrix = self.race(race_id)
+        upto_lap = min(upto_lap, matrix.shape[1])
+        return pilots, matrix[:, max(0, upto_lap - seq_length):upto_lap]
+
+    def last_laps(self, race_id, seq_length):
+        """
+        Derniers seq_length tours courus de chaque pilote
+
+        Returns:
+            {pilot_id: (tableau des temps dans l'ordre des tours, nombre de tours)}
+        """
+        pilots, matrix = self.race(race_id)
+        result = {}
+        for pilot_id, row in zip(pilots, matrix):
+            laps = row[row > 0]
+            result[int(pilot_id)] = (laps[-seq_length:], len(laps))
+        return result
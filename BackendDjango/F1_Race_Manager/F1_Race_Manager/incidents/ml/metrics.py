@@ -0,0 +1,208 @@
+# incidents/ml/metrics.py
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# F1_INFERENCE_METRICS=0 désactive l'instrumentation (les timers deviennent des no-op)
+ENABLED = os.environ.get('F1_INFERENCE_METRICS', '1') == '1'
+
+# Bornes des histogrammes (secondes pour les durées, lignes pour les lots)
+SECONDS_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+ROWS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Échantillons récents gardés par série pour p50 / p95 / p99
+WINDOW = 2048
+
+STAGE_SECONDS = 'f1_inference_stage_seconds'
+REQUEST_SECONDS = 'f1_request_seconds'
+BATCH_ROWS = 'f1_inference_batch_rows'
+
+HELP = {
+    STAGE_SECONDS: "Durée de chaque étape d'une prédiction",
+    REQUEST_SECONDS: "Durée totale des requêtes de prédiction",
+    BATCH_ROWS: "Lignes par passe avant du modèle",
+}
+
+
+class Histogram:
+    """
+    Histogramme cumulatif à bornes fixes et fenêtre des derniers échantillons
+
+    observe() coûte une bisection et un ajout sous verrou ; les quantiles
+    ne sont calculés qu'à la lecture (scrape).
+    """
+
+    def __init__(self, buckets, window=WINDOW):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            self._recent.append(value)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+            recent = np.array(self._recent, dtype=np.float64)
+
+        cumulative = np.cumsum(counts).tolist()
+        return {
+            'buckets': list(zip(self.buckets, cumulative)),
+            'count': count,
+            'sum': total,
+            'quantiles': {q: float(np.quantile(recent, q)) for q in QUANTILES} if len(recent) else {},
+        }
+
+
+_series = {}
+_series_lock = threading.Lock()
+
+
+def histogram(name, buckets=SECONDS_BUCKETS, **labels):
+    """Série (nom, labels), créée au premier usage"""
+    key = (name, tuple(sorted(labels.items())))
+    series = _series.get(key)
+    if series is None:
+        with _series_lock:
+            series = _series.setdefault(key, Histogram(buckets))
+    return series
+
+
+class _Timer:
+    __slots__ = ('series', 'start')
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name):
+    """
+    Chronomètre une étape : with metrics.stage('forward'): ...
+
+    Étapes : db_fetch, cache_lookup, stored_lookup, feature_assembly,
+    batch_wait, encoding, scaling, forward, postprocess, response_build.
+    """
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(histogram(STAGE_SECONDS, stage=name))
+
+
+def observe_stage(name, seconds):
+    """Durée d'étape mesurée ailleurs (ex: attente dans la file du micro-batcher)"""
+    if ENABLED:
+        histogram(STAGE_SECONDS, stage=name).observe(seconds)
+
+
+def observe_request(endpoint, source, seconds):
+    """Durée totale d'une requête ; source: cache, stored, live ou fallback"""
+    if ENABLED:
+        histogram(REQUEST_SECONDS, endpoint=endpoint, source=source).observe(seconds)
+
+
+def observe_batch(n_rows):
+    if ENABLED:
+        histogram(BATCH_ROWS, ROWS_BUCKETS).observe(n_rows)
+
+
+def _escape(value, quote=True):
+    """Échappement du format texte : \\ et saut de ligne, plus " dans une valeur de label"""
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+    return value.replace('"', '\\"') if quote else value
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else 'NaN'
+    return str(value)
+
+
+def render_prometheus(gauges=()):
+    """
+    Exposition au format texte Prometheus (0.0.4)
+
+    Chaque histogramme est suivi d'une jauge <nom>_quantile (p50 / p95 / p99
+    sur les WINDOW derniers échantillons). gauges: (nom, type, aide, [(labels, valeur)]).
+    """
+    with _series_lock:
+        series = sorted(_series.items())
+
+    lines = []
+    by_name = {}
+    for (name, labels), hist in series:
+        by_name.setdefault(name, []).append((labels, hist.snapshot()))
+
+    for name, entries in by_name.items():
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, snap in entries:
+            for bound, count in snap['buckets']:
+                lines.append(f'{name}_bucket{_labels(labels, le=_number(bound))} {count}')
+            lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {snap["count"]}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(snap["sum"])}')
+            lines.append(f'{name}_count{_labels(labels)} {snap["count"]}')
+
+        lines.append(f'# HELP {name}_quantile {HELP.get(name, name)} (fenêtre glissante)')
+        lines.append(f'# TYPE {name}_quantile gauge')
+        for labels, snap in entries:
+            for q, value in snap['quantiles'].items():
+                lines.append(f'{name}_quantile{_labels(labels, quantile=q)} {_number(value)}')
+
+    for name, kind, help_text, samples in gauges:
+        lines.append(f'# HELP {name} {_escape(help_text, quote=False)}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{name}{_labels(sorted(labels.items()))} {_number(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Oublie toutes les séries (benchmarks)"""
+    with _series_lock:
+        _series.clear()
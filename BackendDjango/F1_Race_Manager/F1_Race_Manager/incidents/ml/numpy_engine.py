@@ -0,0 +1,264 @@
+# incidents/ml/numpy_engine.py
+
+import json
+
+import numpy as np
+
+
+# Couches du modèle build_hybrid_model (noms Keras générés à l'entraînement)
+DENSE_LAYERS = ['dense', 'dense_1', 'dense_2', 'dense_3', 'output']
+CONV_LAYERS = ['conv1d', 'conv1d_1']
+BN_LAYERS = ['batch_normalization', 'batch_normalization_1', 'batch_normalization_2', 'batch_normalization_3']
+LSTM_LAYERS = ['lstm', 'lstm_1']
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+# Matrices de poids quantifiables (biais et BatchNorm restent en float32)
+QUANTIZED_KEYS = (
+    [f'{name}/kernel' for name in DENSE_LAYERS + CONV_LAYERS + LSTM_LAYERS]
+    + [f'{name}/recurrent_kernel' for name in LSTM_LAYERS]
+)
+
+
+def quantize(kernel, precision):
+    """
+    Quantifie une matrice de poids (dernier axe = canaux de sortie)
+
+    Returns:
+        (valeurs stockées, échelle par canal de sortie ou None)
+    """
+    kernel = np.asarray(kernel, dtype=np.float32)
+    if precision == 'float32':
+        return kernel, None
+    if precision == 'float16':
+        return kernel.astype(np.float16), None
+
+    # int8 symétrique par canal de sortie
+    axes = tuple(range(kernel.ndim - 1))
+    scale = np.abs(kernel).max(axis=axes) / 127.0
+    scale[scale == 0] = 1.0
+    values = np.clip(np.rint(kernel / scale), -127, 127).astype(np.int8)
+    return values, scale.astype(np.float32)
+
+
+def export_weights(h5_path, npz_path):
+    """
+    Exporte les poids du fichier Keras .h5 vers un .npz lisible sans TensorFlow
+
+    Seul h5py est nécessaire pour l'export ; le .npz produit ne demande que NumPy.
+    """
+    import h5py
+
+    arrays = {}
+    with h5py.File(h5_path, 'r') as f:
+        weights = f['model_weights']
+
+        for name in DENSE_LAYERS + CONV_LAYERS:
+            arrays[f'{name}/kernel'] = weights[name][name]['kernel'][()]
+            arrays[f'{name}/bias'] = weights[name][name]['bias'][()]
+
+        for name in LSTM_LAYERS:
+            cell = weights[name][name]['lstm_cell']
+            arrays[f'{name}/kernel'] = cell['kernel'][()]
+            arrays[f'{name}/recurrent_kernel'] = cell['recurrent_kernel'][()]
+            arrays[f'{name}/bias'] = cell['bias'][()]
+
+        # Epsilon des BatchNorm depuis la config du modèle
+        config = json.loads(f.attrs['model_config'])
+        epsilons = {
+            layer['config']['name']: layer['config'].get('epsilon', 1e-3)
+            for layer in config['config']['layers']
+            if layer['class_name'] == 'BatchNormalization'
+        }
+
+        for name in BN_LAYERS:
+            group = weights[name][name]
+            for key in ('gamma', 'beta', 'moving_mean', 'moving_variance'):
+                arrays[f'{name}/{key}'] = group[key][()]
+            arrays[f'{name}/epsilon'] = np.float32(epsilons.get(name, 1e-3))
+
+    np.savez(npz_path, **arrays)
+    return npz_path
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyHybridModel:
+    """
+    Passe avant du modèle CNN+LSTM en NumPy pur (inférence uniquement)
+
+    Reproduit build_hybrid_model du notebook :
+    - statique : Dense(128, relu) -> BN -> Dense(64, relu)
+    - séquence : Conv1D(64) -> BN -> MaxPool(2) -> Conv1D(32) -> BN -> LSTM(64) -> LSTM(32)
+    - fusion : Dense(128, relu) -> BN -> Dense(64, relu) -> Dense(classes, softmax)
+    Les Dropout sont inactifs en inférence.
+    """
+
+    def __init__(self, weights, precision='float32'):
+        """
+        Args:
+            weights: dict nom -> tableau (format export_weights)
+            precision: 'float32', 'float16' ou 'int8' (par canal) pour les matrices
+                       Dense/Conv1D/LSTM, déquantifiées à chaque passe avant
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"❌ Précision inconnue: {precision} (choix: {', '.join(PRECISIONS)})")
+        self.precision = precision
+
+        self.w = {}
+        self.scales = {}
+        for key, value in weights.items():
+            if key in QUANTIZED_KEYS:
+                self.w[key], self.scales[key] = quantize(value, precision)
+            else:
+                self.w[key] = np.asarray(value, dtype=np.float32)
+
+        # BatchNorm d'inférence précalculée en x * scale + shift
+        self.bn = {}
+        for name in BN_LAYERS:
+            scale = self.w[f'{name}/gamma'] / np.sqrt(self.w[f'{name}/moving_variance'] + self.w[f'{name}/epsilon'])
+            shift = self.w[f'{name}/beta'] - self.w[f'{name}/moving_mean'] * scale
+            self.bn[name] = (scale.astype(np.float32), shift.astype(np.float32))
+
+    @classmethod
+    def from_npz(cls, path, precision='float32'):
+        with np.load(path) as data:
+            return cls({k: data[k] for k in data.files}, precision)
+
+    @classmethod
+    def from_prepared(cls, weights, scales, bn, precision):
+        """
+        Modèle sur des tableaux déjà quantifiés, utilisés sans copie
+        (vues mmap de shared_weights)
+
+        Args:
+            weights: dict nom -> matrices / biais (stockage de la précision)
+            scales: dict nom -> échelles par canal (int8)
+            bn: dict couche -> (scale, shift) de la BatchNorm précalculée
+        """
+        model = cls.__new__(cls)
+        model.precision = precision
+        model.w = weights
+        model.scales = scales
+        model.bn = bn
+        return model
+
+    @classmethod
+    def from_h5(cls, path, precision='float32'):
+        import io
+        buffer = io.BytesIO()
+        export_weights(path, buffer)
+        buffer.seek(0)
+        return cls.from_npz(buffer, precision)
+
+    def weights_nbytes(self):
+        """Mémoire occupée par les poids (valeurs, échelles, BatchNorm précalculée)"""
+        return (
+            sum(v.nbytes for v in self.w.values())
+            + sum(s.nbytes for s in self.scales.values() if s is not None)
+            + sum(scale.nbytes + shift.nbytes for scale, shift in self.bn.values())
+        )
+
+    def _kernel(self, key):
+        """Matrice de poids en float32 (déquantifiée si besoin)"""
+        values = self.w[key]
+        if values.dtype == np.float32:
+            return values
+        scale = self.scales.get(key)
+        if scale is None:
+            return values.astype(np.float32)
+        return values.astype(np.float32) * scale
+
+    def predict(self, X_static, X_seq):
+        """
+        Args:
+            X_static: [n, num_features_static] normalisé
+            X_seq: [n, seq_length, 1] normalisé
+
+        Returns:
+            probabilités [n, num_classes]
+        """
+        X_static = np.asarray(X_static, dtype=np.float32)
+        X_seq = np.asarray(X_seq, dtype=np.float32)
+
+        # Branche statique
+        x1 = _relu(self._dense('dense', X_static))
+        x1 = self._batch_norm('batch_normalization', x1)
+        x1 = _relu(self._dense('dense_1', x1))
+
+        # Branche séquentielle
+        x2 = _relu(self._conv1d('conv1d', X_seq))
+        x2 = self._batch_norm('batch_normalization_1', x2)
+        x2 = self._max_pool(x2, 2)
+        x2 = _relu(self._conv1d('conv1d_1', x2))
+        x2 = self._batch_norm('batch_normalization_2', x2)
+        x2 = self._lstm('lstm', x2, return_sequences=True)
+        x2 = self._lstm('lstm_1', x2, return_sequences=False)
+
+        # Fusion
+        z = np.concatenate([x1, x2], axis=1)
+        z = _relu(self._dense('dense_2', z))
+        z = self._batch_norm('batch_normalization_3', z)
+        z = _relu(self._dense('dense_3', z))
+        return self._softmax(self._dense('output', z))
+
+    def _dense(self, name, x):
+        return x @ self._kernel(f'{name}/kernel') + self.w[f'{name}/bias']
+
+    def _batch_norm(self, name, x):
+        scale, shift = self.bn[name]
+        return x * scale + shift
+
+    def _conv1d(self, name, x):
+        """Conv1D padding='same', stride 1"""
+        kernel = self._kernel(f'{name}/kernel')  # [k, c_in, c_out]
+        k, c_in, c_out = kernel.shape
+        n, t, _ = x.shape
+        left = (k - 1) // 2
+        padded = np.pad(x, ((0, 0), (left, k - 1 - left), (0, 0)))
+        windows = np.concatenate([padded[:, i:i + t] for i in range(k)], axis=2)
+        return windows @ kernel.reshape(k * c_in, c_out) + self.w[f'{name}/bias']
+
+    @staticmethod
+    def _max_pool(x, pool):
+        n, t, c = x.shape
+        t_out = t // pool
+        return x[:, :t_out * pool].reshape(n, t_out, pool, c).max(axis=2)
+
+    def _lstm(self, name, x, return_sequences):
+        """LSTM Keras (portes i, f, c, o ; activation récurrente sigmoïde)"""
+        kernel = self._kernel(f'{name}/kernel')
+        recurrent = self._kernel(f'{name}/recurrent_kernel')
+        units = recurrent.shape[0]
+        n, t, _ = x.shape
+
+        # Projection des entrées pour tous les pas de temps en une fois
+        x_proj = x @ kernel + self.w[f'{name}/bias']
+
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        outputs = []
+        for step in range(t):
+            z = x_proj[:, step] + h @ recurrent
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if return_sequences:
+                outputs.append(h)
+
+        return np.stack(outputs, axis=1) if return_sequences else h
+
+    @staticmethod
+    def _softmax(x):
+        x = x - x.max(axis=1, keepdims=True)
+        e = np.exp(x)
+        return e / e.sum(axis=1, keepdims=True)
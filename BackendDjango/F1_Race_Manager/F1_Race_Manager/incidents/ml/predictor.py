@@ -1,28 +1,120 @@
 # incidents/ml/predictor.py
 
 import numpy as np
-import joblib
 import os
-from tensorflow import keras
 import json
+import threading
+from collections import Counter
+from itertools import repeat
+
+from . import metrics
+from .preprocessing import Preprocessor
+
+BACKENDS = ('keras', 'numpy')
+
+# Précisions des poids du backend NumPy (numpy_engine.PRECISIONS)
+PRECISIONS = ('float32', 'float16', 'int8')
+
+# Encodeurs catégoriels utilisés comme features
+ENCODED_FEATURES = ('driver', 'circuit', 'constructor')
+
+# Axes d'un balayage de scénarios : colonne de X_static, ou perturbation des temps au tour
+# (lap_offset_ms : décalage de chaque tour ; lap_trend_ms : dérive par tour sur la fenêtre)
+SWEEP_STATIC_AXES = {'grid_position': 0, 'num_pit_stops': 6, 'position_change': 7}
+SWEEP_LAP_AXES = ('lap_offset_ms', 'lap_trend_ms')
+SWEEP_AXES = tuple(SWEEP_STATIC_AXES) + SWEEP_LAP_AXES
+
+# Code des catégories absentes du vocabulaire d'entraînement
+# (le vocabulaire ne contient pas de jeton 'unknown' : on garde l'index 0 historique)
+UNKNOWN_CODE = 0
+
+# Valeurs inconnues distinctes suivies par encodeur (les codes viennent aussi des clients :
+# au-delà, seules les valeurs déjà suivies sont comptées) et longueur gardée de chacune
+MAX_TRACKED_UNKNOWN = 256
+MAX_UNKNOWN_LENGTH = 64
+
+
+DEFAULT_WEIGHTS_DIR = os.path.join(os.path.dirname(__file__), 'weights')
+
+
+def _instance_key(backend, weights_dir, precision, shared):
+    return (
+        os.path.abspath(weights_dir or DEFAULT_WEIGHTS_DIR),
+        backend or os.environ.get('F1_PREDICTOR_BACKEND', 'keras'),
+        precision or os.environ.get('F1_PREDICTOR_PRECISION', 'float32'),
+        os.environ.get('F1_PREDICTOR_SHARED', '0') == '1' if shared is None else bool(shared),
+    )
+
+
+def format_risks(classes, proba):
+    """Dict de risques d'une ligne de probabilités (aussi utilisé par le client du serveur d'inférence)"""
+    result = {cls: float(proba[i]) for i, cls in enumerate(classes)}
+    
+    # Calculer risque total (exclure safety_car)
+    result['risque_total'] = float(sum([
+        v for k, v in result.items() 
+        if k != 'safety_car'
+    ]))
+    
+    return result
+
 
 class F1IncidentPredictor:
-    _instance = None
+    # Une instance par dossier de poids (une par version du registre), backend, précision et mode partagé
+    _instances = {}
+    _instances_lock = threading.Lock()
     
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
+    def __new__(cls, backend=None, weights_dir=None, precision=None, shared=None, shared_dir=None):
+        key = _instance_key(backend, weights_dir, precision, shared)
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = cls._instances[key] = super().__new__(cls)
+                instance._initialized = False
+        return instance
     
-    def __init__(self):
+    @classmethod
+    def release(cls, weights_dir=None):
+        """Oublie les instances d'un dossier (les appels en cours gardent leur référence)"""
+        path = os.path.abspath(weights_dir or DEFAULT_WEIGHTS_DIR)
+        with cls._instances_lock:
+            for key in [key for key in cls._instances if key[0] == path]:
+                del cls._instances[key]
+    
+    def __init__(self, backend=None, weights_dir=None, precision=None, shared=None, shared_dir=None):
+        """
+        Args:
+            backend: 'keras' (TensorFlow) ou 'numpy' (sans TensorFlow).
+                     Par défaut: variable d'environnement F1_PREDICTOR_BACKEND, sinon 'keras'
+            weights_dir: dossier des poids (par défaut ml/weights, sinon une version du registre)
+            precision: poids du backend NumPy en 'float32', 'float16' ou 'int8'.
+                       Par défaut: variable d'environnement F1_PREDICTOR_PRECISION, sinon 'float32'
+            shared: backend NumPy servi depuis un fichier mmap en lecture seule
+                    (f1_model_shared_*_<précision>.bin), commun à tous les workers.
+                    Par défaut: F1_PREDICTOR_SHARED=1
+            shared_dir: dossier où ce fichier est exporté (jamais le dossier des poids).
+                        Par défaut: F1_PREDICTOR_SHARED_DIR, sinon le dossier temporaire
+        """
         if self._initialized:
             return
         
-        print("🔄 Chargement du modèle F1 Incident Predictor...")
+        _, backend, precision, shared = _instance_key(backend, weights_dir, precision, shared)
+        if backend not in BACKENDS:
+            raise ValueError(f"❌ Backend inconnu: {backend} (choix: {', '.join(BACKENDS)})")
+        if precision not in PRECISIONS:
+            raise ValueError(f"❌ Précision inconnue: {precision} (choix: {', '.join(PRECISIONS)})")
+        if backend == 'keras' and precision != 'float32':
+            raise ValueError(f"❌ La précision {precision} demande le backend numpy")
+        if backend == 'keras' and shared:
+            raise ValueError("❌ Les poids partagés demandent le backend numpy")
+        self.backend = backend
+        self.precision = precision
+        self.shared = shared
+        
+        print(f"🔄 Chargement du modèle F1 Incident Predictor (backend {backend}, {precision})...")
         
-        base_dir = os.path.dirname(__file__)
-        weights_dir = os.path.join(base_dir, 'weights')
+        weights_dir = weights_dir or DEFAULT_WEIGHTS_DIR
+        self.weights_dir = weights_dir
         
         # Vérifier que le dossier existe
         if not os.path.exists(weights_dir):
@@ -33,18 +125,10 @@ class F1IncidentPredictor:
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"❌ Modèle introuvable: {model_path}")
         
-        self.model = keras.models.load_model(model_path)
-        print("✅ Modèle CNN+LSTM chargé")
-        
-        # Charger les preprocesseurs
-        self.scaler_static = joblib.load(os.path.join(weights_dir, 'scaler_static.pkl'))
-        self.scaler_seq = joblib.load(os.path.join(weights_dir, 'scaler_seq.pkl'))
-        self.encoders = joblib.load(os.path.join(weights_dir, 'encoders.pkl'))
-        print("✅ Scalers et encoders chargés")
-        
-        # Charger métadonnées
-        with open(os.path.join(weights_dir, 'metadata.json'), 'r') as f:
-            self.metadata = json.load(f)
+        if shared:
+            self._load_shared(weights_dir, precision, shared_dir)
+        else:
+            self._load_private(weights_dir, model_path, backend, precision)
         
         self._initialized = True
         print(f"✅ Prédicteur initialisé (Accuracy: {self.metadata['test_accuracy']:.2%})")
@@ -58,71 +142,250 @@ class F1IncidentPredictor:
             circuit_data: dict avec 'slug'
             lap_times: list de millisecondes
             race_data: dict avec 'grid_position', 'year', etc.
+                       ('laps_completed' par défaut: len(lap_times))
         
         Returns:
             dict avec probabilités par type d'incident
         """
-        # Encodage
-        driver_enc = self._safe_encode('driver', pilot_data.get('code', 'unknown'))
-        circuit_enc = self._safe_encode('circuit', circuit_data.get('slug', 'unknown'))
-        constructor_enc = self._safe_encode('constructor', pilot_data.get('team_slug', 'unknown'))
-        
-        # Features statiques [8 features]
-        X_static = np.array([[
-            race_data.get('grid_position', 10),
-            circuit_enc,
-            driver_enc,
-            constructor_enc,
-            race_data.get('year', 2024),
-            len(lap_times) if lap_times else 0,
-            race_data.get('num_pit_stops', 0),
-            race_data.get('position_change', 0)
-        ]])
+        return self.predict_batch([(pilot_data, circuit_data, lap_times, race_data)])[0]
+    
+    def predict_batch(self, rows):
+        """
+        Prédit les risques d'incidents pour toute une grille en une seule passe
         
-        X_static_scaled = self.scaler_static.transform(X_static)
+        Args:
+            rows: liste de tuples (pilot_data, circuit_data, lap_times, race_data),
+                  mêmes formats que predict()
         
-        # Séquence temporelle
-        seq_length = self.metadata['seq_length']
+        Returns:
+            liste de dicts de probabilités, dans l'ordre des lignes
+        """
+        if not rows:
+            return []
         
-        if not lap_times or len(lap_times) == 0:
-            lap_times = [90000] * seq_length  # Temps par défaut
-        elif len(lap_times) < seq_length:
-            avg = np.mean(lap_times)
-            lap_times = [avg] * (seq_length - len(lap_times)) + list(lap_times)
+        X_static_scaled, X_seq_scaled = self._build_inputs(rows)
         
-        lap_times = lap_times[-seq_length:]
+        # Une seule prédiction pour toute la grille
+        metrics.observe_batch(len(rows))
+        with metrics.stage('forward'):
+            proba = self._forward(X_static_scaled, X_seq_scaled)
         
-        X_seq = np.array([lap_times]).reshape(1, seq_length, 1)
-        X_seq_scaled = self.scaler_seq.transform(
-            X_seq.reshape(1, seq_length)
-        ).reshape(1, seq_length, 1)
+        with metrics.stage('postprocess'):
+            return [self._format_result(p) for p in proba]
+    
+    def predict_sweep(self, row, axes):
+        """
+        Surface de risque d'une ligne sur le produit cartésien d'axes, en une seule passe
         
-        # Prédiction
-        proba = self.model.predict([X_static_scaled, X_seq_scaled], verbose=0)[0]
+        La ligne de base n'est encodée et normalisée qu'une fois ; les variantes
+        sont dérivées dans l'espace normalisé par diffusion NumPy.
         
-        # Résultats
-        classes = self.metadata['classes']
-        result = {cls: float(proba[i]) for i, cls in enumerate(classes)}
+        Args:
+            row: (pilot_data, circuit_data, lap_times, race_data), mêmes formats que predict()
+            axes: liste ordonnée de (nom, valeurs), noms parmi SWEEP_AXES
+        
+        Returns:
+            (probabilités [n_1, ..., n_k, n_classes], probabilités de la ligne de base [n_classes])
+        """
+        names = [name for name, _ in axes]
+        shape = tuple(len(values) for _, values in axes)
+        n = int(np.prod(shape, dtype=np.int64))
+        
+        base_static, base_seq = self._build_inputs([row])
+        base_static, base_seq = base_static[0].copy(), base_seq[0, :, 0].copy()
+        
+        with metrics.stage('scaling'):
+            # Une ligne par point de la grille, plus la ligne de base en dernier
+            X_static = np.empty((n + 1, len(base_static)), dtype=np.float32)
+            X_static[:] = base_static
+            X_seq = np.empty((n + 1, len(base_seq)), dtype=np.float32)
+            X_seq[:] = base_seq
+            
+            points = np.meshgrid(*[np.asarray(values, dtype=np.float32) for _, values in axes], indexing='ij')
+            points = dict(zip(names, (p.reshape(-1) for p in points)))
+            
+            preprocessor = self.preprocessor
+            for name, column in SWEEP_STATIC_AXES.items():
+                if name in points:
+                    X_static[:n, column] = (
+                        (points[name] - preprocessor.static_mean[column]) * preprocessor.static_inv_scale[column]
+                    )
+            
+            # (x + delta - mean) * inv = x_normalisé + delta * inv
+            delta = np.zeros((n, 1), dtype=np.float32)
+            if 'lap_offset_ms' in points:
+                delta = delta + points['lap_offset_ms'][:, None]
+            if 'lap_trend_ms' in points:
+                ramp = np.arange(len(base_seq), dtype=np.float32)
+                delta = delta + points['lap_trend_ms'][:, None] * ramp
+            X_seq[:n] += delta * preprocessor.seq_inv_scale
         
-        # Calculer risque total (exclure safety_car)
-        result['risque_total'] = float(sum([
-            v for k, v in result.items() 
-            if k != 'safety_car'
-        ]))
+        metrics.observe_batch(n + 1)
+        with metrics.stage('forward'):
+            proba = np.asarray(self._forward(X_static, X_seq.reshape(n + 1, -1, 1)))
+        
+        return proba[:n].reshape(shape + (proba.shape[1],)), proba[n]
+    
+    def _forward(self, X_static_scaled, X_seq_scaled):
+        """Passe avant du modèle sur un lot déjà normalisé"""
+        if self.backend == 'numpy':
+            return self.model.predict(X_static_scaled, X_seq_scaled)
+        return self.model.predict(
+            [X_static_scaled, X_seq_scaled],
+            batch_size=len(X_static_scaled),
+            verbose=0
+        )
+    
+    def _load_private(self, weights_dir, model_path, backend, precision):
+        """Copie privée au processus : modèle, scalers et encoders picklés"""
+        import joblib
+        
+        if backend == 'numpy':
+            self.model = self._load_numpy_model(weights_dir, model_path, precision)
+        else:
+            from tensorflow import keras
+            self.model = keras.models.load_model(model_path)
+        print("✅ Modèle CNN+LSTM chargé")
+        
+        # Charger les preprocesseurs
+        self.scaler_static = joblib.load(os.path.join(weights_dir, 'scaler_static.pkl'))
+        self.scaler_seq = joblib.load(os.path.join(weights_dir, 'scaler_seq.pkl'))
+        self.encoders = joblib.load(os.path.join(weights_dir, 'encoders.pkl'))
+        self._compile_encoders({name: self.encoders[name].classes_ for name in ENCODED_FEATURES})
+        print("✅ Scalers et encoders chargés")
+        
+        # Charger métadonnées
+        with open(os.path.join(weights_dir, 'metadata.json'), 'r') as f:
+            self.metadata = json.load(f)
         
-        return result
+        # Prétraitement fusionné (mean_/scale_ des scalers en float32)
+        self.preprocessor = Preprocessor(
+            self.scaler_static,
+            self.scaler_seq,
+            seq_length=self.metadata['seq_length'],
+            n_static=self.metadata.get('num_features_static', 8)
+        )
+    
+    def _load_shared(self, weights_dir, precision, shared_dir=None):
+        """
+        Vues en lecture seule sur le fichier mmap partagé (exporté au premier
+        chargement) : ni copie des poids, ni sklearn dans le worker
+        """
+        from .shared_weights import SharedWeights, ensure_shared
+        
+        self.shared_weights = SharedWeights(ensure_shared(weights_dir, precision, shared_dir))
+        self.model = self.shared_weights.model()
+        print(f"✅ Modèle CNN+LSTM partagé (mmap {self.shared_weights.path})")
+        
+        self.scaler_static = self.scaler_seq = self.encoders = None
+        self._compile_encoders(self.shared_weights.vocabularies)
+        self.metadata = self.shared_weights.metadata
+        self.preprocessor = self.shared_weights.preprocessor()
+    
+    @staticmethod
+    def _load_numpy_model(weights_dir, model_path, precision='float32'):
+        """Charge le moteur NumPy depuis le .npz exporté (ou le .h5 via h5py)"""
+        from .numpy_engine import NumpyHybridModel
+        
+        npz_path = os.path.join(weights_dir, 'f1_model_weights.npz')
+        if os.path.exists(npz_path):
+            return NumpyHybridModel.from_npz(npz_path, precision)
+        return NumpyHybridModel.from_h5(model_path, precision)
+    
+    def _build_inputs(self, rows):
+        """Construit les tenseurs X_static / X_seq normalisés d'un lot"""
+        pilots = [r[0] for r in rows]
+        circuits = [r[1] for r in rows]
+        races = [r[3] for r in rows]
+        
+        # Encodage vectorisé
+        with metrics.stage('encoding'):
+            driver_enc = self._safe_encode_many('driver', [p.get('code', 'unknown') for p in pilots])
+            circuit_enc = self._safe_encode_many('circuit', [c.get('slug', 'unknown') for c in circuits])
+            constructor_enc = self._safe_encode_many('constructor', [p.get('team_slug', 'unknown') for p in pilots])
+        
+        # Features statiques [n, 8 features] + séquences, normalisées sans sklearn
+        static_columns = [
+            [r.get('grid_position', 10) for r in races],
+            circuit_enc,
+            driver_enc,
+            constructor_enc,
+            [r.get('year', 2024) for r in races],
+            [r[3].get('laps_completed', len(r[2]) if r[2] is not None else 0) for r in rows],
+            [r.get('num_pit_stops', 0) for r in races],
+            [r.get('position_change', 0) for r in races],
+        ]
+        
+        with metrics.stage('scaling'):
+            return self.preprocessor.transform(static_columns, [r[2] for r in rows])
+    
+    def _format_result(self, proba):
+        """Convertit une ligne de probabilités en dict de risques"""
+        return format_risks(self.metadata['classes'], proba)
+    
+    def _compile_encoders(self, vocabularies):
+        """Transforme les vocabulaires des LabelEncoder en tables de correspondance dict"""
+        self.encoder_tables = {
+            name: {value: code for code, value in enumerate(vocabularies[name])}
+            for name in ENCODED_FEATURES
+        }
+        self._unknown_lock = threading.Lock()
+        self._lookups = Counter()
+        self._unknown_hits = Counter()
+        self._unknown_values = {name: Counter() for name in ENCODED_FEATURES}
     
     def _safe_encode(self, encoder_type, value):
         """Encode avec fallback"""
-        try:
-            return self.encoders[encoder_type].transform([value])[0]
-        except:
-            return 0  # Valeur par défaut
+        return self._safe_encode_many(encoder_type, [value])[0]
+    
+    def _safe_encode_many(self, encoder_type, values):
+        """Encode un tableau de valeurs, UNKNOWN_CODE pour les valeurs hors vocabulaire"""
+        table = self.encoder_tables[encoder_type]
+        codes = np.fromiter(
+            map(table.get, values, repeat(-1)),
+            dtype=np.int64,
+            count=len(values)
+        )
+        
+        unknown = codes < 0
+        n_unknown = int(unknown.sum())
+        with self._unknown_lock:
+            self._lookups[encoder_type] += len(values)
+            if n_unknown:
+                self._unknown_hits[encoder_type] += n_unknown
+                tracked = self._unknown_values[encoder_type]
+                for v, miss in zip(values, unknown):
+                    if not miss:
+                        continue
+                    if isinstance(v, str):
+                        v = v[:MAX_UNKNOWN_LENGTH]
+                    if v in tracked or len(tracked) < MAX_TRACKED_UNKNOWN:
+                        tracked[v] += 1
+        
+        if n_unknown:
+            codes[unknown] = UNKNOWN_CODE
+        return codes
+    
+    def get_encoding_stats(self, top=10):
+        """Compteurs de catégories inconnues (dérive entre Django et le vocabulaire d'entraînement)"""
+        with self._unknown_lock:
+            return {
+                name: {
+                    'lookups': self._lookups[name],
+                    'unknown': self._unknown_hits[name],
+                    'unknown_ratio': round(self._unknown_hits[name] / self._lookups[name], 3) if self._lookups[name] else 0.0,
+                    'top_unknown': dict(self._unknown_values[name].most_common(top)),
+                }
+                for name in ENCODED_FEATURES
+            }
     
     def get_info(self):
         """Retourne les infos du modèle"""
         return {
             'version': self.metadata.get('model_version', '1.0'),
+            'backend': self.backend,
+            'precision': self.precision,
+            'shared': self.shared,
             'accuracy': self.metadata.get('test_accuracy', 0.0),
             'classes': self.metadata.get('classes', []),
             'seq_length': self.metadata.get('seq_length', 10),
@@ -0,0 +1,98 @@
+# incidents/ml/preprocessing.py
+
+import threading
+
+import numpy as np
+
+# Temps au tour par défaut quand un pilote n'a aucun tour (ms)
+DEFAULT_LAP_MS = 90000.0
+
+
+def _scaler_params(scaler, n_features):
+    """mean_ / scale_ d'un StandardScaler en float32 contigus (1/scale précalculé)"""
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    mean = np.zeros(n_features) if mean is None else mean
+    scale = np.ones(n_features) if scale is None else scale
+    return (
+        np.ascontiguousarray(mean, dtype=np.float32),
+        np.ascontiguousarray(1.0 / scale, dtype=np.float32),
+    )
+
+
+class Preprocessor:
+    """
+    Prétraitement fusionné : assemblage, padding et normalisation d'un lot
+
+    Remplace scaler.transform de sklearn (validation coûteuse sur de petits
+    tableaux) par une normalisation en place sur des buffers préalloués.
+    Les buffers sont propres à chaque thread ; les tableaux retournés sont
+    des vues à consommer avant le prochain appel dans le même thread.
+    """
+
+    def __init__(self, scaler_static, scaler_seq, seq_length, n_static):
+        self.seq_length = seq_length
+        self.n_static = n_static
+        self.static_mean, self.static_inv_scale = _scaler_params(scaler_static, n_static)
+        self.seq_mean, self.seq_inv_scale = _scaler_params(scaler_seq, seq_length)
+        self._local = threading.local()
+
+    @classmethod
+    def from_params(cls, static_mean, static_inv_scale, seq_mean, seq_inv_scale):
+        """Prétraitement sur des paramètres déjà extraits (ex: vues mmap partagées)"""
+        preprocessor = cls.__new__(cls)
+        preprocessor.seq_length = len(seq_mean)
+        preprocessor.n_static = len(static_mean)
+        preprocessor.static_mean, preprocessor.static_inv_scale = static_mean, static_inv_scale
+        preprocessor.seq_mean, preprocessor.seq_inv_scale = seq_mean, seq_inv_scale
+        preprocessor._local = threading.local()
+        return preprocessor
+
+    def _buffers(self, n):
+        """Buffers [n, n_static] et [n, seq_length], agrandis au besoin"""
+        local = self._local
+        capacity = getattr(local, 'capacity', 0)
+        if capacity < n:
+            capacity = max(n, 2 * capacity, 32)
+            local.static = np.empty((capacity, self.n_static), dtype=np.float32)
+            local.seq = np.empty((capacity, self.seq_length), dtype=np.float32)
+            local.capacity = capacity
+        return local.static[:n], local.seq[:n]
+
+    def transform(self, static_columns, lap_sequences):
+        """
+        Args:
+            static_columns: liste de n_static colonnes (séquences de longueur n)
+            lap_sequences: liste de n listes de temps au tour (ms), longueurs variables
+
+        Returns:
+            (X_static [n, n_static], X_seq [n, seq_length, 1]) normalisés, float32
+        """
+        n = len(lap_sequences)
+        X_static, X_seq = self._buffers(n)
+
+        for j, column in enumerate(static_columns):
+            X_static[:, j] = column
+        X_static -= self.static_mean
+        X_static *= self.static_inv_scale
+
+        self.pad_sequences(lap_sequences, X_seq)
+        X_seq -= self.seq_mean
+        X_seq *= self.seq_inv_scale
+
+        return X_static, X_seq.reshape(n, self.seq_length, 1)
+
+    def pad_sequences(self, lap_sequences, out):
+        """Complète avec la moyenne et garde les seq_length derniers tours, dans out"""
+        seq_length = self.seq_length
+        for i, laps in enumerate(lap_sequences):
+            count = len(laps) if laps is not None else 0
+            if count == 0:
+                out[i] = DEFAULT_LAP_MS
+            elif count < seq_length:
+                laps = np.asarray(laps, dtype=np.float32)
+                out[i, :seq_length - count] = laps.mean()
+                out[i, seq_length - count:] = laps
+            else:
+                out[i] = laps[-seq_length:]
+        return out
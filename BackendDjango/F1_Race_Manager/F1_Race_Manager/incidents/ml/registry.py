@@ -0,0 +1,192 @@
+# incidents/ml/registry.py
+
+import contextlib
+import json
+import os
+import shutil
+import time
+
+ACTIVE_FILE = 'ACTIVE'
+HISTORY_FILE = 'history.json'
+VERSIONS_DIR = 'versions'
+
+# Fichiers indispensables à F1IncidentPredictor
+REQUIRED_FILES = ('f1_model.h5', 'scaler_static.pkl', 'scaler_seq.pkl', 'encoders.pkl', 'metadata.json')
+
+
+class RegistryError(Exception):
+    pass
+
+
+def _check_name(version):
+    """Nom de version = un seul composant de chemin, sans fichier caché ni '..'"""
+    if (
+        not isinstance(version, str) or not version or version.startswith('.')
+        or os.sep in version or (os.altsep and os.altsep in version)
+    ):
+        raise RegistryError(f"❌ Nom de version invalide: {version!r}")
+    return version
+
+
+def _write_atomic(path, text):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    """
+    Registre versionné des dossiers de poids
+
+    Disposition :
+        <path>/versions/<version>/   un dossier weights/ complet par version
+        <path>/ACTIVE                version servie (remplacé atomiquement)
+        <path>/history.json          versions actives précédentes (rollback)
+
+    Sans version active, le dossier weights/ livré avec l'application est servi.
+    """
+
+    def __init__(self, path, bundled_dir):
+        self.path = path
+        self.bundled_dir = bundled_dir
+
+    def _version_dir(self, version):
+        return os.path.join(self.path, VERSIONS_DIR, version)
+
+    def _active_path(self):
+        return os.path.join(self.path, ACTIVE_FILE)
+
+    @staticmethod
+    def read_metadata(weights_dir):
+        with open(os.path.join(weights_dir, 'metadata.json')) as f:
+            return json.load(f)
+
+    # --- Lecture ---
+
+    def active_version(self):
+        """Version pointée par ACTIVE (None : dossier weights/ livré)"""
+        try:
+            with open(self._active_path()) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def pointer_token(self):
+        """Jeton qui change à chaque promotion (vérification peu coûteuse par os.stat)"""
+        try:
+            stat = os.stat(self._active_path())
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def resolve(self, version=None):
+        """Dossier de poids d'une version (par défaut la version active)"""
+        version = version or self.active_version()
+        if version is None:
+            return self.bundled_dir
+        path = self._version_dir(_check_name(version))
+        if not os.path.isdir(path):
+            raise RegistryError(f"❌ Version inconnue: {version}")
+        return path
+
+    def versions(self):
+        """Versions enregistrées (plus la version livrée), avec leurs métadonnées"""
+        active = self.active_version()
+        entries = []
+
+        root = os.path.join(self.path, VERSIONS_DIR)
+        names = sorted(os.listdir(root)) if os.path.isdir(root) else []
+        for name in names:
+            path = self._version_dir(name)
+            if not os.path.isdir(path) or name.startswith('.'):
+                continue
+            entries.append(self._entry(name, path, name == active, 'registry'))
+
+        if os.path.isdir(self.bundled_dir):
+            bundled = self.read_metadata(self.bundled_dir).get('model_version', 'bundled')
+            entries.append(self._entry(bundled, self.bundled_dir, active is None, 'bundled'))
+        return entries
+
+    def _entry(self, version, path, active, source):
+        try:
+            metadata = self.read_metadata(path)
+        except (OSError, ValueError):
+            metadata = {}
+        return {
+            'version': version,
+            'active': active,
+            'source': source,
+            'accuracy': metadata.get('test_accuracy'),
+            'trained_date': metadata.get('trained_date'),
+        }
+
+    def history(self):
+        try:
+            with open(os.path.join(self.path, HISTORY_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    # --- Écriture ---
+
+    def register(self, source_dir, version=None):
+        """
+        Copie un dossier de poids dans le registre (sans l'activer)
+
+        La copie se fait dans un dossier temporaire renommé à la fin : une
+        version visible est toujours complète.
+        """
+        missing = [name for name in REQUIRED_FILES if not os.path.exists(os.path.join(source_dir, name))]
+        if missing:
+            raise RegistryError(f"❌ Fichiers manquants dans {source_dir}: {', '.join(missing)}")
+
+        metadata = self.read_metadata(source_dir)
+        version = _check_name(version or metadata.get('model_version'))
+
+        target = self._version_dir(version)
+        if os.path.exists(target):
+            raise RegistryError(f"❌ Version déjà enregistrée: {version}")
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = os.path.join(os.path.dirname(target), f'.{version}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(source_dir, tmp)
+
+        # La version servie (get_info) est celle du registre
+        metadata['model_version'] = version
+        _write_atomic(os.path.join(tmp, 'metadata.json'), json.dumps(metadata, indent=2))
+        os.replace(tmp, target)
+        return version
+
+    def promote(self, version):
+        """Active une version : un seul os.replace du pointeur ACTIVE"""
+        self.resolve(_check_name(version))
+        previous = self.active_version()
+        if previous == version:
+            return version
+
+        history = self.history()
+        history.append({'version': previous, 'replaced_at': time.time()})
+        os.makedirs(self.path, exist_ok=True)
+        _write_atomic(os.path.join(self.path, HISTORY_FILE), json.dumps(history[-50:], indent=2))
+        _write_atomic(self._active_path(), version)
+        return version
+
+    def rollback(self):
+        """Réactive la version précédente (None : retour au dossier weights/ livré)"""
+        history = self.history()
+        if not history:
+            raise RegistryError("❌ Aucune version précédente")
+
+        previous = history.pop()['version']
+        if previous is None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._active_path())
+        else:
+            self.resolve(previous)
+            _write_atomic(self._active_path(), previous)
+        _write_atomic(os.path.join(self.path, HISTORY_FILE), json.dumps(history, indent=2))
+        return previous
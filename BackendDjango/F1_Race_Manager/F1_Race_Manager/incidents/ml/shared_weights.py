@@ -0,0 +1,172 @@
+# incidents/ml/shared_weights.py
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .numpy_engine import BN_LAYERS, QUANTIZED_KEYS, NumpyHybridModel
+from .preprocessing import Preprocessor
+
+MAGIC = b'F1SHARED'
+FORMAT_VERSION = 1
+ALIGN = 64
+
+# Fichiers dont le fichier partagé est dérivé (réexport si l'un est plus récent)
+SOURCE_FILES = ('f1_model_weights.npz', 'f1_model.h5', 'scaler_static.pkl', 'scaler_seq.pkl', 'encoders.pkl', 'metadata.json')
+
+
+def default_shared_dir():
+    """Dossier des fichiers partagés : F1_PREDICTOR_SHARED_DIR, sinon le dossier temporaire du système"""
+    return os.environ.get('F1_PREDICTOR_SHARED_DIR') or os.path.join(tempfile.gettempdir(), 'f1_shared_weights')
+
+
+def shared_path(weights_dir, precision='float32', shared_dir=None):
+    """
+    Fichier partagé d'un dossier de poids, hors de ce dossier (qui peut être
+    en lecture seule) : un nom par dossier source et par précision
+    """
+    source = os.path.abspath(weights_dir)
+    key = hashlib.sha1(source.encode()).hexdigest()[:12]
+    name = f'f1_model_shared_{os.path.basename(source)}_{key}_{precision}.bin'
+    return os.path.join(shared_dir or default_shared_dir(), name)
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def export_shared(weights_dir, precision='float32', path=None, shared_dir=None):
+    """
+    Exporte un dossier de poids en un seul fichier binaire à ouvrir en mmap
+
+    Disposition : MAGIC, longueur de l'en-tête (uint64), en-tête JSON
+    (métadonnées, vocabulaires des encodeurs, position des tableaux), puis
+    les tableaux alignés sur 64 octets : matrices déjà quantifiées et leurs
+    échelles, BatchNorm précalculée, moyennes et 1/écart-type des scalers.
+    Le fichier est écrit à côté puis renommé : un lecteur voit toujours un
+    fichier complet.
+    """
+    import joblib
+
+    from .predictor import ENCODED_FEATURES, F1IncidentPredictor
+
+    path = path or shared_path(weights_dir, precision, shared_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(os.path.join(weights_dir, 'metadata.json')) as f:
+        metadata = json.load(f)
+
+    model = F1IncidentPredictor._load_numpy_model(weights_dir, os.path.join(weights_dir, 'f1_model.h5'), precision)
+    preprocessor = Preprocessor(
+        joblib.load(os.path.join(weights_dir, 'scaler_static.pkl')),
+        joblib.load(os.path.join(weights_dir, 'scaler_seq.pkl')),
+        seq_length=metadata['seq_length'],
+        n_static=metadata.get('num_features_static', 8),
+    )
+    encoders = joblib.load(os.path.join(weights_dir, 'encoders.pkl'))
+
+    arrays = {f'w/{key}': value for key, value in model.w.items() if key in QUANTIZED_KEYS or key.endswith('/bias')}
+    arrays.update({f'scale/{key}': scale for key, scale in model.scales.items() if scale is not None})
+    for name, (scale, shift) in model.bn.items():
+        arrays[f'bn/{name}/scale'] = scale
+        arrays[f'bn/{name}/shift'] = shift
+    for name in ('static_mean', 'static_inv_scale', 'seq_mean', 'seq_inv_scale'):
+        arrays[f'pre/{name}'] = getattr(preprocessor, name)
+
+    index, offset = {}, 0
+    for name, value in arrays.items():
+        value = np.ascontiguousarray(value)
+        arrays[name] = value
+        index[name] = {'dtype': value.dtype.str, 'shape': list(value.shape), 'offset': offset}
+        offset = _align(offset + value.nbytes)
+
+    header = json.dumps({
+        'format': FORMAT_VERSION,
+        'precision': precision,
+        'metadata': metadata,
+        'vocabularies': {name: [str(v) for v in encoders[name].classes_] for name in ENCODED_FEATURES},
+        'arrays': index,
+    }).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, value in arrays.items():
+            f.seek(data_start + index[name]['offset'])
+            f.write(value.tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def is_current(weights_dir, precision='float32', shared_dir=None):
+    """Le fichier partagé existe et est plus récent que ses sources"""
+    try:
+        exported = os.stat(shared_path(weights_dir, precision, shared_dir)).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    sources = [os.path.join(weights_dir, name) for name in SOURCE_FILES]
+    return all(os.stat(p).st_mtime_ns <= exported for p in sources if os.path.exists(p))
+
+
+def ensure_shared(weights_dir, precision='float32', shared_dir=None):
+    """Exporte le fichier partagé s'il manque (idempotent : le premier processus l'écrit)"""
+    if not is_current(weights_dir, precision, shared_dir):
+        export_shared(weights_dir, precision, shared_dir=shared_dir)
+    return shared_path(weights_dir, precision, shared_dir)
+
+
+class SharedWeights:
+    """
+    Fichier de poids partagé, ouvert en lecture seule
+
+    Les tableaux sont des vues sur un seul np.memmap : les pages physiques
+    viennent du page cache et sont communes à tous les workers qui ouvrent
+    le même fichier, au lieu d'une copie privée par processus.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"❌ Fichier de poids partagé invalide: {path}")
+            (length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(length))
+        if header['format'] != FORMAT_VERSION:
+            raise ValueError(f"❌ Format de poids partagé non supporté: {header['format']}")
+
+        self.precision = header['precision']
+        self.metadata = header['metadata']
+        self.vocabularies = header['vocabularies']
+
+        data_start = _align(len(MAGIC) + 8 + length)
+        self._buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        self.arrays = {
+            name: np.ndarray(
+                tuple(entry['shape']), dtype=np.dtype(entry['dtype']),
+                buffer=self._buffer, offset=data_start + entry['offset'],
+            )
+            for name, entry in header['arrays'].items()
+        }
+
+    def _group(self, prefix):
+        return {name[len(prefix):]: value for name, value in self.arrays.items() if name.startswith(prefix)}
+
+    def model(self):
+        bn = {name: (self.arrays[f'bn/{name}/scale'], self.arrays[f'bn/{name}/shift']) for name in BN_LAYERS}
+        return NumpyHybridModel.from_prepared(self._group('w/'), self._group('scale/'), bn, self.precision)
+
+    def preprocessor(self):
+        return Preprocessor.from_params(
+            self.arrays['pre/static_mean'], self.arrays['pre/static_inv_scale'],
+            self.arrays['pre/seq_mean'], self.arrays['pre/seq_inv_scale'],
+        )
+
+    def nbytes(self):
+        return len(self._buffer)
@@ -0,0 +1,12 @@
+# incidents/ml/training/__init__.py
+"""Pipeline d'entraînement du modèle d'incidents (remplace le notebook Colab)"""
+
+from .evaluate import held_out_inputs
+from .export import export_artifacts
+from .features import build_dataset
+from .model import build_hybrid_model, split_dataset, train_model
+
+__all__ = [
+    'build_dataset', 'build_hybrid_model', 'split_dataset', 'train_model',
+    'export_artifacts', 'held_out_inputs',
+]
@@ -0,0 +1,40 @@
+# incidents/ml/training/evaluate.py
+
+import numpy as np
+
+from ..predictor import UNKNOWN_CODE
+from .model import split_dataset
+
+# Colonnes de X_static encodées par build_dataset (ordre de FEATURE_COLUMNS)
+ENCODED_COLUMNS = {'circuit': 1, 'driver': 2, 'constructor': 3}
+
+
+def held_out_inputs(dataset, predictor, test_size=0.2, seed=42):
+    """
+    Jeu de test d'un dataset, encodé et normalisé comme en production
+
+    Les codes catégoriels et les classes du dataset sont ré-exprimés dans
+    le vocabulaire du prédicteur (encoders.pkl, metadata.json) ; les lignes
+    d'une classe inconnue du modèle sont écartées.
+
+    Returns:
+        (X_static [n, 8], X_seq [n, seq_length, 1], y [n]) en float32 / int64
+    """
+    _, test = split_dataset(dataset['y'], test_size, seed)
+    X_static = np.array(dataset['X_static'][test], dtype=np.float32)
+    X_seq = np.array(dataset['X_seq'][test], dtype=np.float32)
+
+    for name, column in ENCODED_COLUMNS.items():
+        table = predictor.encoder_tables[name]
+        lookup = np.array([table.get(value, UNKNOWN_CODE) for value in dataset['classes'][name]], dtype=np.float32)
+        X_static[:, column] = lookup[X_static[:, column].astype(np.int64)]
+
+    model_classes = {name: i for i, name in enumerate(predictor.metadata['classes'])}
+    labels = np.array([model_classes.get(name, -1) for name in dataset['classes']['incident']])
+    y = labels[dataset['y'][test]]
+    keep = y >= 0
+
+    preprocessor = predictor.preprocessor
+    X_static = (X_static[keep] - preprocessor.static_mean) * preprocessor.static_inv_scale
+    X_seq = (X_seq[keep] - preprocessor.seq_mean) * preprocessor.seq_inv_scale
+    return X_static, X_seq.reshape(-1, X_seq.shape[1], 1), y[keep]
@@ -0,0 +1,56 @@
+# incidents/ml/training/export.py
+
+import json
+import os
+from datetime import datetime
+
+import joblib
+from sklearn.preprocessing import LabelEncoder
+
+from ..numpy_engine import export_weights
+from .features import FEATURE_NAMES
+
+
+def _label_encoder(classes):
+    encoder = LabelEncoder()
+    encoder.classes_ = classes
+    return encoder
+
+
+def export_artifacts(output_dir, trained, dataset, model_version='1.0'):
+    """
+    Écrit les fichiers chargés par F1IncidentPredictor dans output_dir
+
+    f1_model.h5, f1_model_weights.npz (backend NumPy), scaler_static.pkl,
+    scaler_seq.pkl, encoders.pkl et metadata.json (mêmes clés que l'export du notebook).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    model_path = os.path.join(output_dir, 'f1_model.h5')
+    trained['model'].save(model_path)
+    export_weights(model_path, os.path.join(output_dir, 'f1_model_weights.npz'))
+
+    joblib.dump(trained['scaler_static'], os.path.join(output_dir, 'scaler_static.pkl'))
+    joblib.dump(trained['scaler_seq'], os.path.join(output_dir, 'scaler_seq.pkl'))
+    joblib.dump(
+        {name: _label_encoder(classes) for name, classes in dataset['classes'].items()},
+        os.path.join(output_dir, 'encoders.pkl'),
+    )
+
+    classes = dataset['classes']['incident'].tolist()
+    metadata = {
+        'model_version': model_version,
+        'model_type': 'CNN+LSTM Hybrid',
+        'seq_length': int(dataset['X_seq'].shape[1]),
+        'classes': classes,
+        'feature_names': FEATURE_NAMES,
+        'test_accuracy': trained['test_accuracy'],
+        'trained_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'num_features_static': int(dataset['X_static'].shape[1]),
+        'num_classes': len(classes),
+        'dataset_key': dataset['key'],
+    }
+    with open(os.path.join(output_dir, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    return metadata
@@ -0,0 +1,255 @@
+# incidents/ml/training/features.py
+
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# À incrémenter quand la construction des features change (invalide le cache)
+FEATURE_VERSION = 2
+
+SOURCE_FILES = ('results.csv', 'races.csv', 'drivers.csv', 'circuits.csv',
+                'constructors.csv', 'status.csv', 'lap_times.csv', 'pit_stops.csv')
+
+# Mêmes colonnes et même ordre que F1IncidentPredictor._build_inputs
+FEATURE_COLUMNS = [
+    'grid_position', 'circuit_encoded', 'driver_encoded', 'constructor_encoded',
+    'year', 'laps_completed', 'num_pit_stops', 'position_change',
+]
+FEATURE_NAMES = [
+    'Position Grille', 'Circuit', 'Pilote', 'Écurie', 'Année',
+    'Tours Complétés', 'Nombre Pit Stops', 'Changement Position',
+]
+
+# Règles de classify_incident du notebook, dans l'ordre de priorité
+INCIDENT_RULES = [
+    ('collision', ['accident', 'collision', 'crash', 'spun off', 'damage']),
+    ('panne_moteur', ['engine', 'power unit', 'electrical', 'gearbox', 'transmission']),
+    ('probleme_pneus', ['tyre', 'tire', 'puncture', 'wheel']),
+    ('sortie_piste', ['spun', 'off track']),
+]
+DEFAULT_INCIDENT = 'safety_car'
+
+ENCODER_COLUMNS = {
+    'driver': 'driverRef',
+    'circuit': 'circuitRef',
+    'constructor': 'constructorRef',
+    'incident': 'incident_type',
+}
+
+
+def _read(data_dir, name, usecols):
+    return pd.read_csv(os.path.join(data_dir, name), usecols=usecols, na_values=['\\N'], keep_default_na=True)
+
+
+def dataset_key(data_dir, seq_length):
+    """Empreinte des CSV sources (contenu) et des paramètres de construction"""
+    digest = hashlib.sha1(f'v{FEATURE_VERSION}:seq{seq_length}'.encode())
+    for name in SOURCE_FILES:
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            continue
+        digest.update(name.encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+# --- Nettoyage vectorisé ---
+
+def clean_milliseconds(values):
+    """
+    Millisecondes Ergast en float, NaN si invalide
+
+    Version vectorisée de clean_milliseconds du notebook : '1,234' -> 1234,
+    '23.227.199' -> 23227199.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    text = values.astype('string').str.strip().str.replace(',', '', regex=False)
+    dotted = text.str.count(r'\.') > 1
+    text = text.where(~dotted, text.str.replace('.', '', regex=False))
+    return pd.to_numeric(text, errors='coerce').astype('float64')
+
+
+def parse_lap_time(values):
+    """'1:23.456' ou '83.456' -> millisecondes (vectorisé), NaN si invalide"""
+    parts = values.astype('string').str.strip().str.rsplit(':', n=1, expand=True)
+    if parts.shape[1] == 1:
+        return pd.to_numeric(parts[0], errors='coerce') * 1000
+    minutes = pd.to_numeric(parts[0], errors='coerce')
+    seconds = pd.to_numeric(parts[1], errors='coerce')
+    no_minutes = seconds.isna()
+    seconds = seconds.where(~no_minutes, minutes)
+    minutes = minutes.where(~no_minutes, 0)
+    return ((minutes * 60 + seconds) * 1000).astype('float64')
+
+
+def classify_incidents(status):
+    """Type d'incident de chaque statut Ergast (np.select sur les règles du notebook)"""
+    text = status.fillna('').str.lower()
+    conditions = [
+        text.str.contains('|'.join(words), regex=True) for _, words in INCIDENT_RULES
+    ]
+    labels = np.select(conditions, [label for label, _ in INCIDENT_RULES], default=DEFAULT_INCIDENT)
+    labels[status.isna().to_numpy()] = DEFAULT_INCIDENT
+    return pd.Series(labels, index=status.index)
+
+
+# --- Séquences ---
+
+def build_sequences(result_ids, laps, lap_ms, seq_length):
+    """
+    Derniers seq_length tours de chaque résultat, complétés par la moyenne
+
+    Tri unique, puis chaque tour est dispersé à sa colonne finale
+    (rang depuis la fin du groupe) : aucune boucle Python par groupe.
+
+    Returns:
+        (ids des résultats [G], séquences [G, seq_length] float32)
+    """
+    valid = ~np.isnan(lap_ms)
+    result_ids, laps, lap_ms = result_ids[valid], laps[valid], lap_ms[valid]
+
+    order = np.lexsort((laps, result_ids))
+    result_ids, lap_ms = result_ids[order], lap_ms[order]
+
+    groups, starts, counts = np.unique(result_ids, return_index=True, return_counts=True)
+    if len(groups) == 0:
+        return groups, np.empty((0, seq_length), dtype=np.float32)
+
+    means = np.add.reduceat(lap_ms, starts) / counts
+    sequences = np.repeat(means[:, None], seq_length, axis=1)
+
+    group = np.repeat(np.arange(len(groups)), counts)
+    rank_from_end = (starts + counts)[group] - 1 - np.arange(len(lap_ms))
+    keep = rank_from_end < seq_length
+    sequences[group[keep], seq_length - 1 - rank_from_end[keep]] = lap_ms[keep]
+
+    return groups, sequences.astype(np.float32)
+
+
+def grid_positions(grid, position):
+    """
+    Version vectorisée de incidents.features.grid_position
+
+    Grille absente ou 0 (départ des stands) : rang d'arrivée, sinon 10.
+    """
+    grid = pd.to_numeric(grid, errors='coerce')
+    position = pd.to_numeric(position, errors='coerce')
+    return grid.where(grid > 0, position).where(lambda g: g > 0, 10).astype(np.float64)
+
+
+# --- Jeu de données ---
+
+def _encode(values):
+    """Équivalent de LabelEncoder.fit_transform : (classes triées, codes)"""
+    classes, codes = np.unique(np.asarray(values.astype(str), dtype=str), return_inverse=True)
+    return classes, codes
+
+
+def build_dataset(data_dir, seq_length=10, cache_dir=None, log=print):
+    """
+    Construit (ou relit depuis le cache) le jeu d'entraînement du modèle hybride
+
+    Args:
+        data_dir: dossier des CSV Ergast
+        cache_dir: dossier du cache .npz (clé = empreinte des CSV), None pour désactiver
+
+    Returns:
+        dict avec X_static [n, 8] (non normalisé), X_seq [n, seq_length],
+        y [n], classes {encodeur: tableau de classes}, key
+    """
+    key = dataset_key(data_dir, seq_length)
+    cache_path = os.path.join(cache_dir, f'dataset_{key}.npz') if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as cached:
+            log(f"✅ Jeu de données en cache: {cache_path}")
+            return {
+                'X_static': cached['X_static'],
+                'X_seq': cached['X_seq'],
+                'y': cached['y'],
+                'classes': {name: cached[f'classes_{name}'] for name in ENCODER_COLUMNS},
+                'key': key,
+            }
+
+    start = time.perf_counter()
+
+    results = _read(data_dir, 'results.csv', [
+        'resultId', 'raceId', 'driverId', 'constructorId', 'grid', 'position', 'laps', 'statusId',
+    ])
+    races = _read(data_dir, 'races.csv', ['raceId', 'year', 'circuitId'])
+    drivers = _read(data_dir, 'drivers.csv', ['driverId', 'driverRef'])
+    circuits = _read(data_dir, 'circuits.csv', ['circuitId', 'circuitRef'])
+    constructors = _read(data_dir, 'constructors.csv', ['constructorId', 'constructorRef'])
+    status = _read(data_dir, 'status.csv', ['statusId', 'status'])
+
+    # Jointures par index (tables de référence petites, clés uniques)
+    df = results.join(races.set_index('raceId'), on='raceId')
+    df = df.join(drivers.set_index('driverId'), on='driverId')
+    df = df.join(circuits.set_index('circuitId'), on='circuitId')
+    df = df.join(status.set_index('statusId'), on='statusId')
+    df = df.join(constructors.set_index('constructorId'), on='constructorId')
+
+    df['incident_type'] = classify_incidents(df['status'])
+    df['grid_position'] = grid_positions(df['grid'], df['position'])
+    df['laps_completed'] = pd.to_numeric(df['laps'], errors='coerce')
+    # Le résultat final n'est pas connu au moment de la prédiction : 0 comme au service
+    df['position_change'] = 0.0
+
+    classes = {}
+    for name, column in ENCODER_COLUMNS.items():
+        values = df[column] if name == 'incident' else df[column].fillna('unknown')
+        classes[name], df[f'{name}_encoded'] = _encode(values)
+    log(f"🔄 Résultats préparés: {len(df)} lignes ({time.perf_counter() - start:.1f}s)")
+
+    # Temps au tour : millisecondes nettoyées, colonne time en secours
+    lap_times = _read(data_dir, 'lap_times.csv', ['raceId', 'driverId', 'lap', 'time', 'milliseconds'])
+    lap_ms = clean_milliseconds(lap_times['milliseconds'])
+    missing = lap_ms.isna()
+    if missing.any():
+        lap_ms[missing] = parse_lap_time(lap_times.loc[missing, 'time'])
+
+    # (course, pilote) -> ligne de résultat (premier résultat si doublon Ergast)
+    keys = df[['raceId', 'driverId']]
+    first = ~keys.duplicated().to_numpy()
+    result_index = pd.MultiIndex.from_frame(keys[first])
+    positions = np.flatnonzero(first)
+
+    def result_rows(frame):
+        found = result_index.get_indexer(pd.MultiIndex.from_frame(frame[['raceId', 'driverId']]))
+        return np.where(found >= 0, positions[found], -1)
+
+    lap_result = result_rows(lap_times)
+    matched = lap_result >= 0
+    groups, sequences = build_sequences(
+        lap_result[matched], lap_times['lap'].to_numpy()[matched], lap_ms.to_numpy()[matched], seq_length
+    )
+    log(f"🔄 Séquences créées: {len(groups)} ({time.perf_counter() - start:.1f}s)")
+
+    # Nombre d'arrêts par résultat
+    pit_stops = _read(data_dir, 'pit_stops.csv', ['raceId', 'driverId'])
+    pit_result = result_rows(pit_stops)
+    pit_counts = np.bincount(pit_result[pit_result >= 0], minlength=len(df))
+    df['num_pit_stops'] = pit_counts
+
+    df = df.iloc[groups]
+    X_static = df[FEATURE_COLUMNS].fillna(0).to_numpy(dtype=np.float64)
+    y = df['incident_encoded'].to_numpy(dtype=np.int64)
+
+    dataset = {'X_static': X_static, 'X_seq': sequences, 'y': y, 'classes': classes, 'key': key}
+    log(f"✅ Jeu de données: {len(y)} exemples en {time.perf_counter() - start:.1f}s")
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f'{cache_path}.tmp.npz'
+        np.savez(
+            tmp, X_static=X_static, X_seq=sequences, y=y,
+            **{f'classes_{name}': values for name, values in classes.items()}
+        )
+        os.replace(tmp, cache_path)
+
+    return dataset
@@ -0,0 +1,122 @@
+# incidents/ml/training/model.py
+
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+
+def build_hybrid_model(static_shape, seq_length, num_classes):
+    """
+    Modèle hybride (architecture du notebook, noms de couches attendus par numpy_engine):
+    - Branche 1: Dense pour features statiques (pilote, circuit, écurie)
+    - Branche 2: CNN + LSTM pour séquences temporelles (temps au tour)
+    """
+    from tensorflow import keras
+    from tensorflow.keras import layers, models
+
+    # Remet à zéro les compteurs de noms : dense, dense_1, ... comme à l'entraînement d'origine
+    keras.backend.clear_session()
+
+    input_static = layers.Input(shape=(static_shape,), name='static_input')
+    x1 = layers.Dense(128, activation='relu')(input_static)
+    x1 = layers.BatchNormalization()(x1)
+    x1 = layers.Dropout(0.3)(x1)
+    x1 = layers.Dense(64, activation='relu')(x1)
+    x1 = layers.Dropout(0.2)(x1)
+
+    input_seq = layers.Input(shape=(seq_length, 1), name='seq_input')
+    x2 = layers.Conv1D(64, kernel_size=3, activation='relu', padding='same')(input_seq)
+    x2 = layers.BatchNormalization()(x2)
+    x2 = layers.MaxPooling1D(pool_size=2)(x2)
+    x2 = layers.Conv1D(32, kernel_size=3, activation='relu', padding='same')(x2)
+    x2 = layers.BatchNormalization()(x2)
+    x2 = layers.LSTM(64, return_sequences=True)(x2)
+    x2 = layers.Dropout(0.3)(x2)
+    x2 = layers.LSTM(32, return_sequences=False)(x2)
+    x2 = layers.Dropout(0.2)(x2)
+
+    merged = layers.concatenate([x1, x2])
+    z = layers.Dense(128, activation='relu')(merged)
+    z = layers.BatchNormalization()(z)
+    z = layers.Dropout(0.4)(z)
+    z = layers.Dense(64, activation='relu')(z)
+    z = layers.Dropout(0.3)(z)
+    output = layers.Dense(num_classes, activation='softmax', name='output')(z)
+
+    model = models.Model(inputs=[input_static, input_seq], outputs=output)
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy'],
+    )
+    return model
+
+
+def split_dataset(y, test_size=0.2, seed=42):
+    """
+    Indices (train, test) du split stratifié du notebook (random_state=42)
+
+    Le même split sert à l'entraînement et aux rapports sur le jeu de test.
+    """
+    counts = np.bincount(y)
+    stratify = y if counts[counts > 0].min() >= 2 else None
+    return train_test_split(np.arange(len(y)), test_size=test_size, random_state=seed, stratify=stratify)
+
+
+def train_model(dataset, epochs=100, batch_size=64, test_size=0.2, seed=42, log=print):
+    """
+    Split stratifié, normalisation et entraînement (mêmes callbacks que le notebook)
+
+    Returns:
+        dict avec model, scaler_static, scaler_seq, test_accuracy, test_loss, epochs
+    """
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(seed)
+
+    X_static, X_seq, y = dataset['X_static'], dataset['X_seq'], dataset['y']
+    seq_length = X_seq.shape[1]
+
+    train, test = split_dataset(y, test_size, seed)
+    X_static_train, X_static_test = X_static[train], X_static[test]
+    X_seq_train, X_seq_test = X_seq[train], X_seq[test]
+    y_train, y_test = y[train], y[test]
+
+    # Scalers ajustés sur le train uniquement
+    scaler_static = StandardScaler().fit(X_static_train)
+    scaler_seq = StandardScaler().fit(X_seq_train)
+
+    def scale(X_s, X_q):
+        return scaler_static.transform(X_s), scaler_seq.transform(X_q).reshape(-1, seq_length, 1)
+
+    X_static_train, X_seq_train = scale(X_static_train, X_seq_train)
+    X_static_test, X_seq_test = scale(X_static_test, X_seq_test)
+
+    model = build_hybrid_model(X_static.shape[1], seq_length, len(dataset['classes']['incident']))
+    callbacks = [
+        keras.callbacks.EarlyStopping(monitor='val_loss', patience=15, restore_best_weights=True),
+        keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=7, min_lr=1e-6),
+    ]
+
+    start = time.perf_counter()
+    history = model.fit(
+        [X_static_train, X_seq_train], y_train,
+        validation_split=0.2,
+        epochs=epochs,
+        batch_size=batch_size,
+        callbacks=callbacks,
+        verbose=0,
+    )
+    log(f"✅ Entraînement: {len(history.history['loss'])} epochs en {time.perf_counter() - start:.1f}s")
+
+    test_loss, test_accuracy = model.evaluate([X_static_test, X_seq_test], y_test, verbose=0)
+    return {
+        'model': model,
+        'scaler_static': scaler_static,
+        'scaler_seq': scaler_seq,
+        'test_accuracy': float(test_accuracy),
+        'test_loss': float(test_loss),
+        'epochs': len(history.history['loss']),
+    }
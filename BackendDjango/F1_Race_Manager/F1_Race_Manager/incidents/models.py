@@ -1,3 +1,107 @@
 from django.db import models
 
-# Create your models here.
+from circuits.models import Circuit
+from pilots.models import Pilote
+from races.models import Race, Season
+
+
+class IncidentPrediction(models.Model):
+    """Prédiction d'incidents précalculée pour un pilote dans une course"""
+    RISK_LEVEL_CHOICES = [
+        ('LOW', 'Faible'),
+        ('MODERATE', 'Modéré'),
+        ('HIGH', 'Élevé'),
+        ('CRITICAL', 'Critique'),
+    ]
+    
+    # Classes du modèle (metadata.json), dans l'ordre des probabilités
+    PROBABILITY_FIELDS = ['collision', 'panne_moteur', 'probleme_pneus', 'safety_car']
+    
+    race = models.ForeignKey(Race, on_delete=models.CASCADE, related_name='incident_predictions', verbose_name="Course")
+    pilot = models.ForeignKey(Pilote, on_delete=models.CASCADE, related_name='incident_predictions', verbose_name="Pilote")
+    model_version = models.CharField(max_length=50, verbose_name="Version du modèle")
+    fingerprint = models.CharField(
+        max_length=32,
+        verbose_name="Empreinte des données",
+        help_text="race_fingerprint() au moment du calcul"
+    )
+    
+    collision = models.FloatField(default=0.0, verbose_name="Collision")
+    panne_moteur = models.FloatField(default=0.0, verbose_name="Panne moteur")
+    probleme_pneus = models.FloatField(default=0.0, verbose_name="Problème pneus")
+    safety_car = models.FloatField(default=0.0, verbose_name="Safety car")
+    risque_total = models.FloatField(verbose_name="Risque total")
+    risk_level = models.CharField(max_length=10, choices=RISK_LEVEL_CHOICES, verbose_name="Niveau de risque")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Prédiction d'incident"
+        verbose_name_plural = "Prédictions d'incidents"
+        ordering = ['race', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['race', 'pilot', 'model_version'], name='unique_incident_prediction'),
+        ]
+        indexes = [
+            models.Index(fields=['race', 'model_version', 'fingerprint'], name='incident_pred_lookup_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pilot.nom} - {self.race.nom} ({self.risk_level}, v{self.model_version})"
+    
+    def risks(self):
+        """Dict de risques au format de F1IncidentPredictor.predict"""
+        result = {name: getattr(self, name) for name in self.PROBABILITY_FIELDS}
+        result['risque_total'] = self.risque_total
+        return result
+
+
+class IncidentRiskRollup(models.Model):
+    """
+    Agrégat des prédictions stockées par (circuit, écurie, saison) et version du modèle
+
+    L'écurie est celle du pilote à cette course (RaceResult.constructor_ref).
+    Tenu à jour par incidents.risk_cube.refresh_races à chaque écriture de
+    prédictions : l'API d'exploration ne lit jamais IncidentPrediction.
+    """
+    # Risques agrégés (moyenne et maximum), IncidentPrediction.PROBABILITY_FIELDS + risque_total
+    RISK_FIELDS = IncidentPrediction.PROBABILITY_FIELDS + ['risque_total']
+    
+    circuit = models.ForeignKey(Circuit, on_delete=models.CASCADE, related_name='incident_rollups', verbose_name="Circuit")
+    season = models.ForeignKey(Season, on_delete=models.CASCADE, related_name='incident_rollups', verbose_name="Saison")
+    constructor = models.CharField(max_length=150, verbose_name="Écurie")
+    model_version = models.CharField(max_length=50, verbose_name="Version du modèle")
+    
+    n_predictions = models.PositiveIntegerField(default=0, verbose_name="Prédictions")
+    high_count = models.PositiveIntegerField(default=0, verbose_name="Risques élevés")
+    critical_count = models.PositiveIntegerField(default=0, verbose_name="Risques critiques")
+    
+    mean_collision = models.FloatField(default=0.0)
+    mean_panne_moteur = models.FloatField(default=0.0)
+    mean_probleme_pneus = models.FloatField(default=0.0)
+    mean_safety_car = models.FloatField(default=0.0)
+    mean_risque_total = models.FloatField(default=0.0)
+    max_collision = models.FloatField(default=0.0)
+    max_panne_moteur = models.FloatField(default=0.0)
+    max_probleme_pneus = models.FloatField(default=0.0)
+    max_safety_car = models.FloatField(default=0.0)
+    max_risque_total = models.FloatField(default=0.0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Agrégat de risques"
+        verbose_name_plural = "Agrégats de risques"
+        ordering = ['season', 'circuit', 'constructor']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['circuit', 'season', 'constructor', 'model_version'], name='unique_incident_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['model_version', 'season'], name='incident_rollup_season_idx'),
+            models.Index(fields=['model_version', 'constructor'], name='incident_rollup_constr_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.circuit.nom} - {self.constructor} ({self.season.annee}, v{self.model_version})"
@@ -0,0 +1,232 @@
+# incidents/prediction_cache.py
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+
+from races.models import LapTime, PitStop, RaceResult, RaceStrategy
+
+_lock = threading.Lock()
+_stats = {
+    'hits': 0, 'misses': 0, 'stale_hits': 0, 'invalidations': 0,
+    'lock_waits': 0, 'lock_wait_hits': 0,
+    'scenario_hits': 0, 'scenario_misses': 0,
+}
+
+
+def _cache():
+    return caches[getattr(settings, 'INCIDENT_CACHE_ALIAS', 'default')]
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _generation_key(race_id):
+    return f'incidents:race-gen:{race_id}'
+
+
+def race_fingerprint(race):
+    """
+    Empreinte des entrées d'une course (course, résultats, stratégies, tours, arrêts)
+
+    Détecte aussi les modifications faites sans signal (update(), autre worker).
+    """
+    return _fingerprint(race, [queryset.aggregate(**aggregates) for queryset, aggregates in _fingerprint_sources(race)])
+
+
+async def arace_fingerprint(race):
+    """race_fingerprint par l'ORM asynchrone"""
+    return _fingerprint(race, [
+        await queryset.aaggregate(**aggregates) for queryset, aggregates in _fingerprint_sources(race)
+    ])
+
+
+def _fingerprint_sources(race):
+    return [
+        (RaceResult.objects.filter(race_id=race.id), {'n': Count('id'), 'last': Max('updated_at')}),
+        (RaceStrategy.objects.filter(race_id=race.id), {'n': Count('id'), 'last': Max('updated_at')}),
+        (LapTime.objects.filter(race_id=race.id), {'n': Count('id'), 'last': Max('id')}),
+        (PitStop.objects.filter(race_id=race.id), {'n': Count('id'), 'last': Max('id')}),
+    ]
+
+
+def _fingerprint(race, aggregates):
+    results, strategies, laps, pits = aggregates
+    raw = (
+        f"{race.updated_at}|{results['n']}|{results['last']}|{strategies['n']}|{strategies['last']}"
+        f"|{laps['n']}|{laps['last']}|{pits['n']}|{pits['last']}"
+    )
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _key(race_id, model_version, fingerprint, generation=None):
+    if generation is None:
+        generation = _cache().get(_generation_key(race_id), 0)
+    return f'incidents:race:{race_id}:{model_version}:{generation}:{fingerprint}'
+
+
+async def _akey(race_id, model_version, fingerprint):
+    return _key(race_id, model_version, fingerprint, await _cache().aget(_generation_key(race_id), 0))
+
+
+def get_race_prediction(race_id, model_version, fingerprint):
+    """
+    Réponse en cache : (payload, périmée) ou (None, False)
+
+    Une réponse périmée (au-delà de INCIDENT_CACHE_TTL, dans la marge
+    INCIDENT_CACHE_STALE_SECONDS) reste servie pendant qu'un seul appel la recalcule.
+    """
+    return _read_entry(_cache().get(_key(race_id, model_version, fingerprint)))
+
+
+async def aget_race_prediction(race_id, model_version, fingerprint):
+    return _read_entry(await _cache().aget(await _akey(race_id, model_version, fingerprint)))
+
+
+def _read_entry(entry):
+    if entry is None:
+        _count('misses')
+        return None, False
+    stale = time.time() >= entry['fresh_until']
+    _count('stale_hits' if stale else 'hits')
+    return entry['payload'], stale
+
+
+def set_race_prediction(race_id, model_version, fingerprint, payload):
+    _cache().set(_key(race_id, model_version, fingerprint), *_new_entry(payload))
+
+
+async def aset_race_prediction(race_id, model_version, fingerprint, payload):
+    await _cache().aset(await _akey(race_id, model_version, fingerprint), *_new_entry(payload))
+
+
+def _new_entry(payload):
+    """(entrée, durée de vie dans le cache) : fraîche INCIDENT_CACHE_TTL, puis servie périmée"""
+    ttl = getattr(settings, 'INCIDENT_CACHE_TTL', 300)
+    return (
+        {'payload': payload, 'fresh_until': time.time() + ttl},
+        ttl + getattr(settings, 'INCIDENT_CACHE_STALE_SECONDS', 60),
+    )
+
+
+def _lock_key(race_id, model_version, fingerprint):
+    return f'incidents:race-lock:{race_id}:{model_version}:{fingerprint}'
+
+
+def lock_race(race_id, model_version, fingerprint):
+    """
+    Verrou inter-workers du calcul d'une course (cache.add atomique)
+
+    Toujours True sans INCIDENT_CACHE_LOCKS ; n'a de sens qu'avec un cache
+    commun aux workers (Redis, Memcached, base de données).
+    """
+    if not getattr(settings, 'INCIDENT_CACHE_LOCKS', False):
+        return True
+    return _cache().add(_lock_key(race_id, model_version, fingerprint), os.getpid(), _lock_timeout())
+
+
+async def alock_race(race_id, model_version, fingerprint):
+    if not getattr(settings, 'INCIDENT_CACHE_LOCKS', False):
+        return True
+    return await _cache().aadd(_lock_key(race_id, model_version, fingerprint), os.getpid(), _lock_timeout())
+
+
+def _lock_timeout():
+    return getattr(settings, 'INCIDENT_CACHE_LOCK_TIMEOUT', 10)
+
+
+def unlock_race(race_id, model_version, fingerprint):
+    if getattr(settings, 'INCIDENT_CACHE_LOCKS', False):
+        _cache().delete(_lock_key(race_id, model_version, fingerprint))
+
+
+async def aunlock_race(race_id, model_version, fingerprint):
+    if getattr(settings, 'INCIDENT_CACHE_LOCKS', False):
+        await _cache().adelete(_lock_key(race_id, model_version, fingerprint))
+
+
+def wait_race_prediction(race_id, model_version, fingerprint, poll_interval=0.02):
+    """
+    Attend la réponse qu'un autre worker est en train de calculer
+
+    Returns:
+        payload publié, ou None si son verrou a disparu ou expiré sans réponse
+    """
+    _count('lock_waits')
+    key = _key(race_id, model_version, fingerprint)
+    lock_key = _lock_key(race_id, model_version, fingerprint)
+    deadline = time.monotonic() + _lock_timeout()
+    while time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        payload = _published(_cache().get(key))
+        if payload is not None:
+            return payload
+        if _cache().get(lock_key) is None:
+            return None
+    return None
+
+
+async def await_race_prediction(race_id, model_version, fingerprint, poll_interval=0.02):
+    """wait_race_prediction sans bloquer la boucle d'événements"""
+    _count('lock_waits')
+    key = await _akey(race_id, model_version, fingerprint)
+    lock_key = _lock_key(race_id, model_version, fingerprint)
+    deadline = time.monotonic() + _lock_timeout()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(poll_interval)
+        payload = _published(await _cache().aget(key))
+        if payload is not None:
+            return payload
+        if await _cache().aget(lock_key) is None:
+            return None
+    return None
+
+
+def _published(entry):
+    if entry is not None and time.time() < entry['fresh_until']:
+        _count('lock_wait_hits')
+        return entry['payload']
+    return None
+
+
+def _scenario_key(race_id, model_version, fingerprint, pilot_id, axes):
+    digest = hashlib.md5(repr((pilot_id, axes)).encode()).hexdigest()
+    return f'{_key(race_id, model_version, fingerprint)}:scenario:{digest}'
+
+
+def get_scenario(race_id, model_version, fingerprint, pilot_id, axes):
+    """Surface d'un balayage déjà calculé (mêmes axes, dans le même ordre) ou None"""
+    payload = _cache().get(_scenario_key(race_id, model_version, fingerprint, pilot_id, axes))
+    _count('scenario_hits' if payload is not None else 'scenario_misses')
+    return payload
+
+
+def set_scenario(race_id, model_version, fingerprint, pilot_id, axes, payload):
+    # Même génération que la course : invalidate_race rend aussi les balayages obsolètes
+    _cache().set(
+        _scenario_key(race_id, model_version, fingerprint, pilot_id, axes),
+        payload,
+        getattr(settings, 'INCIDENT_CACHE_TTL', 300),
+    )
+
+
+def invalidate_race(race_id):
+    """Rend obsolètes toutes les entrées d'une course (nouvelle génération)"""
+    _cache().set(_generation_key(race_id), time.time_ns(), None)
+    _count('invalidations')
+
+
+def cache_stats():
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+    return stats
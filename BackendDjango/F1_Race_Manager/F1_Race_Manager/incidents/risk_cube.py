@@ -0,0 +1,165 @@
+# incidents/risk_cube.py
+
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from races.models import Race, RaceResult
+
+from .models import IncidentPrediction, IncidentRiskRollup
+
+# Dimensions d'exploration : clé de réponse -> champ de IncidentRiskRollup
+DIMENSIONS = {
+    'season': {'season': 'season__annee'},
+    'circuit': {'circuit_id': 'circuit_id', 'circuit_name': 'circuit__nom'},
+    'constructor': {'constructor': 'constructor'},
+}
+
+SORT_FIELDS = (
+    [f'mean_{name}' for name in IncidentRiskRollup.RISK_FIELDS]
+    + [f'max_{name}' for name in IncidentRiskRollup.RISK_FIELDS]
+    + ['n_predictions', 'high_count', 'critical_count']
+)
+
+# Cellules (circuit, saison) recalculées par requête
+CELLS_PER_QUERY = 200
+
+# Écurie d'un résultat importé sans constructorRef (saisie manuelle)
+UNKNOWN_CONSTRUCTOR = 'unknown'
+
+
+def _race_constructor():
+    """constructorRef du RaceResult de la prédiction : l'écurie au moment de la course, pas l'actuelle"""
+    ref = RaceResult.objects.filter(race_id=OuterRef('race_id'), pilot_id=OuterRef('pilot_id')).values('constructor_ref')[:1]
+    return Coalesce(NullIf(Subquery(ref), Value('')), Value(UNKNOWN_CONSTRUCTOR))
+
+
+def _cells_filter(cells, circuit='circuit_id', season='season_id'):
+    return reduce(or_, (Q(**{circuit: c, season: s}) for c, s in cells))
+
+
+def refresh_races(race_ids, model_version=None):
+    """
+    Recalcule les cellules (circuit, saison) touchées par des courses
+
+    Chaque cellule est réagrégée depuis ses seules prédictions, toutes
+    écuries confondues, puis remplacée : les moyennes et maximums restent
+    exacts même quand des prédictions sont remplacées ou supprimées.
+
+    Returns:
+        nombre de lignes d'agrégat écrites
+    """
+    cells = sorted(set(Race.objects.filter(id__in=race_ids).values_list('circuit_id', 'season_id')))
+    return refresh_cells(cells, model_version)
+
+
+def refresh_cells(cells, model_version=None):
+    """Recalcule des cellules [(circuit_id, season_id), ...] (toutes versions si model_version est None)"""
+    written = 0
+    for i in range(0, len(cells), CELLS_PER_QUERY):
+        chunk = cells[i:i + CELLS_PER_QUERY]
+        predictions = IncidentPrediction.objects.filter(
+            _cells_filter(chunk, 'race__circuit_id', 'race__season_id')
+        )
+        rollups = IncidentRiskRollup.objects.filter(_cells_filter(chunk))
+        if model_version is not None:
+            predictions = predictions.filter(model_version=model_version)
+            rollups = rollups.filter(model_version=model_version)
+
+        aggregates = (
+            predictions
+            .order_by()
+            .annotate(race_constructor=_race_constructor())
+            .values('race__circuit_id', 'race__season_id', 'race_constructor', 'model_version')
+            .annotate(
+                n_predictions=Count('id'),
+                high_count=Count('id', filter=Q(risk_level='HIGH')),
+                critical_count=Count('id', filter=Q(risk_level='CRITICAL')),
+                **{f'mean_{name}': Avg(name) for name in IncidentRiskRollup.RISK_FIELDS},
+                **{f'max_{name}': Max(name) for name in IncidentRiskRollup.RISK_FIELDS},
+            )
+        )
+        objects = [
+            IncidentRiskRollup(
+                circuit_id=row.pop('race__circuit_id'),
+                season_id=row.pop('race__season_id'),
+                constructor=row.pop('race_constructor'),
+                **row,
+            )
+            for row in aggregates
+        ]
+
+        with transaction.atomic():
+            rollups.delete()
+            IncidentRiskRollup.objects.bulk_create(objects, batch_size=1000)
+        written += len(objects)
+    return written
+
+
+def rebuild(season=None, model_version=None):
+    """Recalcule tout le cube (ou une saison)"""
+    races = Race.objects.all()
+    if season is not None:
+        races = races.filter(season__annee=season)
+    cells = sorted(set(races.values_list('circuit_id', 'season_id')))
+    return refresh_cells(cells, model_version) if cells else 0
+
+
+def query(model_version, group_by, filters=None, sort='mean_risque_total', descending=True, limit=10):
+    """
+    Exploration du cube : regroupement, filtres de descente et top N
+
+    Args:
+        group_by: dimensions parmi DIMENSIONS (ex: ['circuit'] puis
+                  ['constructor'] avec filters={'circuit': 12} pour descendre)
+        filters: {'season': 2021, 'circuit': <id>, 'constructor': 'ferrari'} (constructorRef)
+        sort: un champ de SORT_FIELDS
+
+    Les moyennes d'un groupe sont pondérées par le nombre de prédictions
+    de chaque cellule ; seule la table d'agrégats est lue.
+    """
+    queryset = IncidentRiskRollup.objects.filter(model_version=model_version)
+    filters = filters or {}
+    if filters.get('season') is not None:
+        queryset = queryset.filter(season__annee=filters['season'])
+    if filters.get('circuit') is not None:
+        queryset = queryset.filter(circuit_id=filters['circuit'])
+    if filters.get('constructor') is not None:
+        queryset = queryset.filter(constructor=filters['constructor'])
+
+    keys = {key: field for dimension in group_by for key, field in DIMENSIONS[dimension].items()}
+    fields = list(keys.values())
+    total = Cast(Sum('n_predictions'), FloatField())
+    rows = (
+        queryset
+        .order_by()
+        .values(*fields)
+        # Les annotations portent le nom des colonnes : les moyennes pondérées passent
+        # avant que n_predictions ne désigne la somme du groupe
+        .annotate(**{
+            f'mean_{name}': Sum(F(f'mean_{name}') * F('n_predictions'), output_field=FloatField()) / total
+            for name in IncidentRiskRollup.RISK_FIELDS
+        })
+        .annotate(
+            **{f'max_{name}': Max(f'max_{name}') for name in IncidentRiskRollup.RISK_FIELDS},
+            n_predictions=Sum('n_predictions'),
+            high_count=Sum('high_count'),
+            critical_count=Sum('critical_count'),
+        )
+        .order_by(f"{'-' if descending else ''}{sort}", *fields)
+    )[:limit]
+
+    return [
+        {
+            **{key: row[field] for key, field in keys.items()},
+            'n_predictions': row['n_predictions'],
+            'high_count': row['high_count'],
+            'critical_count': row['critical_count'],
+            'mean': {name: round(row[f'mean_{name}'], 4) for name in IncidentRiskRollup.RISK_FIELDS},
+            'max': {name: round(row[f'max_{name}'], 4) for name in IncidentRiskRollup.RISK_FIELDS},
+        }
+        for row in rows
+    ]
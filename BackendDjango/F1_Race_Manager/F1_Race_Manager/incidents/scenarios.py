@@ -0,0 +1,119 @@
+# incidents/scenarios.py
+
+import numpy as np
+from django.conf import settings
+
+from .ml.predictor import SWEEP_AXES, SWEEP_LAP_AXES
+
+# Bornes des axes entiers (les perturbations de temps au tour sont libres)
+AXIS_BOUNDS = {
+    'grid_position': (1, 30),
+    'num_pit_stops': (0, 10),
+    'position_change': (-30, 30),
+}
+
+
+class ScenarioError(ValueError):
+    """Balayage invalide (message renvoyé tel quel au client)"""
+
+
+def max_points():
+    return getattr(settings, 'INCIDENT_SCENARIO_MAX_POINTS', 2048)
+
+
+def _number(name, value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ScenarioError(f"{name}: valeur numérique attendue, reçu {value!r}")
+    return value
+
+
+def _axis_values(name, spec, limit):
+    """
+    Valeurs d'un axe : nombre seul, liste de nombres ou {'start', 'stop', 'step'} (bornes incluses)
+
+    Le nombre de valeurs est vérifié avant de matérialiser la plage.
+    """
+    if isinstance(spec, dict):
+        try:
+            start, stop = _number(name, spec['start']), _number(name, spec['stop'])
+        except KeyError:
+            raise ScenarioError(f"{name}: start et stop requis")
+        step = _number(name, spec.get('step', 1))
+        if step <= 0 or stop < start:
+            raise ScenarioError(f"{name}: step > 0 et start <= stop requis")
+        count = int((stop - start) // step) + 1
+        if count > limit:
+            raise ScenarioError(f"{name}: {count} valeurs, maximum {limit}")
+        values = [start + i * step for i in range(count)]
+    elif isinstance(spec, list):
+        if not spec or len(spec) > limit:
+            raise ScenarioError(f"{name}: entre 1 et {limit} valeurs")
+        values = [_number(name, value) for value in spec]
+    else:
+        values = [_number(name, spec)]
+
+    if name in SWEEP_LAP_AXES:
+        return [round(float(value), 3) for value in values]
+
+    low, high = AXIS_BOUNDS[name]
+    if any(value != int(value) or not low <= value <= high for value in values):
+        raise ScenarioError(f"{name}: entiers entre {low} et {high} attendus")
+    return [int(value) for value in values]
+
+
+def parse_sweep(sweep):
+    """
+    Axes d'un balayage dans l'ordre reçu : [(nom, [valeurs]), ...]
+
+    Raises:
+        ScenarioError: axe inconnu, valeurs invalides ou grille au-delà de INCIDENT_SCENARIO_MAX_POINTS
+    """
+    if not isinstance(sweep, dict) or not sweep:
+        raise ScenarioError(f"sweep requis : {{axe: valeurs}} parmi {', '.join(SWEEP_AXES)}")
+    unknown = [name for name in sweep if name not in SWEEP_AXES]
+    if unknown:
+        raise ScenarioError(f"Axes inconnus: {', '.join(unknown)} (possibles: {', '.join(SWEEP_AXES)})")
+
+    limit = max_points()
+    axes = []
+    points = 1
+    for name, spec in sweep.items():
+        values = _axis_values(name, spec, limit)
+        points *= len(values)
+        if points > limit:
+            raise ScenarioError(f"Grille de plus de {limit} points, réduire les plages")
+        axes.append((name, values))
+    return axes
+
+
+def surface_payload(axes, proba, base_proba, classes):
+    """
+    Surface compacte : une grille imbriquée par classe (et risque_total), ordre des axes
+
+    Args:
+        proba: [n_1, ..., n_k, n_classes] (F1IncidentPredictor.predict_sweep)
+        base_proba: [n_classes] de la ligne de base
+    """
+    classes = list(classes)
+    total_mask = np.array([cls != 'safety_car' for cls in classes])
+    total = proba[..., total_mask].sum(axis=-1)
+
+    def point(flat_index):
+        index = np.unravel_index(flat_index, total.shape)
+        return {name: values[i] for (name, values), i in zip(axes, index)}
+
+    surface = {cls: np.round(proba[..., i], 4).tolist() for i, cls in enumerate(classes)}
+    surface['risque_total'] = np.round(total, 4).tolist()
+
+    base = {cls: round(float(base_proba[i]), 4) for i, cls in enumerate(classes)}
+    base['risque_total'] = round(float(base_proba[total_mask].sum()), 4)
+
+    return {
+        'axes': [{'name': name, 'values': values} for name, values in axes],
+        'shape': list(total.shape),
+        'points': int(total.size),
+        'base_risks': base,
+        'surface': surface,
+        'min': {'risque_total': round(float(total.min()), 4), 'at': point(int(total.argmin()))},
+        'max': {'risque_total': round(float(total.max()), 4), 'at': point(int(total.argmax()))},
+    }
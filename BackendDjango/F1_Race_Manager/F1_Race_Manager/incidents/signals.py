@@ -0,0 +1,48 @@
+# incidents/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from races.models import LapTime, PitStop, Race, RaceResult, RaceStrategy
+
+from . import prediction_cache, risk_cube, streaming
+
+
+@receiver([post_save, post_delete], sender=Race)
+def invalidate_race_cache(sender, instance, **kwargs):
+    prediction_cache.invalidate_race(instance.pk)
+
+
+@receiver(post_save, sender=Race)
+def evict_live_session(sender, instance, **kwargs):
+    # La session en direct ne vit que pendant la course
+    if instance.statut != 'en_cours':
+        streaming.sessions.evict(instance.pk)
+
+
+@receiver(post_delete, sender=Race)
+def evict_deleted_race_session(sender, instance, **kwargs):
+    streaming.sessions.evict(instance.pk)
+
+
+@receiver(post_delete, sender=Race)
+def refresh_deleted_race_rollups(sender, instance, **kwargs):
+    # Les prédictions de la course partent en cascade : sa cellule du cube est réagrégée
+    risk_cube.refresh_cells([(instance.circuit_id, instance.season_id)])
+
+
+@receiver([post_save, post_delete], sender=RaceResult)
+@receiver([post_save, post_delete], sender=RaceStrategy)
+def invalidate_race_cache_from_entry(sender, instance, **kwargs):
+    prediction_cache.invalidate_race(instance.race_id)
+
+
+@receiver(post_save, sender=LapTime)
+@receiver(post_save, sender=PitStop)
+def touch_race_from_timing(sender, instance, created, **kwargs):
+    # Une création change déjà l'empreinte (nombre, dernier id) ; une
+    # modification sur place non : la course est marquée modifiée
+    if not created:
+        Race.objects.filter(pk=instance.race_id).update(updated_at=timezone.now())
+    prediction_cache.invalidate_race(instance.race_id)
@@ -0,0 +1,112 @@
+# incidents/single_flight.py
+
+import asyncio
+import threading
+
+_flights = []
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Un seul calcul en cours par clé dans le processus
+
+    Les appels concurrents sur une clé déjà en calcul attendent et partagent
+    le résultat (ou l'exception) du premier ; rien n'est gardé une fois le
+    calcul terminé (le cache des prédictions s'en charge).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self._leaders = 0
+        self._coalesced = 0
+        _flights.append(self)
+
+    def do(self, key, fn):
+        """
+        Returns:
+            (résultat de fn, partagé) ; partagé vaut True si le calcul d'un autre appel a été réutilisé
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key, fn):
+        """
+        do() pour les vues asynchrones : fn est une fonction coroutine, l'attente ne bloque pas la boucle
+
+        Le calcul tourne dans sa propre tâche, attendue à travers shield() par
+        tous les appels : l'annulation de l'un d'eux (client déconnecté), même
+        du premier, n'interrompt pas le calcul des autres. Les appels ne sont
+        regroupés qu'au sein d'une même boucle d'événements.
+        """
+        loop = asyncio.get_running_loop()
+        key = (id(loop), key)
+        with self._lock:
+            task = self._async_calls.get(key)
+            leader = task is None
+            if leader:
+                task = self._async_calls[key] = loop.create_task(fn())
+                task.add_done_callback(lambda done: self._async_done(key, done))
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+
+        return await asyncio.shield(task), not leader
+
+    def _async_done(self, key, task):
+        with self._lock:
+            if self._async_calls.get(key) is task:
+                del self._async_calls[key]
+        if not task.cancelled():
+            task.exception()  # Pas d'avertissement si plus personne n'attendait
+
+    def get_stats(self):
+        with self._lock:
+            leaders, coalesced = self._leaders, self._coalesced
+            in_flight = len(self._calls) + len(self._async_calls)
+        total = leaders + coalesced
+        return {
+            'leaders': leaders,
+            'coalesced': coalesced,
+            'in_flight': in_flight,
+            'coalesced_ratio': round(coalesced / total, 3) if total else 0.0,
+        }
+
+
+def stats():
+    """Compteurs de toutes les clés de coalescence du processus, par nom"""
+    return {flight.name: flight.get_stats() for flight in _flights}
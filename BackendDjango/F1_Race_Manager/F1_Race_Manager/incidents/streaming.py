@@ -0,0 +1,149 @@
+# incidents/streaming.py
+
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+class DriverWindow:
+    """Fenêtre glissante des derniers tours d'un pilote pendant une course"""
+
+    __slots__ = ('pilot_data', 'race_data', 'laps', 'lap_count')
+
+    def __init__(self, pilot_data, race_data, seq_length):
+        self.pilot_data = pilot_data
+        self.race_data = race_data
+        self.laps = deque(maxlen=seq_length)
+        self.lap_count = 0
+
+    def push(self, lap_ms):
+        self.laps.append(float(lap_ms))
+        self.lap_count += 1
+
+    def row(self, circuit_data):
+        """Ligne au format de F1IncidentPredictor.predict_batch"""
+        race_data = dict(self.race_data, laps_completed=self.lap_count)
+        return (self.pilot_data, circuit_data, list(self.laps), race_data)
+
+
+class RaceSession:
+    """
+    État en mémoire d'une course en direct
+
+    Chaque tour ajouté coûte une insertion dans la fenêtre du pilote puis le
+    score d'une fenêtre de taille fixe (seq_length), quel que soit le nombre
+    de tours déjà courus. Les features statiques sont construites une seule
+    fois par pilote.
+    """
+
+    def __init__(self, race_id, circuit_data, seq_length):
+        self.race_id = race_id
+        self.circuit_data = circuit_data
+        self.seq_length = seq_length
+        self.drivers = {}
+        self.latest = {}
+        self.version = 0
+        self.closed = False
+        self.updated_at = time.time()
+        self._condition = threading.Condition()
+
+    def add_laps(self, laps, make_driver):
+        """
+        Ajoute des tours et retourne les lignes à scorer
+
+        Args:
+            laps: liste de (pilot_id, lap_ms)
+            make_driver: pilot_id -> (pilot_data, race_data), appelé au premier tour d'un pilote
+        """
+        rows = []
+        with self._condition:
+            for pilot_id, lap_ms in laps:
+                window = self.drivers.get(pilot_id)
+                if window is None:
+                    pilot_data, race_data = make_driver(pilot_id)
+                    window = self.drivers[pilot_id] = DriverWindow(pilot_data, race_data, self.seq_length)
+                window.push(lap_ms)
+                rows.append(window.row(self.circuit_data))
+        return rows
+
+    def missing_drivers(self, pilot_ids):
+        return [pid for pid in pilot_ids if pid not in self.drivers]
+
+    def publish(self, updates):
+        """Enregistre les derniers risques {pilot_id: payload} et réveille les abonnés"""
+        with self._condition:
+            self.latest.update(updates)
+            self.version += 1
+            self.updated_at = time.time()
+            self._condition.notify_all()
+            return self.version
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'race_id': self.race_id,
+                'version': self.version,
+                'closed': self.closed,
+                'drivers': list(self.latest.values()),
+            }
+
+    def wait_for(self, since, timeout):
+        """Long-poll : attend une version > since (ou la fermeture) au plus timeout secondes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.version > since or self.closed, timeout)
+        return self.snapshot()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class SessionRegistry:
+    """
+    Sessions en direct par course (mémoire du processus)
+
+    Une session sans nouveau tour depuis INCIDENT_LIVE_IDLE_SECONDS est
+    retirée : un worker qui n'a pas vu la fin de la course (signal reçu
+    par un autre processus) ne la garde pas indéfiniment.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, race_id):
+        self._evict_idle()
+        return self._sessions.get(race_id)
+
+    def get_or_create(self, race_id, circuit_data, seq_length):
+        self._evict_idle()
+        with self._lock:
+            session = self._sessions.get(race_id)
+            if session is None:
+                session = self._sessions[race_id] = RaceSession(race_id, circuit_data, seq_length)
+            return session
+
+    def evict(self, race_id):
+        with self._lock:
+            session = self._sessions.pop(race_id, None)
+        if session is not None:
+            session.close()
+        return session is not None
+
+    def race_ids(self):
+        self._evict_idle()
+        return list(self._sessions)
+
+    def _evict_idle(self):
+        deadline = time.time() - getattr(settings, 'INCIDENT_LIVE_IDLE_SECONDS', 1800)
+        with self._lock:
+            idle = [race_id for race_id, session in self._sessions.items() if session.updated_at < deadline]
+            evicted = [self._sessions.pop(race_id) for race_id in idle]
+        for session in evicted:
+            session.close()
+
+
+sessions = SessionRegistry()
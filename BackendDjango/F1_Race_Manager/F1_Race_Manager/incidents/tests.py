@@ -1,3 +1,917 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from django.utils import timezone
+
+from circuits.models import Circuit
+from pilots.models import Pilote
+from races.models import LapTime, PitStop, Race, RaceResult, Season
+
+from . import features, inference_client, loader, prediction_cache, risk_cube, streaming
+from .single_flight import SingleFlight
+from .ml import inference_protocol as protocol
+from .ml.batching import MicroBatcher
+from .ml.predictor import F1IncidentPredictor
+from .ml.training import features as training_features
+from .ml import metrics, shared_weights
+from .ml.registry import REQUIRED_FILES, ModelRegistry, RegistryError
+from .models import IncidentPrediction
+from .scenarios import ScenarioError, parse_sweep
+
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
+
+
+def _race(annee=2023, circuit_ref='monaco', manche=7, **kwargs):
+    """Course (saison et circuit créés au besoin)"""
+    season, _ = Season.objects.get_or_create(annee=annee)
+    circuit, _ = Circuit.objects.get_or_create(
+        ergast_ref=circuit_ref,
+        defaults={'nom': circuit_ref.title(), 'pays': 'Monaco', 'longueur': Decimal('3.337'), 'nombre_tours': 78},
+    )
+    kwargs.setdefault('date', datetime.date(annee, 5, manche))
+    return Race.objects.create(nom=f'Grand Prix {circuit_ref} {annee}', season=season, circuit=circuit,
+                               numero_manche=manche, **kwargs)
+
+
+def _pilot(nom='Max Verstappen', equipe='Red Bull', **kwargs):
+    return Pilote.objects.create(nom=nom, equipe=equipe, nationalite='Néerlandaise', age=25, **kwargs)
+
+
+class StubPredictor:
+    """Prédicteur déterministe : risque croissant avec le nombre de tours"""
+
+    CLASSES = ['collision', 'panne_moteur', 'probleme_pneus', 'safety_car']
+
+    def __init__(self, seq_length=3, version='test'):
+        self.info = {'seq_length': seq_length, 'version': version, 'classes': self.CLASSES}
+
+    def get_info(self):
+        return self.info
+
+    def predict_batch(self, rows):
+        return [self.risks(row) for row in rows]
+
+    @classmethod
+    def risks(cls, row):
+        value = round(min(0.2, 0.01 * row[3].get('laps_completed', len(row[2] or []))), 4)
+        risks = dict.fromkeys(cls.CLASSES, value)
+        risks['risque_total'] = round(3 * value, 4)
+        return risks
+
+
+def _serving(predict_fn=None, seq_length=3):
+    predictor = StubPredictor(seq_length)
+    return loader.Serving(predictor, MicroBatcher(predict_fn or predictor.predict_batch), 'test')
+
+
+def _rows():
+    """Lignes variées : tours complets, trop courts, vides, absents, codes inconnus"""
+    rng = np.random.default_rng(0)
+    return [
+        ({'code': 'VER', 'team_slug': 'red_bull'}, {'slug': 'monaco'},
+         list(rng.uniform(70000, 90000, 25)), {'grid_position': 1, 'year': 2023, 'num_pit_stops': 2}),
+        ({'code': 'HAM', 'team_slug': 'mercedes'}, {'slug': 'silverstone'},
+         list(rng.uniform(85000, 95000, 4)), {'grid_position': 7, 'year': 2021, 'position_change': -3}),
+        ({'code': None, 'team_slug': 'écurie_inconnue'}, {'slug': 'nürburgring'},
+         [], {'grid_position': 20, 'laps_completed': 12}),
+        ({'code': 'ZZZ', 'team_slug': None}, {'slug': 'unknown'},
+         None, {}),
+    ]
+
+
+@unittest.skipUnless(HAS_TENSORFLOW, "TensorFlow non installé")
+class BackendParityTests(SimpleTestCase):
+    """Le backend NumPy reproduit les probabilités de Keras (voir compare_backends)"""
+
+    def test_numpy_matches_keras(self):
+        keras = F1IncidentPredictor(backend='keras', precision='float32', shared=False)
+        numpy_ = F1IncidentPredictor(backend='numpy', precision='float32', shared=False)
+        X_static, X_seq = numpy_._build_inputs(_rows())
+
+        keras_proba = keras._forward(X_static, X_seq)
+        numpy_proba = numpy_._forward(X_static, X_seq)
+        self.assertEqual(keras_proba.shape, numpy_proba.shape)
+        self.assertLess(float(np.abs(keras_proba - numpy_proba).max()), 1e-4)
+
+
+class MicroBatcherTests(SimpleTestCase):
+
+    def test_each_caller_gets_its_slice(self):
+        calls = []
+
+        def predict_fn(rows):
+            calls.append(len(rows))
+            return [row * 10 for row in rows]
+
+        batcher = MicroBatcher(predict_fn, max_wait_ms=20, max_batch_rows=1000)
+        n_callers = 16
+        barrier = threading.Barrier(n_callers)
+        results = {}
+
+        def caller(i):
+            rows = list(range(i * 100, i * 100 + i + 1))  # Tailles différentes par appelant
+            barrier.wait()
+            results[i] = (rows, batcher.submit(rows, timeout=5))
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(n_callers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        batcher.close()
+
+        for i, (rows, result) in results.items():
+            self.assertEqual(result, [row * 10 for row in rows])
+        self.assertEqual(len(results), n_callers)
+        self.assertEqual(sum(calls), sum(i + 1 for i in range(n_callers)))
+        self.assertLess(len(calls), n_callers)
+
+        stats = batcher.get_stats()
+        self.assertEqual(stats['requests'], n_callers)
+        self.assertEqual(stats['batches'], len(calls))
+
+    def test_closed_batcher_predicts_directly(self):
+        batcher = MicroBatcher(lambda rows: [-row for row in rows])
+        batcher.close()
+        self.assertEqual(batcher.submit([1, 2, 3]), [-1, -2, -3])
+        self.assertEqual(batcher.submit([]), [])
+
+
+class ScenarioParsingTests(SimpleTestCase):
+
+    def test_axes_keep_order(self):
+        axes = parse_sweep({
+            'grid_position': {'start': 1, 'stop': 10, 'step': 3},
+            'lap_offset_ms': [-250, 0, 250.12345],
+            'num_pit_stops': 2,
+        })
+        self.assertEqual(axes, [
+            ('grid_position', [1, 4, 7, 10]),
+            ('lap_offset_ms', [-250.0, 0.0, 250.123]),
+            ('num_pit_stops', [2]),
+        ])
+
+    def test_range_step_defaults_to_one(self):
+        self.assertEqual(parse_sweep({'position_change': {'start': -2, 'stop': 2}}),
+                         [('position_change', [-2, -1, 0, 1, 2])])
+
+    def test_invalid_sweeps(self):
+        invalid = [
+            None,
+            {},
+            [('grid_position', [1])],
+            {'weather': [1, 2]},
+            {'grid_position': [True]},
+            {'grid_position': ['3']},
+            {'grid_position': []},
+            {'grid_position': [0]},
+            {'grid_position': [31]},
+            {'grid_position': [2.5]},
+            {'num_pit_stops': {'start': 0, 'stop': 11}},
+            {'position_change': [-31]},
+            {'grid_position': {'start': 5, 'stop': 1}},
+            {'grid_position': {'start': 1, 'stop': 5, 'step': 0}},
+            {'grid_position': {'stop': 5}},
+            {'lap_trend_ms': {'start': 0, 'stop': 1e9, 'step': 1}},
+        ]
+        for sweep in invalid:
+            with self.subTest(sweep=sweep), self.assertRaises(ScenarioError):
+                parse_sweep(sweep)
+
+    @override_settings(INCIDENT_SCENARIO_MAX_POINTS=100)
+    def test_grid_limit(self):
+        self.assertEqual(len(parse_sweep({'grid_position': {'start': 1, 'stop': 10}, 'num_pit_stops': list(range(10))})), 2)
+        with self.assertRaises(ScenarioError):
+            parse_sweep({'grid_position': {'start': 1, 'stop': 11}, 'num_pit_stops': list(range(10))})
+
+
+class PredictionCacheTests(TestCase):
+    """Empreinte des courses et invalidation du cache des prédictions"""
+
+    MODEL_VERSION = 'test'
+
+    def setUp(self):
+        prediction_cache._cache().clear()
+        self.race = _race()
+        self.pilot = _pilot()
+        self.result = RaceResult.objects.create(race=self.race, pilot=self.pilot, position=1)
+
+    def _fingerprint(self):
+        self.race.refresh_from_db()
+        return prediction_cache.race_fingerprint(self.race)
+
+    def _cached(self, fingerprint):
+        return prediction_cache.get_race_prediction(self.race.id, self.MODEL_VERSION, fingerprint)
+
+    def test_fingerprint_is_stable(self):
+        self.assertEqual(self._fingerprint(), self._fingerprint())
+
+    def test_fingerprint_sees_writes_without_signals(self):
+        fingerprint = self._fingerprint()
+        RaceResult.objects.bulk_create([RaceResult(race=self.race, pilot=_pilot(nom='Sergio Perez'), position=2)])
+        self.assertNotEqual(self._fingerprint(), fingerprint)
+
+        fingerprint = self._fingerprint()
+        RaceResult.objects.filter(id=self.result.id).update(position=3, updated_at=timezone.now())
+        self.assertNotEqual(self._fingerprint(), fingerprint)
+
+    def test_fingerprint_is_per_race(self):
+        other = _race(circuit_ref='silverstone', manche=8)
+        fingerprint = self._fingerprint()
+        RaceResult.objects.create(race=other, pilot=self.pilot, position=1)
+        self.assertEqual(self._fingerprint(), fingerprint)
+
+    def test_hit_then_stale(self):
+        fingerprint = self._fingerprint()
+        self.assertEqual(self._cached(fingerprint), (None, False))
+
+        prediction_cache.set_race_prediction(self.race.id, self.MODEL_VERSION, fingerprint, {'race_id': self.race.id})
+        self.assertEqual(self._cached(fingerprint), ({'race_id': self.race.id}, False))
+        self.assertEqual(prediction_cache.get_race_prediction(self.race.id, 'autre', fingerprint), (None, False))
+
+        with override_settings(INCIDENT_CACHE_TTL=-1):
+            prediction_cache.set_race_prediction(self.race.id, self.MODEL_VERSION, fingerprint, {'race_id': 0})
+        self.assertEqual(self._cached(fingerprint), ({'race_id': 0}, True))
+
+    def test_race_result_saved(self):
+        fingerprint = self._fingerprint()
+        prediction_cache.set_race_prediction(self.race.id, self.MODEL_VERSION, fingerprint, {'race_id': self.race.id})
+        prediction_cache.set_scenario(self.race.id, self.MODEL_VERSION, fingerprint, self.pilot.id, [], {'points': 1})
+
+        self.result.position = 2
+        self.result.save()
+
+        self.assertIsNone(self._cached(fingerprint)[0])
+        self.assertIsNone(prediction_cache.get_scenario(self.race.id, self.MODEL_VERSION, fingerprint, self.pilot.id, []))
+        self.assertNotEqual(self._fingerprint(), fingerprint)
+
+    def test_race_saved(self):
+        fingerprint = self._fingerprint()
+        prediction_cache.set_race_prediction(self.race.id, self.MODEL_VERSION, fingerprint, {'race_id': self.race.id})
+        self.race.meteo = 'pluvieux'
+        self.race.save()
+        self.assertIsNone(self._cached(fingerprint)[0])
+
+
+class LapInvalidationTests(TestCase):
+    """Un tour ou un arrêt enregistré rend obsolètes cache et prédictions stockées"""
+
+    MODEL_VERSION = 'test'
+
+    def setUp(self):
+        prediction_cache._cache().clear()
+        self.race = _race()
+        self.pilot = _pilot()
+        RaceResult.objects.create(race=self.race, pilot=self.pilot, position=1)
+        self.lap = LapTime.objects.create(race=self.race, pilot=self.pilot, lap=1, milliseconds=78000)
+        self.stop = PitStop.objects.create(race=self.race, pilot=self.pilot, stop=1, lap=1, duration_ms=2300)
+
+    def _store(self):
+        """Prédiction en cache et en base pour l'état actuel de la course : son empreinte"""
+        self.race.refresh_from_db()
+        fingerprint = prediction_cache.race_fingerprint(self.race)
+        prediction_cache.set_race_prediction(self.race.id, self.MODEL_VERSION, fingerprint, {'race_id': self.race.id})
+        IncidentPrediction.objects.create(
+            race=self.race, pilot=self.pilot, model_version=self.MODEL_VERSION, fingerprint=fingerprint,
+            risque_total=0.1, risk_level='LOW',
+        )
+        return fingerprint
+
+    def _assert_invalidated(self, old_fingerprint):
+        self.race.refresh_from_db()
+        fingerprint = prediction_cache.race_fingerprint(self.race)
+        self.assertNotEqual(fingerprint, old_fingerprint)
+        self.assertFalse(IncidentPrediction.objects.filter(
+            race=self.race, model_version=self.MODEL_VERSION, fingerprint=fingerprint,
+        ).exists())
+        for key in (old_fingerprint, fingerprint):
+            self.assertIsNone(prediction_cache.get_race_prediction(self.race.id, self.MODEL_VERSION, key)[0])
+
+    def test_lap_time_added(self):
+        fingerprint = self._store()
+        LapTime.objects.create(race=self.race, pilot=self.pilot, lap=2, milliseconds=77500)
+        self._assert_invalidated(fingerprint)
+
+    def test_lap_time_edited_in_place(self):
+        fingerprint = self._store()
+        self.lap.milliseconds = 79000
+        self.lap.save()
+        self._assert_invalidated(fingerprint)
+
+    def test_pit_stop_edited_in_place(self):
+        fingerprint = self._store()
+        self.stop.duration_ms = 5000
+        self.stop.save()
+        self._assert_invalidated(fingerprint)
+
+
+class RaceLapWindowsTests(TestCase):
+
+    def test_last_laps_in_order_with_total(self):
+        race = _race()
+        ver, per = _pilot(), _pilot(nom='Sergio Perez')
+        LapTime.objects.bulk_create(
+            [LapTime(race=race, pilot=ver, lap=lap, milliseconds=80000 + lap) for lap in range(12, 0, -1)]
+            + [LapTime(race=race, pilot=per, lap=lap, milliseconds=90000 + lap) for lap in (1, 2)]
+        )
+        PitStop.objects.bulk_create([
+            PitStop(race=race, pilot=ver, stop=1, lap=4), PitStop(race=race, pilot=ver, stop=2, lap=9),
+        ])
+
+        self.assertEqual(features.race_lap_windows(race.id, 3), {
+            ver.id: ([80010, 80011, 80012], 12),
+            per.id: ([90001, 90002], 2),
+        })
+        self.assertEqual(features.race_pit_counts(race.id), {ver.id: 2})
+        self.assertEqual(features.race_lap_windows(_race(circuit_ref='spa', manche=8).id, 3), {})
+
+
+class InferenceProtocolTests(SimpleTestCase):
+
+    def test_rows_round_trip(self):
+        rows = _rows()
+        decoded = protocol.decode_rows(protocol.encode_rows(rows, seq_length=10))
+
+        self.assertEqual(len(decoded), len(rows))
+        self.assertEqual([r[0]['code'] for r in decoded], ['VER', 'HAM', 'unknown', 'ZZZ'])
+        self.assertEqual(decoded[2][0]['team_slug'], 'écurie_inconnue')
+        self.assertEqual(decoded[2][1]['slug'], 'nürburgring')
+        self.assertEqual(decoded[3][0]['team_slug'], 'unknown')
+
+        # Seuls les seq_length derniers tours voyagent, laps_completed garde le total
+        np.testing.assert_array_equal(decoded[0][2], np.asarray(rows[0][2][-10:], dtype=np.float32))
+        self.assertEqual(decoded[0][3]['laps_completed'], 25.0)
+        self.assertEqual(len(decoded[1][2]), 4)
+        self.assertEqual(len(decoded[2][2]), 0)
+        self.assertEqual(decoded[2][3]['laps_completed'], 12.0)
+        self.assertEqual(len(decoded[3][2]), 0)
+
+        # Valeurs par défaut de _build_inputs pour les champs absents
+        self.assertEqual(decoded[3][3], {
+            'grid_position': 10.0, 'year': 2024.0, 'laps_completed': 0.0, 'num_pit_stops': 0.0, 'position_change': 0.0,
+        })
+        self.assertEqual(decoded[1][3]['position_change'], -3.0)
+
+    def test_round_trip_keeps_model_inputs(self):
+        predictor = F1IncidentPredictor(backend='numpy', precision='float32', shared=False)
+        rows = _rows()
+        seq_length = predictor.get_info()['seq_length']
+        decoded = protocol.decode_rows(protocol.encode_rows(rows, seq_length))
+
+        for before, after in zip(predictor._build_inputs(rows), predictor._build_inputs(decoded)):
+            np.testing.assert_array_equal(before, after)
+
+    def test_empty_batch(self):
+        self.assertEqual(protocol.decode_rows(protocol.encode_rows([], seq_length=10)), [])
+
+    def test_truncated_body(self):
+        body = protocol.encode_rows(_rows(), seq_length=10)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_rows(body[:-4])
+
+    def test_proba_round_trip(self):
+        proba = np.random.default_rng(1).random((5, 4), dtype=np.float32)
+        np.testing.assert_array_equal(protocol.decode_proba(protocol.encode_proba(proba)), proba)
+
+        empty = protocol.decode_proba(protocol.encode_proba(np.empty((0, 4), dtype=np.float32)))
+        self.assertEqual(empty.shape, (0, 4))
+
+
+class RemoteBatcherTests(SimpleTestCase):
+    """Repli sur le modèle local quand le serveur d'inférence échoue"""
+
+    INFO = {'model_info': {'seq_length': 10, 'classes': ['collision', 'safety_car'], 'version': 'v1'}}
+
+    class FailingClient:
+        def __init__(self, error):
+            self.error = error
+
+        def predict(self, rows, seq_length):
+            raise self.error
+
+    def _submit(self, error):
+        local = loader.Serving(None, MicroBatcher(lambda rows: ['local'] * len(rows)), 'v1')
+        predictor = inference_client.RemotePredictor(self.FailingClient(error), self.INFO)
+        with mock.patch.object(loader, 'get_local_serving', return_value=local), \
+                mock.patch.object(inference_client, '_mark_unavailable'), \
+                mock.patch.dict(inference_client._warned, clear=True):
+            return inference_client.RemoteBatcher(predictor).submit(_rows()[:2])
+
+    def test_falls_back_on_unavailable_and_server_errors(self):
+        for error in (inference_client.Unavailable('socket'), inference_client.ServerError('boom')):
+            with self.subTest(error=error), self.assertLogs('incidents.inference_client', 'WARNING'):
+                self.assertEqual(self._submit(error), ['local', 'local'])
+
+    @override_settings(INCIDENT_INFERENCE_LOG_INTERVAL=60)
+    def test_warnings_are_rate_limited(self):
+        with mock.patch.dict(inference_client._warned, clear=True), \
+                mock.patch.object(inference_client.logger, 'warning') as warning:
+            for _ in range(5):
+                inference_client._warn('test', 'échec %s', 1)
+            self.assertEqual(warning.call_count, 1)
+
+            inference_client._warned['test'] = (0.0, 4)  # Fenêtre écoulée
+            inference_client._warn('test', 'échec %s', 2)
+        self.assertEqual(warning.call_count, 2)
+        self.assertEqual(warning.call_args.args, ('échec %s (%d messages similaires retenus)', 2, 4))
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.bundled = self._weights('bundled', '1.0')
+        self.registry = ModelRegistry(os.path.join(self.root, 'registry'), self.bundled)
+
+    def _weights(self, name, version):
+        path = os.path.join(self.root, name)
+        os.makedirs(path)
+        for filename in REQUIRED_FILES:
+            with open(os.path.join(path, filename), 'w') as f:
+                f.write(json.dumps({'model_version': version, 'test_accuracy': 0.9}) if filename == 'metadata.json' else '')
+        return path
+
+    def test_register_promote_rollback(self):
+        self.assertEqual(self.registry.resolve(), self.bundled)
+        self.assertEqual(self.registry.register(self._weights('v2', '2.0')), '2.0')
+        self.assertEqual(self.registry.register(self._weights('v3', '2.0'), version='3.0'), '3.0')
+        self.assertEqual(ModelRegistry.read_metadata(self.registry.resolve('3.0'))['model_version'], '3.0')
+
+        token = self.registry.pointer_token()
+        self.registry.promote('2.0')
+        self.registry.promote('3.0')
+        self.assertNotEqual(self.registry.pointer_token(), token)
+        self.assertEqual(self.registry.active_version(), '3.0')
+        self.assertEqual(
+            [(v['version'], v['active'], v['source']) for v in self.registry.versions()],
+            [('2.0', False, 'registry'), ('3.0', True, 'registry'), ('1.0', False, 'bundled')],
+        )
+
+        self.assertEqual(self.registry.rollback(), '2.0')
+        self.assertEqual(self.registry.rollback(), None)
+        self.assertEqual(self.registry.resolve(), self.bundled)
+        with self.assertRaises(RegistryError):
+            self.registry.rollback()
+
+    def test_rollback_to_bundled_without_active_pointer(self):
+        self.registry.register(self._weights('v2', '2.0'))
+        self.registry.promote('2.0')
+        os.remove(os.path.join(self.registry.path, 'ACTIVE'))
+        self.assertIsNone(self.registry.rollback())
+        self.assertEqual(self.registry.resolve(), self.bundled)
+
+    def test_register_rejects_incomplete_or_duplicate(self):
+        incomplete = self._weights('incomplete', '2.0')
+        os.remove(os.path.join(incomplete, 'encoders.pkl'))
+        with self.assertRaises(RegistryError):
+            self.registry.register(incomplete)
+
+        self.registry.register(self._weights('v2', '2.0'))
+        with self.assertRaises(RegistryError):
+            self.registry.register(self._weights('again', '2.0'))
+
+    def test_version_names_stay_inside_the_registry(self):
+        outside = self._weights('outside', '9.9')
+        for name in ('..', '../..', '../outside', '.hidden', 'a/b', '', None, 3):
+            with self.subTest(name=name), self.assertRaises(RegistryError):
+                self.registry.promote(name)
+        for name in ('..', '../outside', '.hidden', 'a/b'):
+            with self.subTest(name=name), self.assertRaises(RegistryError):
+                self.registry.resolve(name)
+            with self.subTest(name=name), self.assertRaises(RegistryError):
+                self.registry.register(outside, version=name)
+        self.assertIsNone(self.registry.active_version())
+        with self.assertRaises(RegistryError):
+            self.registry.resolve('inconnue')
+
+
+class LiveSessionTests(TestCase):
+
+    def setUp(self):
+        self.race = _race(statut='en_cours')
+        self.ver, self.per = _pilot(), _pilot(nom='Sergio Perez')
+        RaceResult.objects.create(race=self.race, pilot=self.ver, position=1, grid_position=3)
+        self.url = f'/api/incidents/live/race/{self.race.id}/laps/'
+        self.client = APIClient()
+        self.addCleanup(streaming.sessions.evict, self.race.id)
+        patcher = mock.patch.object(loader, 'get_serving', return_value=_serving())
+        self.serving = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _push(self, body):
+        return self.client.post(self.url, body, format='json')
+
+    def test_laps_update_driver_windows(self):
+        response = self._push({'pilot_id': self.ver.id, 'lap_time_ms': 80000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual([(u['pilot_id'], u['lap'], u['source']) for u in response.data['updates']],
+                         [(self.ver.id, 1, 'live')])
+
+        laps = [{'pilot_id': self.ver.id, 'lap_time_ms': 80000 + i} for i in range(1, 5)]
+        response = self._push([{'pilot_id': self.per.id, 'lap_time_ms': 81000}] + laps)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({u['pilot_id']: u['lap'] for u in response.data['updates']}, {self.ver.id: 5, self.per.id: 1})
+
+        session = streaming.sessions.get(self.race.id)
+        self.assertEqual(list(session.drivers[self.ver.id].laps), [80002.0, 80003.0, 80004.0])
+        self.assertEqual(session.drivers[self.ver.id].race_data['year'], 2023)
+        # Position de départ (features.grid_position), pas d'arrivée ; 10 sans résultat
+        self.assertEqual(session.drivers[self.ver.id].race_data['grid_position'], 3)
+        self.assertEqual(session.drivers[self.per.id].race_data['grid_position'], 10)
+        self.assertEqual(session.snapshot()['version'], 2)
+
+    def test_invalid_pushes(self):
+        for body in ({}, {'laps': []}, {'laps': 5}, {'pilot_id': 'x', 'lap_time_ms': 1}, [{'pilot_id': 1}], 'tour'):
+            with self.subTest(body=body):
+                self.assertEqual(self._push(body).status_code, 400)
+        self.assertEqual(self._push({'pilot_id': 999999, 'lap_time_ms': 80000}).status_code, 400)
+        self.assertEqual(
+            self.client.post('/api/incidents/live/race/999999/laps/', {'pilot_id': self.ver.id, 'lap_time_ms': 1},
+                             format='json').status_code,
+            404,
+        )
+
+    def test_finished_race_is_rejected_and_evicted(self):
+        self.assertEqual(self._push({'pilot_id': self.ver.id, 'lap_time_ms': 80000}).status_code, 200)
+        session = streaming.sessions.get(self.race.id)
+
+        # Fin de course enregistrée sans signal dans ce processus (autre worker)
+        Race.objects.filter(id=self.race.id).update(statut='termine')
+        self.assertEqual(self._push({'pilot_id': self.ver.id, 'lap_time_ms': 80000}).status_code, 409)
+        self.assertIsNone(streaming.sessions.get(self.race.id))
+        self.assertTrue(session.closed)
+
+    def test_predictor_failure_falls_back(self):
+        def fail(rows):
+            raise RuntimeError('modèle en échec')
+
+        self.serving.return_value = _serving(fail)
+        response = self._push({'pilot_id': self.ver.id, 'lap_time_ms': 80000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updates'][0]['source'], 'fallback')
+        self.assertIn('risque_total', response.data['updates'][0]['risks'])
+
+    def test_poll(self):
+        self.assertEqual(self.client.get(f'/api/incidents/live/race/{self.race.id}/poll/').status_code, 404)
+        self._push({'pilot_id': self.ver.id, 'lap_time_ms': 80000})
+        response = self.client.get(f'/api/incidents/live/race/{self.race.id}/poll/', {'since': 0, 'timeout': 0})
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual(len(response.data['drivers']), 1)
+
+
+class SessionRegistryTests(SimpleTestCase):
+
+    @override_settings(INCIDENT_LIVE_IDLE_SECONDS=60)
+    def test_idle_sessions_are_evicted(self):
+        registry = streaming.SessionRegistry()
+        idle = registry.get_or_create(1, {'slug': 'monaco'}, 3)
+        active = registry.get_or_create(2, {'slug': 'spa'}, 3)
+        idle.updated_at = time.time() - 61
+        active.publish({})
+
+        self.assertIsNone(registry.get(1))
+        self.assertTrue(idle.closed)
+        self.assertIs(registry.get(2), active)
+        self.assertEqual(registry.race_ids(), [2])
+        self.assertIsNot(registry.get_or_create(1, {'slug': 'monaco'}, 3), idle)
+
+
+class RowBuildersTests(TestCase):
+    """Une même (course, pilote) donne la même ligne dans tous les constructeurs"""
+
+    def test_grid_position_is_shared(self):
+        race = Race.objects.select_related('season', 'circuit').get(id=_race().id)
+        pilots = [_pilot(nom=nom) for nom in ('Max Verstappen', 'Sergio Perez', 'Lando Norris')]
+        for pilot, (position, grid) in zip(pilots, [(1, 4), (2, None), (3, 0)]):
+            RaceResult.objects.create(race=race, pilot=pilot, position=position, grid_position=grid)
+
+        results = list(race.results.select_related('pilot').order_by('position'))
+        self.assertEqual([features.grid_position(r) for r in results], [4, 2, 3])
+
+        by_race = [row[3]['grid_position'] for row in features.race_rows(race, results, 3)]
+        by_pair = features.pair_rows([(race.id, pilot.id) for pilot in pilots], 3)
+        by_pilot = [
+            features.pilot_rows(pilot, features.pilot_results(pilot.id, race_id=race.id), 3)[0][3]['grid_position']
+            for pilot in pilots
+        ]
+        self.assertEqual(by_race, [4, 2, 3])
+        self.assertEqual([by_pair[(race.id, pilot.id)][3]['grid_position'] for pilot in pilots], by_race)
+        self.assertEqual(by_pilot, by_race)
+
+
+@override_settings(INCIDENT_BULK_CHUNK_ROWS=2)
+class BulkPredictionTests(TestCase):
+
+    url = '/api/incidents/predict/bulk/'
+
+    def setUp(self):
+        self.race = _race()
+        self.ver, self.per = _pilot(), _pilot(nom='Sergio Perez')
+        RaceResult.objects.create(race=self.race, pilot=self.ver, position=1, grid_position=2)
+        self.client = APIClient()
+        patcher = mock.patch.object(loader, 'get_serving', return_value=_serving())
+        self.serving = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, items):
+        response = self.client.post(self.url, {'items': items}, format='json')
+        if response.status_code != 200:
+            return response, None
+        return response, [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def _free(self, name, **race):
+        return {'id': name, 'pilot': {'code': 'HAM', 'team_slug': 'mercedes'}, 'circuit': {'slug': 'monaco'},
+                'lap_times': [80000, 80100], 'race': race}
+
+    def test_items_in_order_then_summary(self):
+        response, lines = self._post([
+            {'race_id': self.race.id, 'pilot_id': self.ver.id},
+            {'race_id': self.race.id, 'pilot_id': self.per.id},
+            self._free('libre', grid_position=5, year=2021),
+        ])
+        self.assertEqual(response['X-Model-Version'], 'test')
+        self.assertEqual([line.get('index') for line in lines], [0, 1, 2, None])
+        self.assertEqual(lines[0]['risks'], StubPredictor.risks((None, None, [], {'laps_completed': 0})))
+        self.assertIn('error', lines[1])
+        self.assertEqual(lines[2]['id'], 'libre')
+        self.assertEqual(lines[2]['risks'], StubPredictor.risks((None, None, [80000, 80100], {})))
+        self.assertEqual({k: lines[3]['summary'][k] for k in ('items', 'scored', 'missing', 'failed')},
+                         {'items': 3, 'scored': 2, 'missing': 1, 'failed': 0})
+
+    def test_failed_chunk_does_not_stop_the_stream(self):
+        def predict(rows):
+            if any(row[3].get('year') == 1950 for row in rows):
+                raise RuntimeError('lot en échec')
+            return StubPredictor().predict_batch(rows)
+
+        self.serving.return_value = _serving(predict)
+        _, lines = self._post([
+            self._free('a', year=1950), self._free('b'),
+            self._free('c'), {'race_id': self.race.id, 'pilot_id': self.ver.id},
+            self._free('e'),
+        ])
+        self.assertEqual([line.get('index') for line in lines], [0, 1, 2, 3, 4, None])
+        self.assertEqual([('error' in line, 'risks' in line) for line in lines[:5]],
+                         [(True, False), (True, False), (False, True), (False, True), (False, True)])
+        self.assertIn('lot en échec', lines[1]['error'])
+        self.assertEqual({k: lines[5]['summary'][k] for k in ('items', 'scored', 'missing', 'failed')},
+                         {'items': 5, 'scored': 3, 'missing': 0, 'failed': 2})
+
+    def test_invalid_items_are_rejected_up_front(self):
+        invalid = [
+            'item',
+            {'race_id': self.race.id},
+            {'race_id': 'x', 'pilot_id': 1},
+            {'pilot': 'HAM'},
+            {'lap_times': 'rapide'},
+            {'lap_times': [80000, True]},
+            {'lap_times': [80000, float('nan')]},
+            {'pilot': {'code': ['HAM']}},
+            {'circuit': {'slug': 3}},
+            {'race': {'grid_position': '3'}},
+            {'race': {'year': None}},
+        ]
+        for item in invalid:
+            with self.subTest(item=item):
+                response = self.client.post(self.url, json.dumps({'items': [item]}), content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._post([])[0].status_code, 400)
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight('test')
+        calls = []
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'résultat'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', compute)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('k', compute))) for _ in range(3)]
+        for t in followers:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in [leader, *followers]:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('résultat', False)] + [('résultat', True)] * 3)
+        self.assertEqual(flight.get_stats()['in_flight'], 0)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight('test')
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'résultat'
+
+        async def scenario():
+            leader = asyncio.ensure_future(flight.ado('k', compute))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.ado('k', compute))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(scenario()), ('résultat', True))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.get_stats()['in_flight'], 0)
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight('test')
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError('échec')
+
+        async def scenario():
+            return await asyncio.gather(flight.ado('k', compute), flight.ado('k', compute), return_exceptions=True)
+
+        errors = asyncio.run(scenario())
+        self.assertEqual([type(e) for e in errors], [ValueError, ValueError])
+        self.assertEqual(flight.get_stats(), {'leaders': 1, 'coalesced': 1, 'in_flight': 0, 'coalesced_ratio': 0.5})
+
+
+class RacePredictionViewTests(TestCase):
+
+    def setUp(self):
+        prediction_cache._cache().clear()
+        self.race = _race()
+        self.pilots = [_pilot(nom=nom) for nom in ('Max Verstappen', 'Sergio Perez')]
+        self.client = APIClient()
+        patcher = mock.patch.object(loader, 'get_serving', return_value=_serving())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, race_id):
+        return self.client.get(f'/api/incidents/predict/race/{race_id}/')
+
+    def test_missing_race(self):
+        self.assertEqual(self._get(999999).status_code, 404)
+
+    async def test_missing_race_async(self):
+        response = await AsyncClient().get('/api/incidents/async/predict/race/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_race_without_results(self):
+        response = self._get(self.race.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({p['pilot_id'] for p in response.data['predictions']}, {p.id for p in self.pilots})
+        self.assertEqual(response.data['predictions'][0]['team_name'], 'Red Bull')
+
+    def test_results_are_scored_then_cached(self):
+        for position, pilot in enumerate(self.pilots, start=1):
+            RaceResult.objects.create(race=self.race, pilot=pilot, position=position)
+
+        response = self._get(self.race.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['model_info'], {'mode': 'AI', 'version': 'test'})
+        self.assertEqual([p['pilot_name'] for p in response.data['predictions']], ['Max Verstappen', 'Sergio Perez'])
+
+        with mock.patch('incidents.views.race_rows') as race_rows:
+            self.assertEqual(self._get(self.race.id).data, response.data)
+        race_rows.assert_not_called()
+
+
+class RiskCubeTests(TestCase):
+
+    def setUp(self):
+        # Transfert entre 2021 et 2022 ; un résultat saisi sans constructorRef
+        self.races = [_race(2021), _race(2022), _race(2022, circuit_ref='spa', manche=8)]
+        self.ham, self.ver = _pilot(nom='Lewis Hamilton', equipe='Ferrari'), _pilot()
+        entries = [
+            (self.races[0], self.ham, 'mercedes', 0.2, 'MODERATE'),
+            (self.races[0], self.ver, 'red_bull', 0.4, 'CRITICAL'),
+            (self.races[1], self.ham, 'ferrari', 0.3, 'HIGH'),
+            (self.races[1], self.ver, 'red_bull', 0.1, 'LOW'),
+            (self.races[2], self.ham, '', 0.5, 'CRITICAL'),
+        ]
+        for race, pilot, ref, risk, level in entries:
+            RaceResult.objects.create(race=race, pilot=pilot, position=1, constructor_ref=ref)
+            IncidentPrediction.objects.create(
+                race=race, pilot=pilot, model_version='test', fingerprint='f',
+                collision=risk / 2, risque_total=risk, risk_level=level,
+            )
+        risk_cube.refresh_races([race.id for race in self.races])
+
+    def _by_constructor(self, **filters):
+        rows = risk_cube.query('test', ['constructor'], filters, sort='n_predictions', limit=100)
+        return {row['constructor']: (row['n_predictions'], row['mean']['risque_total']) for row in rows}
+
+    def test_constructor_at_race_time(self):
+        self.assertEqual(self._by_constructor(), {
+            'mercedes': (1, 0.2), 'ferrari': (1, 0.3), 'red_bull': (2, 0.25), risk_cube.UNKNOWN_CONSTRUCTOR: (1, 0.5),
+        })
+        self.assertEqual(self._by_constructor(season=2021), {'mercedes': (1, 0.2), 'red_bull': (1, 0.4)})
+
+        # L'écurie actuelle du pilote ne change pas l'historique
+        Pilote.objects.filter(id=self.ham.id).update(equipe='Williams', equipe_ref='williams')
+        risk_cube.rebuild()
+        self.assertEqual(self._by_constructor(season=2021), {'mercedes': (1, 0.2), 'red_bull': (1, 0.4)})
+
+    def test_view_groups_and_drills_down(self):
+        response = APIClient().get('/api/incidents/risk-cube/', {
+            'group_by': 'season,constructor', 'season': 2022, 'sort': 'max_risque_total', 'model_version': 'test',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['season'], row['constructor'], row['critical_count']) for row in response.data['results']],
+            [(2022, risk_cube.UNKNOWN_CONSTRUCTOR, 1), (2022, 'ferrari', 0), (2022, 'red_bull', 0)],
+        )
+        self.assertEqual(APIClient().get('/api/incidents/risk-cube/', {'group_by': 'pilote'}).status_code, 400)
+
+
+class TrainingFeaturesTests(SimpleTestCase):
+    """Le jeu d'entraînement construit grid_position et position_change comme le service"""
+
+    CSV = {
+        'results.csv': 'resultId,raceId,driverId,constructorId,grid,position,laps,statusId\n'
+                       '1,1,1,1,3,1,78,1\n2,1,2,1,0,5,78,1\n3,1,3,1,0,\\N,12,2\n4,1,4,1,\\N,\\N,3,2\n',
+        'races.csv': 'raceId,year,circuitId\n1,2023,1\n',
+        'drivers.csv': 'driverId,driverRef\n1,max_verstappen\n2,hamilton\n3,leclerc\n4,norris\n',
+        'circuits.csv': 'circuitId,circuitRef\n1,monaco\n',
+        'constructors.csv': 'constructorId,constructorRef\n1,red_bull\n',
+        'status.csv': 'statusId,status\n1,Finished\n2,Engine\n',
+        'lap_times.csv': 'raceId,driverId,lap,time,milliseconds\n'
+                         + ''.join(f'1,{driver},1,1:18.000,78000\n' for driver in range(1, 5)),
+        'pit_stops.csv': 'raceId,driverId\n',
+    }
+
+    def test_static_features_match_serving(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            for name, text in self.CSV.items():
+                with open(os.path.join(data_dir, name), 'w') as f:
+                    f.write(text)
+            dataset = training_features.build_dataset(data_dir, seq_length=3, log=lambda *args: None)
+
+        columns = training_features.FEATURE_COLUMNS
+        X_static = dataset['X_static']
+        results = [
+            RaceResult(grid_position=3, position=1), RaceResult(grid_position=0, position=5),
+            RaceResult(grid_position=0, position=None), RaceResult(grid_position=None, position=None),
+        ]
+        self.assertEqual(list(X_static[:, columns.index('grid_position')]), [features.grid_position(r) for r in results])
+        self.assertEqual(list(X_static[:, columns.index('position_change')]), [0.0] * 4)
+
+
+class SharedWeightsTests(SimpleTestCase):
+    """Le fichier mmap est écrit dans le dossier partagé, jamais dans le dossier des poids"""
+
+    def test_export_outside_weights_dir(self):
+        weights_dir = loader.get_registry().bundled_dir
+        before = sorted(os.listdir(weights_dir))
+        with tempfile.TemporaryDirectory() as shared_dir:
+            path = shared_weights.ensure_shared(weights_dir, 'float16', shared_dir)
+            self.assertEqual(os.path.dirname(path), shared_dir)
+            self.assertTrue(shared_weights.is_current(weights_dir, 'float16', shared_dir))
+            self.assertEqual(shared_weights.SharedWeights(path).precision, 'float16')
+            self.assertEqual(os.path.getmtime(shared_weights.ensure_shared(weights_dir, 'float16', shared_dir)),
+                             os.path.getmtime(path))
+
+            # Un fichier par dossier source : deux versions ne se partagent pas le même nom
+            self.assertNotEqual(path, shared_weights.shared_path(os.path.join(shared_dir, 'v2'), 'float16', shared_dir))
+        self.assertEqual(sorted(os.listdir(weights_dir)), before)
+
+
+class PrometheusRenderTests(SimpleTestCase):
+
+    @mock.patch.dict(metrics._series, clear=True)
+    def test_label_values_are_escaped(self):
+        metrics.histogram(metrics.REQUEST_SECONDS, endpoint='race', source='a"b').observe(0.01)
+        text = metrics.render_prometheus([
+            ('f1_model_info', 'gauge', 'Version\nservie', [({'version': 'C:\\v1\n"x"'}, 1)]),
+        ])
+
+        self.assertIn('f1_request_seconds_count{endpoint="race",source="a\\"b"} 1', text)
+        self.assertIn('# HELP f1_model_info Version\\nservie', text)
+        self.assertIn('f1_model_info{version="C:\\\\v1\\n\\"x\\""} 1', text)
+        # Une ligne par échantillon : aucune valeur ne coupe l'exposition
+        self.assertTrue(all(line.startswith(('#', 'f1_')) for line in text.splitlines()))
@@ -1,8 +1,22 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('predict/race/<int:race_id>/', views.predict_race_incidents, name='predict_race'),
     path('predict/pilot/<int:pilot_id>/', views.predict_pilot_risk, name='predict_pilot'),
+    path('predict/scenarios/', views.predict_scenarios, name='predict_scenarios'),
+    path('predict/bulk/', views.predict_bulk, name='predict_bulk'),
     path('health/', views.health_check, name='health_check'),
+    path('metrics/', views.prometheus_metrics, name='metrics'),
+    path('risk-cube/', views.risk_cube_view, name='risk_cube'),
+    path('live/race/<int:race_id>/laps/', views.push_live_laps, name='live_push_laps'),
+    path('live/race/<int:race_id>/stream/', views.stream_live_race, name='live_stream'),
+    path('live/race/<int:race_id>/poll/', views.poll_live_race, name='live_poll'),
+    path('models/', views.list_models, name='list_models'),
+    path('models/promote/', views.promote_model, name='promote_model'),
+    path('models/rollback/', views.rollback_model, name='rollback_model'),
+    # Variantes asynchrones (servies par asgi.py)
+    path('async/predict/race/<int:race_id>/', async_views.predict_race_incidents, name='predict_race_async'),
+    path('async/predict/pilot/<int:pilot_id>/', async_views.predict_pilot_risk, name='predict_pilot_async'),
+    path('async/health/', async_views.health_check, name='health_check_async'),
 ]
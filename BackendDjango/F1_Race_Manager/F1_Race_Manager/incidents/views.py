@@ -1,25 +1,34 @@
 # incidents/views.py
 
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+import asyncio
+import json
+import math
 import random
+import time
 
 # ✅ Importer TES modèles Django
-from races.models import Race  # Adapter selon ton nom de modèle
+from races.models import Race, RaceResult  # Adapter selon ton nom de modèle
 from pilots.models import Pilote # Adapter selon ton nom de modèle
 
-try:
-    from .ml.predictor import F1IncidentPredictor
-    predictor = F1IncidentPredictor()
-    PREDICTOR_AVAILABLE = True
-    print("✅ Prédicteur IA activé")
-except Exception as e:
-    predictor = None
-    PREDICTOR_AVAILABLE = False
-    print(f"⚠️ Prédicteur non disponible (mode test): {e}")
+from . import inference_client, inference_executor, loader, prediction_cache, risk_cube, scenarios, single_flight, streaming
+from .features import circuit_features, grid_position, pair_rows, pilot_features, pilot_results, pilot_rows, race_rows
+from .ml import metrics
+from .ml.inference_protocol import RACE_FIELDS
+from .ml.registry import RegistryError
+from .models import IncidentPrediction
+
+# Le prédicteur est chargé au premier usage (voir loader.get_predictor)
+
+# Coalescence des requêtes identiques simultanées (une par endpoint coûteux)
+race_flight = single_flight.SingleFlight('predict_race')
+pilot_flight = single_flight.SingleFlight('predict_pilot')
 
 
 @api_view(['GET'])
@@ -27,97 +36,18 @@ except Exception as e:
 def predict_race_incidents(request, race_id):
     """
     Prédit les incidents en utilisant LES VRAIES DONNÉES de ta base
+    
+    Les requêtes simultanées sur une même course partagent un seul calcul.
     """
+    start = time.perf_counter()
+    source = 'error'
     try:
-        # ✅ Récupérer LA VRAIE COURSE depuis ta base de données
-        race = get_object_or_404(Race, id=race_id)
-        
-        # ✅ Récupérer LES VRAIS RÉSULTATS de la course
-        # Adapter selon ta structure : race.results, race.entries, race.participants, etc.
-        results = race.results.all() if hasattr(race, 'results') else []
-        
-        predictions = []
-        
-        # Si tu n'as pas encore de résultats pour cette course
-        if not results or len(results) == 0:
-            # Fallback : utiliser tous les pilotes actifs
-            all_pilotes = Pilote.objects.filter(active=True)[:20]  # Adapter selon ton modèle
-            
-            for i, pilote in enumerate(all_pilotes):
-                risks = _generate_smart_risks(i + 1)  # Basé sur position
-                risk_level, recommendation = _analyze_risk(risks['risque_total'])
-                
-                predictions.append({
-                    'pilot_id': pilote.id,
-                    'pilot_name': f"{pilote.first_name} {pilote.last_name}",  # Adapter
-                    'pilot_code': pilote.code or pilote.abbreviation,  # Adapter
-                    'team_name': pilote.team.name if hasattr(pilote, 'team') else 'Unknown',
-                    'risks': risks,
-                    'risk_level': risk_level,
-                    'recommendation': recommendation
-                })
-        else:
-            # Utiliser les vrais résultats
-            for i, result in enumerate(results):
-                driver = result.driver  # Adapter selon ta structure
-                
-                # Données réelles pour l'IA
-                pilot_data = {
-                    'code': driver.code if hasattr(driver, 'code') else 'UNK',
-                    'team_slug': driver.team.slug if hasattr(driver, 'team') else 'unknown'
-                }
-                
-                circuit_data = {
-                    'slug': race.circuit.slug if hasattr(race, 'circuit') else 'unknown'
-                }
-                
-                # Temps au tour (simulés si pas disponibles)
-                lap_times = [90000 + random.randint(-2000, 2000) for _ in range(10)]
-                
-                race_data = {
-                    'grid_position': result.grid_position if hasattr(result, 'grid_position') else i + 1,
-                    'year': race.season.year if hasattr(race, 'season') else 2024,
-                    'num_pit_stops': result.pit_stops.count() if hasattr(result, 'pit_stops') else random.randint(1, 3),
-                    'position_change': 0
-                }
-                
-                # Prédiction IA ou fallback
-                if PREDICTOR_AVAILABLE:
-                    try:
-                        risks = predictor.predict(pilot_data, circuit_data, lap_times, race_data)
-                    except:
-                        risks = _generate_smart_risks(race_data['grid_position'])
-                else:
-                    risks = _generate_smart_risks(race_data['grid_position'])
-                
-                risk_level, recommendation = _analyze_risk(risks['risque_total'])
-                
-                predictions.append({
-                    'pilot_id': driver.id,
-                    'pilot_name': f"{driver.first_name} {driver.last_name}" if hasattr(driver, 'first_name') else driver.name,
-                    'pilot_code': driver.code if hasattr(driver, 'code') else 'UNK',
-                    'team_name': driver.team.name if hasattr(driver, 'team') and driver.team else 'Unknown',
-                    'risks': risks,
-                    'risk_level': risk_level,
-                    'recommendation': recommendation
-                })
-        
-        # Stats
-        statistics = _calculate_statistics(predictions)
+        (payload, source), shared = race_flight.do(race_id, lambda: _race_response(race_id))
+        if shared:
+            source = 'coalesced'
+        return Response(payload)
         
-        return Response({
-            'race_id': race.id,
-            'race_name': race.name if hasattr(race, 'name') else f'Race #{race.id}',
-            'circuit_name': race.circuit.name if hasattr(race, 'circuit') else 'Unknown',
-            'predictions': predictions,
-            'statistics': statistics,
-            'model_info': {
-                'mode': 'AI' if PREDICTOR_AVAILABLE else 'TEST',
-                'version': predictor.get_info()['version'] if PREDICTOR_AVAILABLE else '1.0'
-            }
-        })
-        
-    except Race.DoesNotExist:
+    except (Race.DoesNotExist, Http404):
         return Response(
             {'error': f'Course {race_id} introuvable'}, 
             status=status.HTTP_404_NOT_FOUND
@@ -127,6 +57,168 @@ def predict_race_incidents(request, race_id):
             {'error': str(e)}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    finally:
+        metrics.observe_request('predict_race', source, time.perf_counter() - start)
+
+
+def _race_response(race_id):
+    """
+    Réponse d'une course : cache, prédictions stockées ou calcul
+    
+    Returns:
+        (payload, source) ; source: cache, stale, stored, live ou fallback
+    """
+    # ✅ Récupérer LA VRAIE COURSE depuis ta base de données
+    with metrics.stage('db_fetch'):
+        race = get_object_or_404(Race.objects.select_related('season', 'circuit'), id=race_id)
+    # Même version du modèle pour toute la requête (bascule à chaud possible)
+    serving = loader.get_serving()
+    predictor = serving.predictor if serving is not None else None
+    
+    if predictor is None:
+        payload, _ = _compute_race_predictions(race, serving)
+        return payload, 'fallback'
+    
+    # Cache : même course, même modèle, mêmes résultats/stratégies
+    model_version = predictor.get_info()['version']
+    with metrics.stage('db_fetch'):
+        fingerprint = prediction_cache.race_fingerprint(race)
+    with metrics.stage('cache_lookup'):
+        cached, stale = prediction_cache.get_race_prediction(race.id, model_version, fingerprint)
+    if cached is not None and not stale:
+        return cached, 'cache'
+    
+    # Un seul worker recalcule ; les autres servent la réponse périmée ou attendent la sienne
+    locked = prediction_cache.lock_race(race.id, model_version, fingerprint)
+    if not locked:
+        if cached is not None:
+            return cached, 'stale'
+        with metrics.stage('cache_lookup'):
+            published = prediction_cache.wait_race_prediction(race.id, model_version, fingerprint)
+        if published is not None:
+            return published, 'coalesced'
+    
+    try:
+        stored = _stored_race_predictions(race, predictor, model_version, fingerprint)
+        if stored is not None:
+            prediction_cache.set_race_prediction(race.id, model_version, fingerprint, stored)
+            return stored, 'stored'
+        
+        payload, ai_scored = _compute_race_predictions(race, serving)
+        if ai_scored:
+            prediction_cache.set_race_prediction(race.id, model_version, fingerprint, payload)
+        return payload, 'live' if ai_scored else 'fallback'
+    finally:
+        if locked:
+            prediction_cache.unlock_race(race.id, model_version, fingerprint)
+
+
+def _compute_race_predictions(race, serving):
+    """
+    Calcule la réponse complète d'une course
+    
+    Args:
+        serving: loader.Serving (prédicteur et micro-batcher d'une même version) ou None
+    
+    Returns:
+        (payload, ai_scored) : ai_scored vaut True si le modèle a produit les risques
+    """
+    # ✅ Récupérer LES VRAIS RÉSULTATS de la course
+    # Adapter selon ta structure : race.results, race.entries, race.participants, etc.
+    with metrics.stage('db_fetch'):
+        results = list(race.results.select_related('pilot'))
+    predictor = serving.predictor if serving is not None else None
+    
+    predictions = []
+    ai_scored = False
+    
+    # Course sans résultats (pas encore courue) : 20 pilotes, rang des victoires comme position
+    if not results:
+        with metrics.stage('db_fetch'):
+            pilotes = list(Pilote.objects.all()[:20])
+        scored = [(pilote, _generate_smart_risks(i + 1)) for i, pilote in enumerate(pilotes)]
+    else:
+        # Utiliser les vrais résultats : toute la grille en 2 requêtes (tours, arrêts)
+        seq_length = predictor.get_info()['seq_length'] if predictor is not None else 10
+        rows = race_rows(race, results, seq_length)
+        
+        # Prédiction IA de toute la grille en une passe, ou fallback
+        all_risks = None
+        if predictor is not None:
+            try:
+                all_risks = serving.batcher.submit(rows)
+                ai_scored = True
+            except Exception:
+                all_risks = None
+        if all_risks is None:
+            all_risks = [_generate_smart_risks(row[3]['grid_position']) for row in rows]
+        
+        scored = [(result.pilot, risks) for result, risks in zip(results, all_risks)]
+    
+    with metrics.stage('response_build'):
+        for pilote, risks in scored:
+            predictions.append(_prediction_entry(pilote, risks))
+        return _race_payload(race, predictor, predictions), ai_scored
+
+
+def _pilot_identity(driver):
+    """Identifiants affichés d'un pilote"""
+    return {
+        'pilot_id': driver.id,
+        'pilot_name': f"{driver.first_name} {driver.last_name}" if hasattr(driver, 'first_name') else driver.nom,
+        'pilot_code': driver.code if hasattr(driver, 'code') else 'UNK',
+        'team_name': driver.team.name if hasattr(driver, 'team') and driver.team else driver.equipe,
+    }
+
+
+def _prediction_entry(driver, risks):
+    """Entrée 'predictions' d'un pilote"""
+    risk_level, recommendation = _analyze_risk(risks['risque_total'])
+    
+    return {
+        **_pilot_identity(driver),
+        'risks': risks,
+        'risk_level': risk_level,
+        'recommendation': recommendation
+    }
+
+
+def _race_payload(race, predictor, predictions):
+    """Réponse complète d'une course à partir des entrées pilotes"""
+    # Stats
+    statistics = _calculate_statistics(predictions)
+    
+    return {
+        'race_id': race.id,
+        'race_name': race.nom if hasattr(race, 'nom') else f'Race #{race.id}',
+        'circuit_name': race.circuit.nom if hasattr(race, 'circuit') else 'Unknown',
+        'predictions': predictions,
+        'statistics': statistics,
+        'model_info': {
+            'mode': 'AI' if predictor is not None else 'TEST',
+            'version': predictor.get_info()['version'] if predictor is not None else '1.0'
+        }
+    }
+
+
+def _stored_race_predictions(race, predictor, model_version, fingerprint):
+    """
+    Réponse depuis les prédictions précalculées (manage.py precompute_predictions)
+    
+    Une seule requête indexée ; None si rien n'est stocké pour ce modèle et ces données.
+    """
+    with metrics.stage('stored_lookup'):
+        stored = list(
+            IncidentPrediction.objects
+            .filter(race_id=race.id, model_version=model_version, fingerprint=fingerprint)
+            .select_related('pilot')
+        )
+    if not stored:
+        return None
+    
+    with metrics.stage('response_build'):
+        predictions = [_prediction_entry(p.pilot, p.risks()) for p in stored]
+        return _race_payload(race, predictor, predictions)
 
 
 def _generate_smart_risks(grid_position):
@@ -208,35 +300,702 @@ def _calculate_statistics(predictions):
 @api_view(['GET'])
 @permission_classes([AllowAny])  # ← AJOUTER CETTE LIGNE
 def predict_pilot_risk(request, pilot_id):
-    """Risque pour un pilote"""
-    race_id = request.query_params.get('race_id')
-    if not race_id:
-        return Response({'error': 'race_id required'}, status=status.HTTP_400_BAD_REQUEST)
+    """
+    Risque d'un pilote sur une course (?race_id=) ou sur toute une saison (?season=2021)
     
-    risks = _generate_smart_risks()
+    Toutes les courses du pilote sont prédites en une seule passe ; 'timeline'
+    donne les risques course par course dans l'ordre du calendrier.
+    """
+    start = time.perf_counter()
+    source = 'error'
+    try:
+        try:
+            race_id = int(request.query_params['race_id']) if request.query_params.get('race_id') else None
+            season = int(request.query_params['season']) if request.query_params.get('season') else None
+        except ValueError:
+            return Response({'error': 'race_id et season doivent être numériques'}, status=status.HTTP_400_BAD_REQUEST)
+        if race_id is None and season is None:
+            return Response({'error': 'race_id ou season requis'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        key = (pilot_id, race_id, season)
+        (payload, code, source), shared = pilot_flight.do(key, lambda: _pilot_response(pilot_id, race_id, season))
+        if shared:
+            source = 'coalesced'
+        return Response(payload, status=code)
+    finally:
+        metrics.observe_request('predict_pilot', source, time.perf_counter() - start)
+
+
+def _pilot_response(pilot_id, race_id, season):
+    """
+    Réponse de predict_pilot_risk (calculée une fois par groupe de requêtes simultanées)
     
-    return Response({
-        'pilot_id': pilot_id,
-        'pilot_name': 'Test Pilot',
-        'pilot_code': 'TST',
-        'race_id': race_id,
-        'race_name': f'Grand Prix #{race_id}',
-        'risks': risks
-    })
+    Returns:
+        (payload, statut HTTP, source) ; source: live, fallback ou error
+    """
+    with metrics.stage('db_fetch'):
+        pilot = get_object_or_404(Pilote, id=pilot_id)
+        results = pilot_results(pilot.id, race_id=race_id, season=season)
+    if not results:
+        scope = f'la course {race_id}' if race_id is not None else f'la saison {season}'
+        return {'error': f'Aucun résultat du pilote {pilot_id} pour {scope}'}, status.HTTP_404_NOT_FOUND, 'error'
+    
+    serving = loader.get_serving()
+    predictor = serving.predictor if serving is not None else None
+    seq_length = predictor.get_info()['seq_length'] if predictor is not None else 10
+    rows = pilot_rows(pilot, results, seq_length)
+    
+    # Toutes les courses en une passe, ou fallback
+    all_risks = None
+    if predictor is not None:
+        try:
+            all_risks = serving.batcher.submit(rows)
+        except Exception:
+            all_risks = None
+    source = 'live' if all_risks is not None else 'fallback'
+    if all_risks is None:
+        all_risks = [_generate_smart_risks(row[3]['grid_position']) for row in rows]
+    
+    with metrics.stage('response_build'):
+        payload = _pilot_payload(pilot, results, all_risks, predictor)
+        if race_id is not None:
+            # Format historique d'une seule course
+            payload.update({k: payload['timeline'][0][k] for k in ('race_id', 'race_name', 'risks')})
+        payload['season'] = season
+    return payload, status.HTTP_200_OK, source
+
+
+def _pilot_payload(pilot, results, all_risks, predictor):
+    """Chronologie des risques d'un pilote et résumé sur la période"""
+    identity = _pilot_identity(pilot)
+    timeline = []
+    for result, risks in zip(results, all_risks):
+        race = result.race
+        risk_level, recommendation = _analyze_risk(risks['risque_total'])
+        timeline.append({
+            'race_id': race.id,
+            'race_name': race.nom,
+            'round': race.numero_manche,
+            'date': race.date.isoformat(),
+            'season': race.season.annee,
+            'circuit_name': race.circuit.nom,
+            'grid_position': result.grid_position,
+            'pilot_code': identity['pilot_code'],
+            'risks': risks,
+            'risk_level': risk_level,
+            'recommendation': recommendation
+        })
+    
+    totals = [entry['risks']['risque_total'] for entry in timeline]
+    riskiest = max(timeline, key=lambda entry: entry['risks']['risque_total'])
+    classes = [k for k in timeline[0]['risks'] if k != 'risque_total']
+    
+    return {
+        **identity,
+        'timeline': timeline,
+        'summary': {
+            'races': len(timeline),
+            'average_risk': round(sum(totals) / len(totals), 3),
+            'max_risk': round(riskiest['risks']['risque_total'], 3),
+            'max_risk_race_id': riskiest['race_id'],
+            'average_risks': {
+                cls: round(sum(entry['risks'][cls] for entry in timeline) / len(timeline), 3) for cls in classes
+            },
+            'risk_levels': {
+                level: sum(1 for entry in timeline if entry['risk_level'] == level)
+                for level in ('CRITICAL', 'HIGH', 'MODERATE', 'LOW')
+            },
+        },
+        'model_info': {
+            'mode': 'AI' if predictor is not None else 'TEST',
+            'version': predictor.get_info()['version'] if predictor is not None else '1.0'
+        }
+    }
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def predict_scenarios(request):
+    """
+    Balayage « et si » d'un pilote sur une course, en une seule passe du modèle
+    
+    Body:
+        {
+            "pilot_id": 1, "race_id": 12,
+            "sweep": {
+                "grid_position": {"start": 1, "stop": 20},
+                "num_pit_stops": [1, 2, 3],
+                "position_change": 0,
+                "lap_offset_ms": {"start": -1000, "stop": 1000, "step": 500},
+                "lap_trend_ms": [0, 50]
+            }
+        }
+    
+    Chaque axe est un nombre, une liste ou une plage {start, stop, step} (bornes
+    incluses) ; les axes absents gardent la valeur réelle du pilote dans la course.
+    La surface suit l'ordre des axes reçus et les balayages répétés sont servis du cache.
+    """
+    start = time.perf_counter()
+    source = 'error'
+    try:
+        try:
+            pilot_id, race_id = int(request.data['pilot_id']), int(request.data['race_id'])
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'pilot_id et race_id numériques requis'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            axes = scenarios.parse_sweep(request.data.get('sweep'))
+        except scenarios.ScenarioError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serving = loader.get_serving()
+        if serving is None:
+            return Response(
+                {'error': 'Prédicteur indisponible', 'predictor': loader.predictor_status()},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        predictor = serving.predictor
+        model_version = predictor.get_info()['version']
+        
+        with metrics.stage('db_fetch'):
+            race = get_object_or_404(Race.objects.select_related('season', 'circuit'), id=race_id)
+            pilot = get_object_or_404(Pilote, id=pilot_id)
+            fingerprint = prediction_cache.race_fingerprint(race)
+        
+        with metrics.stage('cache_lookup'):
+            cached = prediction_cache.get_scenario(race.id, model_version, fingerprint, pilot.id, axes)
+        if cached is not None:
+            source = 'cache'
+            return Response(cached)
+        
+        with metrics.stage('db_fetch'):
+            results = pilot_results(pilot.id, race_id=race.id)
+        if results:
+            row = pilot_rows(pilot, results, predictor.get_info()['seq_length'])[0]
+        else:
+            # Pilote sans résultat dans cette course (course à venir) : scénario sans historique
+            row = (pilot_features(pilot), circuit_features(race), [], {
+                'grid_position': 10,
+                'year': race.season.annee,
+                'laps_completed': 0,
+                'num_pit_stops': 0,
+                'position_change': 0
+            })
+        
+        proba, base_proba = predictor.predict_sweep(row, axes)
+        source = 'live'
+        
+        with metrics.stage('response_build'):
+            payload = {
+                **_pilot_identity(pilot),
+                'race_id': race.id,
+                'race_name': race.nom,
+                'base': {name: row[3].get(name, 0) for name in ('grid_position', 'num_pit_stops', 'position_change')},
+                'has_result': bool(results),
+                **scenarios.surface_payload(axes, proba, base_proba, predictor.get_info()['classes']),
+                'model_info': {'mode': 'AI', 'version': model_version},
+            }
+        prediction_cache.set_scenario(race.id, model_version, fingerprint, pilot.id, axes, payload)
+        return Response(payload)
+    finally:
+        metrics.observe_request('predict_scenarios', source, time.perf_counter() - start)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def predict_bulk(request):
+    """
+    Risques de nombreux couples (course, pilote) ou lignes de features, en NDJSON
+    
+    Body:
+        {"items": [
+            {"race_id": 12, "pilot_id": 1},
+            {"id": "libre", "pilot": {"code": "hamilton", "team_slug": "mercedes"},
+             "circuit": {"slug": "monaco"}, "lap_times": [91234, ...],
+             "race": {"grid_position": 3, "year": 2021, "num_pit_stops": 1}}
+        ]}
+    
+    Les entrées de tous les couples sont lues en deux requêtes ; les lignes
+    sont prédites par lots de INCIDENT_BULK_CHUNK_ROWS et chaque lot est
+    écrit dès qu'il est prêt (une ligne JSON par item, dans l'ordre, puis un résumé).
+    """
+    start = time.perf_counter()
+    items = request.data.get('items') if isinstance(request.data, dict) else None
+    max_items = getattr(settings, 'INCIDENT_BULK_MAX_ITEMS', 10000)
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'items requis (liste non vide)'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > max_items:
+        return Response({'error': f'{len(items)} items, maximum {max_items}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        parsed = [_bulk_item(item) for item in items]
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serving = loader.get_serving()
+    if serving is None:
+        return Response(
+            {'error': 'Prédicteur indisponible', 'predictor': loader.predictor_status()},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    
+    pairs = [(key['race_id'], key['pilot_id']) for key, row in parsed if row is None]
+    rows_by_pair = pair_rows(pairs, serving.predictor.get_info()['seq_length'])
+    
+    response = StreamingHttpResponse(
+        _bulk_stream(parsed, rows_by_pair, serving, start),
+        content_type='application/x-ndjson'
+    )
+    response['X-Model-Version'] = serving.predictor.get_info()['version']
+    return response
+
+
+def _bulk_item(item):
+    """(identifiant renvoyé, ligne predict_batch ou None si à lire en base)"""
+    if not isinstance(item, dict):
+        raise ValueError(f'Item invalide: {item!r}')
+    if 'race_id' in item or 'pilot_id' in item:
+        try:
+            return {'race_id': int(item['race_id']), 'pilot_id': int(item['pilot_id'])}, None
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'race_id et pilot_id numériques requis: {item!r}')
+    
+    pilot, circuit, race = item.get('pilot', {}), item.get('circuit', {}), item.get('race', {})
+    lap_times = item.get('lap_times', [])
+    if not all(isinstance(part, dict) for part in (pilot, circuit, race)) or not isinstance(lap_times, list):
+        raise ValueError(f'pilot, circuit et race doivent être des objets, lap_times une liste: {item!r}')
+    if not all(_is_number(v) for v in lap_times):
+        raise ValueError(f'lap_times doit contenir des millisecondes: {item!r}')
+    labels = [(pilot, 'code'), (pilot, 'team_slug'), (circuit, 'slug')]
+    if not all(part.get(name) is None or isinstance(part[name], str) for part, name in labels):
+        raise ValueError(f'pilot.code, pilot.team_slug et circuit.slug doivent être des chaînes: {item!r}')
+    if not all(_is_number(race[name]) for name in RACE_FIELDS if name in race):
+        raise ValueError(f"race: {', '.join(RACE_FIELDS)} doivent être numériques: {item!r}")
+    return {'id': item.get('id')}, (pilot, circuit, lap_times, race)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _bulk_stream(parsed, rows_by_pair, serving, start, chunk_rows=None):
+    """Prédit par lots et produit le NDJSON au fil de l'eau"""
+    chunk_rows = chunk_rows or getattr(settings, 'INCIDENT_BULK_CHUNK_ROWS', 256)
+    scored = missing = failed = 0
+    source = 'live'
+    try:
+        for offset in range(0, len(parsed), chunk_rows):
+            chunk = parsed[offset:offset + chunk_rows]
+            # Lignes fournies telles quelles, couples lus en base (None si sans résultat)
+            rows = [row if row is not None else rows_by_pair.get((key['race_id'], key['pilot_id'])) for key, row in chunk]
+            
+            ready = [row for row in rows if row is not None]
+            # Un lot en échec n'arrête pas le flux : ses items portent l'erreur
+            error = None
+            try:
+                risks = iter(serving.batcher.submit(ready))
+            except Exception as e:
+                source = 'error'
+                error = f'Échec de la prédiction: {e}'
+            
+            with metrics.stage('response_build'):
+                lines = []
+                for i, ((key, _), row) in enumerate(zip(chunk, rows), start=offset):
+                    if row is None:
+                        missing += 1
+                        lines.append(json.dumps({
+                            'index': i, **key,
+                            'error': f"Aucun résultat du pilote {key['pilot_id']} pour la course {key['race_id']}"
+                        }))
+                        continue
+                    if error is not None:
+                        failed += 1
+                        lines.append(json.dumps({'index': i, **key, 'error': error}))
+                        continue
+                    entry = next(risks)
+                    scored += 1
+                    lines.append(json.dumps({
+                        'index': i, **key, 'risks': entry, 'risk_level': _analyze_risk(entry['risque_total'])[0]
+                    }))
+            yield '\n'.join(lines) + '\n'
+        
+        yield json.dumps({'summary': {
+            'items': len(parsed),
+            'scored': scored,
+            'missing': missing,
+            'failed': failed,
+            'model_version': serving.predictor.get_info()['version'],
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        }}) + '\n'
+    finally:
+        metrics.observe_request('predict_bulk', source, time.perf_counter() - start)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])  # ← AJOUTER CETTE LIGNE
 def health_check(request):
-    """Santé de l'API"""
+    """Santé de l'API (ne déclenche pas le chargement du modèle)"""
+    return Response(_health_info())
+
+
+def _health_info():
+    predictor_status = loader.predictor_status()
+    serving = _current_serving(predictor_status)
     info = {
         'status': 'OK',
         'message': '🏎️ F1 Incident Predictor API',
-        'mode': 'AI Powered' if PREDICTOR_AVAILABLE else 'Test Mode',
+        'mode': 'AI Powered' if serving is not None else 'Test Mode',
+        'predictor': predictor_status,
+        'inference_server': inference_client.stats(),
     }
     
-    if PREDICTOR_AVAILABLE:
-        info['model_info'] = predictor.get_info()
+    if serving is not None:
+        info['model_info'] = serving.predictor.get_info()
+        info['encoding'] = serving.predictor.get_encoding_stats()
+        info['batching'] = serving.batcher.get_stats()
+    info['cache'] = prediction_cache.cache_stats()
+    info['single_flight'] = single_flight.stats()
+    info['live_sessions'] = streaming.sessions.race_ids()
+    return info
+
+
+def _current_serving(predictor_status):
+    """Serveur d'inférence déjà connecté, sinon modèle local chargé, sans déclencher de chargement"""
+    remote = inference_client.current()
+    if remote is not None:
+        return remote
+    return loader.get_local_serving() if predictor_status['state'] == loader.READY else None
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def prometheus_metrics(request):
+    """Métriques au format texte Prometheus (étapes d'inférence, lots, cache, modèle servi)"""
+    return HttpResponse(
+        metrics.render_prometheus(_service_gauges()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def _service_gauges():
+    """Compteurs existants (loader, micro-batcher, cache, encodage) exposés comme jauges"""
+    predictor_status = loader.predictor_status()
+    cache = prediction_cache.cache_stats()
+    executor = inference_executor.get_executor().get_stats()
+    remote = inference_client.stats()
+    gauges = [
+        ('f1_predictor_state', 'gauge', "État du chargement du prédicteur",
+         [({'state': state}, int(predictor_status['state'] == state))
+          for state in (loader.IDLE, loader.LOADING, loader.READY, loader.FAILED)]),
+        ('f1_predictor_load_seconds', 'gauge', "Durée du dernier chargement",
+         [({}, predictor_status['load_seconds'] or 0.0)]),
+        ('f1_model_swaps_total', 'counter', "Bascules de version à chaud",
+         [({}, predictor_status['swaps'])]),
+        ('f1_prediction_cache_total', 'counter', "Consultations et invalidations du cache des courses",
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses']),
+          ({'result': 'invalidation'}, cache['invalidations']),
+          ({'result': 'stale_hit'}, cache['stale_hits']), ({'result': 'lock_wait'}, cache['lock_waits']),
+          ({'result': 'lock_wait_hit'}, cache['lock_wait_hits']),
+          ({'result': 'scenario_hit'}, cache['scenario_hits']), ({'result': 'scenario_miss'}, cache['scenario_misses'])]),
+        ('f1_single_flight_requests_total', 'counter', "Requêtes calculées (leader) ou partagées (coalesced)",
+         [({'endpoint': name, 'role': role}, stats[key])
+          for name, stats in single_flight.stats().items()
+          for role, key in (('leader', 'leaders'), ('coalesced', 'coalesced'))]),
+        ('f1_single_flight_in_flight', 'gauge', "Calculs en cours par endpoint",
+         [({'endpoint': name}, stats['in_flight']) for name, stats in single_flight.stats().items()]),
+        ('f1_executor_pending', 'gauge', "Tâches admises dans l'exécuteur d'inférence des vues asynchrones",
+         [({}, executor['pending'])]),
+        ('f1_executor_tasks_total', 'counter', "Tâches de l'exécuteur d'inférence, admises ou refusées (503)",
+         [({'result': 'submitted'}, executor['submitted']), ({'result': 'rejected'}, executor['rejected'])]),
+        ('f1_inference_server_connected', 'gauge', "Serveur d'inférence hors processus utilisé",
+         [({}, int(remote['connected']))]),
+        ('f1_inference_server_requests_total', 'counter', "Requêtes au serveur d'inférence (erreurs, replis locaux)",
+         [({'result': result}, remote[key]) for result, key in
+          (('ok', 'requests'), ('error', 'errors'), ('server_error', 'server_errors'), ('fallback', 'fallbacks'))]),
+    ]
+    
+    serving = _current_serving(predictor_status)
+    if serving is None:
+        return gauges
+    
+    info = serving.predictor.get_info()
+    batching = serving.batcher.get_stats()
+    encoding = serving.predictor.get_encoding_stats(top=0)
+    gauges += [
+        ('f1_model_info', 'gauge', "Modèle servi",
+         [({'version': info['version'], 'backend': info['backend'], 'precision': info['precision']}, 1)]),
+        ('f1_batcher_queue_depth', 'gauge', "Lignes en attente dans le micro-batcher",
+         [({}, batching['queue_depth'])]),
+        ('f1_batcher_requests_total', 'counter', "Requêtes soumises au micro-batcher",
+         [({}, batching['requests'])]),
+        ('f1_batcher_batches_total', 'counter', "Passes lancées par le micro-batcher",
+         [({}, batching['batches'])]),
+        ('f1_encoding_lookups_total', 'counter', "Valeurs catégorielles encodées",
+         [({'feature': name}, stats['lookups']) for name, stats in encoding.items()]),
+        ('f1_encoding_unknown_total', 'counter', "Valeurs hors vocabulaire d'entraînement",
+         [({'feature': name}, stats['unknown']) for name, stats in encoding.items()]),
+    ]
+    return gauges
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def risk_cube_view(request):
+    """
+    Exploration des risques agrégés (circuit / écurie / saison), sans lire les prédictions brutes
+    
+    Query params:
+        group_by: dimensions séparées par des virgules parmi season, circuit, constructor (défaut: circuit)
+        season, circuit, constructor: filtres de descente (écurie = constructorRef, ex: ?group_by=constructor&circuit=12)
+        sort: champ de tri (défaut: mean_risque_total), order: desc|asc
+        limit: top N (défaut 10, max 100)
+        model_version: version agrégée (défaut: version active du registre)
+    """
+    params = request.query_params
+    group_by = [name.strip() for name in params.get('group_by', 'circuit').split(',') if name.strip()]
+    unknown = [name for name in group_by if name not in risk_cube.DIMENSIONS]
+    if not group_by or unknown:
+        return Response(
+            {'error': f"group_by invalide, valeurs possibles: {', '.join(risk_cube.DIMENSIONS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    sort = params.get('sort', 'mean_risque_total')
+    if sort not in risk_cube.SORT_FIELDS:
+        return Response(
+            {'error': f"sort invalide, valeurs possibles: {', '.join(risk_cube.SORT_FIELDS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    order = params.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return Response({'error': 'order doit valoir asc ou desc'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        limit = min(max(int(params.get('limit', 10)), 1), 100)
+        filters = {
+            'season': int(params['season']) if params.get('season') else None,
+            'circuit': int(params['circuit']) if params.get('circuit') else None,
+            'constructor': params.get('constructor') or None,
+        }
+    except ValueError:
+        return Response({'error': 'limit, season et circuit doivent être entiers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    model_version = params.get('model_version')
+    if not model_version:
+        # Même valeur que IncidentPrediction.model_version (metadata.json de la version active)
+        registry = loader.get_registry()
+        model_version = registry.read_metadata(registry.resolve()).get('model_version', '1.0')
+    
+    with metrics.stage('db_fetch'):
+        rows = risk_cube.query(model_version, group_by, filters, sort, order == 'desc', limit)
+    
+    return Response({
+        'model_version': model_version,
+        'group_by': group_by,
+        'filters': {name: value for name, value in filters.items() if value is not None},
+        'sort': sort,
+        'order': order,
+        'results': rows,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def push_live_laps(request, race_id):
+    """
+    Ajoute des tours en direct et retourne les risques mis à jour
+    
+    Body: {'pilot_id': 1, 'lap_time_ms': 91234}, {'laps': [{...}, ...]} ou [{...}, ...]
+    """
+    data = request.data
+    if isinstance(data, list):
+        entries = data
+    elif isinstance(data, dict):
+        entries = data['laps'] if 'laps' in data else [data]
+    else:
+        return Response({'error': 'Objet ou liste JSON attendu'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        laps = [(int(e['pilot_id']), float(e['lap_time_ms'])) for e in entries]
+    except (KeyError, TypeError, ValueError):
+        return Response({'error': 'pilot_id et lap_time_ms requis'}, status=status.HTTP_400_BAD_REQUEST)
+    if not laps:
+        return Response({'error': 'Aucun tour fourni'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serving = loader.get_serving()
+    if serving is None:
+        return Response({'error': 'Prédicteur indisponible'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    predictor = serving.predictor
+    
+    # Statut relu à chaque envoi : la fin de course a pu être enregistrée par un autre worker
+    race = get_object_or_404(Race.objects.select_related('season', 'circuit'), id=race_id)
+    if race.statut != 'en_cours':
+        streaming.sessions.evict(race.id)
+        return Response(
+            {'error': f'Course {race_id} non en cours ({race.statut})'},
+            status=status.HTTP_409_CONFLICT
+        )
+    session = streaming.sessions.get(race.id) or streaming.sessions.get_or_create(
+        race.id, circuit_features(race), predictor.get_info()['seq_length']
+    )
+    
+    # Données statiques chargées une seule fois par pilote
+    drivers = _live_driver_features(race, session.missing_drivers({pid for pid, _ in laps}))
+    unknown = [pid for pid, _ in laps if pid not in session.drivers and pid not in drivers]
+    if unknown:
+        return Response({'error': f'Pilotes introuvables: {unknown}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = session.add_laps(laps, drivers.__getitem__)
+    
+    # Prédiction IA ou fallback, comme pour une course complète
+    try:
+        all_risks = serving.batcher.submit(rows)
+        source = 'live'
+    except Exception:
+        all_risks = [_generate_smart_risks(row[3]['grid_position']) for row in rows]
+        source = 'fallback'
+    
+    updates = {}
+    for (pilot_id, _), row, risks in zip(laps, rows, all_risks):
+        risk_level, recommendation = _analyze_risk(risks['risque_total'])
+        updates[pilot_id] = {
+            'pilot_id': pilot_id,
+            'lap': row[3]['laps_completed'],
+            'risks': risks,
+            'risk_level': risk_level,
+            'recommendation': recommendation,
+            'source': source
+        }
+    version = session.publish(updates)
+    
+    return Response({
+        'race_id': race_id,
+        'version': version,
+        'model_version': serving.version,
+        'updates': list(updates.values())
+    })
+
+
+def _live_driver_features(race, pilot_ids):
+    """(pilot_data, race_data) des pilotes qui rejoignent la session"""
+    if not pilot_ids:
+        return {}
+    
+    pilots = Pilote.objects.in_bulk(pilot_ids)
+    results = {
+        result.pilot_id: result
+        for result in RaceResult.objects.filter(race_id=race.id, pilot_id__in=pilot_ids)
+        .only('pilot_id', 'position', 'grid_position')
+    }
+    
+    return {
+        pilot_id: (
+            pilot_features(pilot),
+            {
+                'grid_position': grid_position(results[pilot_id]) if pilot_id in results else 10,
+                'year': race.season.annee,
+                'num_pit_stops': 0,
+                'position_change': 0
+            }
+        )
+        for pilot_id, pilot in pilots.items()
+    }
+
+
+def stream_live_race(request, race_id):
+    """
+    Flux SSE des risques en direct (servi par asgi.py)
+    
+    Un événement 'risks' est envoyé à chaque nouvelle version de la session,
+    'end' quand la course n'est plus en cours.
+    """
+    poll_interval = 0.25
+    heartbeat_every = 15
+    
+    async def events():
+        version = -1
+        last_sent = asyncio.get_running_loop().time()
+        while True:
+            session = streaming.sessions.get(race_id)
+            if session is None or session.closed:
+                yield 'event: end\ndata: {}\n\n'
+                return
+            
+            now = asyncio.get_running_loop().time()
+            if session.version != version:
+                snapshot = session.snapshot()
+                version = snapshot['version']
+                last_sent = now
+                yield f'id: {version}\nevent: risks\ndata: {json.dumps(snapshot)}\n\n'
+            elif now - last_sent > heartbeat_every:
+                last_sent = now
+                yield ': heartbeat\n\n'
+            
+            await asyncio.sleep(poll_interval)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def poll_live_race(request, race_id):
+    """Long-poll (alternative au SSE) : ?since=<version>&timeout=<secondes>"""
+    session = streaming.sessions.get(race_id)
+    if session is None:
+        return Response({'error': f'Aucune session en direct pour la course {race_id}'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        since = int(request.query_params.get('since', -1))
+        timeout = min(float(request.query_params.get('timeout', 25)), 60)
+    except ValueError:
+        return Response({'error': 'since et timeout doivent être numériques'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(session.wait_for(since, timeout))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def list_models(request):
+    """Versions du registre et version servie par ce processus"""
+    registry = loader.get_registry()
+    return Response({
+        'active_version': registry.active_version(),
+        'serving': loader.predictor_status(),
+        'versions': registry.versions(),
+        'history': registry.history(),
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def promote_model(request):
+    """
+    Active une version du registre ; body: {'version': '1.1'}
+    
+    Les autres processus basculent au plus tard après INCIDENT_MODEL_POLL_SECONDS.
+    """
+    version = request.data.get('version')
+    if not version:
+        return Response({'error': 'version requise'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        loader.get_registry().promote(str(version))
+    except RegistryError as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    
+    loader.reload_async()
+    return Response({'active_version': version, 'serving': loader.predictor_status()})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def rollback_model(request):
+    """Réactive la version précédente"""
+    try:
+        version = loader.get_registry().rollback()
+    except RegistryError as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
     
-    return Response(info)
-# ... (garder les autres fonctions predict_pilot_risk et health_check)
\ No newline at end of file
+    loader.reload_async()
+    return Response({'active_version': version, 'serving': loader.predictor_status()})
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pilots', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pilote',
+            name='ergast_ref',
+            field=models.CharField(blank=True, help_text='driverRef Ergast (ex: hamilton)', max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pilots', '0002_pilote_ergast_ref'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pilote',
+            name='equipe_ref',
+            field=models.CharField(blank=True, default='', help_text="constructorRef Ergast de l'écurie actuelle (ex: red_bull)", max_length=100),
+        ),
+    ]
@@ -9,6 +9,8 @@ class Pilote(models.Model):
     experience = models.IntegerField(default=0)
     victoires = models.IntegerField(default=0)
     podiums = models.IntegerField(default=0)
+    ergast_ref = models.CharField(max_length=100, unique=True, blank=True, null=True, help_text="driverRef Ergast (ex: hamilton)")
+    equipe_ref = models.CharField(max_length=100, blank=True, default='', help_text="constructorRef Ergast de l'écurie actuelle (ex: red_bull)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,368 @@
+import csv
+import datetime
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from circuits.models import Circuit
+from pilots.models import Pilote
+from races.models import LapTime, PitStop, Race, RaceResult, Season
+
+NULL = '\\N'
+STATE_FILE = '.import_ergast_state.json'
+
+# Ordre d'import : chaque table dépend des précédentes
+TABLES = ['circuits', 'drivers', 'races', 'results', 'lap_times', 'pit_stops']
+
+
+def _value(row, key):
+    value = row.get(key)
+    return None if value in (None, '', NULL) else value
+
+
+def _int(row, key, default=None):
+    value = _value(row, key)
+    if value is None:
+        return default
+    try:
+        return int(float(value))
+    except ValueError:
+        return default
+
+
+def _milliseconds(row, key):
+    """Millisecondes Ergast, y compris les valeurs mal formées '23.227.199'"""
+    value = _value(row, key)
+    if value is None:
+        return None
+    value = value.replace(',', '')
+    if value.count('.') > 1:
+        value = value.replace('.', '')
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def _chunks(path, size):
+    """Lit un CSV par blocs de dictionnaires (mémoire bornée)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        while True:
+            chunk = list(islice(reader, size))
+            if not chunk:
+                return
+            yield chunk
+
+
+class Command(BaseCommand):
+    help = "Importe l'historique Ergast (CSV) en flux : circuits, pilotes, courses, résultats, tours, arrêts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Dossier contenant les CSV Ergast")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--only', nargs='+', choices=TABLES, help="Tables à importer")
+        parser.add_argument('--restart', action='store_true', help="Ignore la reprise et relit tout")
+
+    def handle(self, *args, **options):
+        self.directory = options['directory']
+        self.chunk_size = options['chunk_size']
+        if not os.path.isdir(self.directory):
+            raise CommandError(f"❌ Dossier introuvable: {self.directory}")
+
+        self.state_path = os.path.join(self.directory, STATE_FILE)
+        self.state = {} if options['restart'] else self._load_state()
+
+        # Petites tables de référence gardées en mémoire
+        self.status = {
+            row['statusId']: row['status']
+            for row in self._rows('status.csv')
+        } if self._exists('status.csv') else {}
+        # constructorId -> (constructorRef, nom) : la référence est celle du vocabulaire du modèle
+        self.constructors = {
+            row['constructorId']: (row['constructorRef'], row['name'])
+            for row in self._rows('constructors.csv')
+        } if self._exists('constructors.csv') else {}
+
+        for table in options['only'] or TABLES:
+            if not self._exists(f'{table}.csv'):
+                self.stdout.write(self.style.WARNING(f"⚠️ {table}.csv absent, ignoré"))
+                continue
+            getattr(self, f'_import_{table}')()
+
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        self.stdout.write(self.style.SUCCESS("✅ Import Ergast terminé"))
+
+    # --- Infrastructure ---
+
+    def _exists(self, filename):
+        return os.path.exists(os.path.join(self.directory, filename))
+
+    def _rows(self, filename):
+        with open(os.path.join(self.directory, filename), newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        tmp = f'{self.state_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def _stream(self, table, write_chunk):
+        """
+        Importe un CSV bloc par bloc, chaque bloc dans sa transaction
+
+        Les blocs déjà validés lors d'une exécution interrompue sont sautés.
+        """
+        done = self.state.get(table, 0)
+        rows = 0
+        start = time.perf_counter()
+
+        for chunk in _chunks(os.path.join(self.directory, f'{table}.csv'), self.chunk_size):
+            if rows + len(chunk) <= done:
+                rows += len(chunk)
+                continue
+            with transaction.atomic():
+                write_chunk(chunk)
+            rows += len(chunk)
+            self.state[table] = rows
+            self._save_state()
+
+        elapsed = time.perf_counter() - start
+        imported = rows - done
+        rate = imported / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(f"✅ {table}: {imported} lignes en {elapsed:.1f}s ({rate:,.0f} lignes/s)")
+
+    def _touch_races(self, race_ids):
+        """
+        Date de modification des courses mises à jour en place
+
+        Les upserts ne changent ni le nombre ni l'id max des lignes : sans
+        cela l'empreinte (prediction_cache.race_fingerprint) ne verrait pas
+        la réimport et servirait des prédictions périmées.
+        """
+        if race_ids:
+            Race.objects.filter(id__in=race_ids).update(updated_at=timezone.now())
+
+    def _id_map(self, queryset, field):
+        return dict(queryset.exclude(**{f'{field}__isnull': True}).values_list(field, 'id'))
+
+    # --- Tables ---
+
+    def _import_circuits(self):
+        def write(chunk):
+            Circuit.objects.bulk_create(
+                [
+                    Circuit(
+                        ergast_ref=row['circuitRef'],
+                        nom=row['name'],
+                        pays=row.get('country') or '',
+                        ville=_value(row, 'location'),
+                        longueur=0,
+                        nombre_tours=0,
+                    )
+                    for row in chunk
+                ],
+                update_conflicts=True,
+                unique_fields=['ergast_ref'],
+                update_fields=['nom', 'pays', 'ville'],
+            )
+        self._stream('circuits', write)
+
+    def _import_drivers(self):
+        today = datetime.date.today()
+
+        def age(row):
+            dob = _value(row, 'dob')
+            try:
+                born = datetime.date.fromisoformat(dob)
+            except (TypeError, ValueError):
+                return 0
+            return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+        def write(chunk):
+            Pilote.objects.bulk_create(
+                [
+                    Pilote(
+                        ergast_ref=row['driverRef'],
+                        nom=f"{row.get('forename', '')} {row.get('surname', '')}".strip(),
+                        equipe='',
+                        nationalite=row.get('nationality') or '',
+                        age=age(row),
+                    )
+                    for row in chunk
+                ],
+                update_conflicts=True,
+                unique_fields=['ergast_ref'],
+                update_fields=['nom', 'nationalite', 'age'],
+            )
+        self._stream('drivers', write)
+
+    def _import_races(self):
+        circuits = {
+            row['circuitId']: row['circuitRef'] for row in self._rows('circuits.csv')
+        } if self._exists('circuits.csv') else {}
+        circuit_ids = self._id_map(Circuit.objects, 'ergast_ref')
+
+        def write(chunk):
+            years = {int(row['year']) for row in chunk}
+            Season.objects.bulk_create(
+                [Season(annee=year, actif=False) for year in years],
+                ignore_conflicts=True,
+            )
+            seasons = dict(Season.objects.filter(annee__in=years).values_list('annee', 'id'))
+
+            races = []
+            for row in chunk:
+                circuit_id = circuit_ids.get(circuits.get(row['circuitId']))
+                if circuit_id is None:
+                    continue
+                races.append(Race(
+                    ergast_id=int(row['raceId']),
+                    nom=row['name'],
+                    season_id=seasons[int(row['year'])],
+                    circuit_id=circuit_id,
+                    date=row['date'],
+                    heure=_value(row, 'time'),
+                    statut='termine',
+                    numero_manche=int(row['round']),
+                ))
+            Race.objects.bulk_create(
+                races,
+                update_conflicts=True,
+                unique_fields=['ergast_id'],
+                update_fields=['nom', 'season', 'circuit', 'date', 'heure', 'numero_manche'],
+            )
+        self._stream('races', write)
+
+    def _driver_ids(self):
+        """driverId Ergast -> id Pilote"""
+        refs = {
+            row['driverId']: row['driverRef'] for row in self._rows('drivers.csv')
+        } if self._exists('drivers.csv') else {}
+        pilots = self._id_map(Pilote.objects, 'ergast_ref')
+        return {driver_id: pilots[ref] for driver_id, ref in refs.items() if ref in pilots}
+
+    def _import_results(self):
+        races = self._id_map(Race.objects, 'ergast_id')
+        drivers = self._driver_ids()
+
+        def write(chunk):
+            results = []
+            for row in chunk:
+                race_id = races.get(int(row['raceId']))
+                pilot_id = drivers.get(row['driverId'])
+                if race_id is None or pilot_id is None:
+                    continue
+                results.append(RaceResult(
+                    race_id=race_id,
+                    pilot_id=pilot_id,
+                    position=_int(row, 'positionOrder', 0),
+                    grid_position=_int(row, 'grid'),
+                    points=_int(row, 'points', 0),
+                    temps_total=_value(row, 'time'),
+                    meilleur_tour=_value(row, 'fastestLapTime'),
+                    tours_completés=_int(row, 'laps', 0),
+                    statut_course=self.status.get(row.get('statusId'), 'Terminé')[:50],
+                    constructor_ref=self.constructors.get(row.get('constructorId'), ('',))[0],
+                ))
+
+            RaceResult.objects.bulk_create(
+                results,
+                update_conflicts=True,
+                unique_fields=['race', 'pilot'],
+                update_fields=[
+                    'position', 'grid_position', 'points', 'temps_total',
+                    'meilleur_tour', 'tours_completés', 'statut_course', 'constructor_ref',
+                ],
+            )
+            self._touch_races({result.race_id for result in results})
+        self._stream('results', write)
+        self._update_current_teams()
+
+    def _update_current_teams(self):
+        """
+        Écurie actuelle de chaque pilote : celle de sa course la plus récente (par date)
+
+        Calculée sur tous les résultats en base, y compris ceux des blocs
+        importés lors d'une exécution précédente interrompue.
+        """
+        names = dict(self.constructors.values())
+        latest = {}
+        current = (
+            RaceResult.objects
+            .exclude(constructor_ref='')
+            .order_by('race__date', 'race_id')
+            .values_list('pilot_id', 'constructor_ref')
+        )
+        for pilot_id, ref in current.iterator(chunk_size=self.chunk_size):
+            latest[pilot_id] = ref
+
+        pilots = Pilote.objects.in_bulk(list(latest))
+        for pilot_id, ref in latest.items():
+            pilots[pilot_id].equipe_ref = ref
+            pilots[pilot_id].equipe = names.get(ref, ref)[:150]
+        Pilote.objects.bulk_update(pilots.values(), ['equipe', 'equipe_ref'], batch_size=1000)
+
+    def _import_lap_times(self):
+        races = self._id_map(Race.objects, 'ergast_id')
+        drivers = self._driver_ids()
+
+        def write(chunk):
+            laps = []
+            for row in chunk:
+                race_id = races.get(int(row['raceId']))
+                pilot_id = drivers.get(row['driverId'])
+                milliseconds = _milliseconds(row, 'milliseconds')
+                if race_id is None or pilot_id is None or milliseconds is None:
+                    continue
+                laps.append(LapTime(race_id=race_id, pilot_id=pilot_id, lap=int(row['lap']), milliseconds=milliseconds))
+            LapTime.objects.bulk_create(
+                laps,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['race', 'pilot', 'lap'],
+                update_fields=['milliseconds'],
+            )
+            self._touch_races({lap.race_id for lap in laps})
+        self._stream('lap_times', write)
+
+    def _import_pit_stops(self):
+        races = self._id_map(Race.objects, 'ergast_id')
+        drivers = self._driver_ids()
+
+        def write(chunk):
+            stops = []
+            for row in chunk:
+                race_id = races.get(int(row['raceId']))
+                pilot_id = drivers.get(row['driverId'])
+                if race_id is None or pilot_id is None:
+                    continue
+                stops.append(PitStop(
+                    race_id=race_id,
+                    pilot_id=pilot_id,
+                    stop=int(row['stop']),
+                    lap=int(row['lap']),
+                    duration_ms=_milliseconds(row, 'milliseconds'),
+                ))
+            PitStop.objects.bulk_create(
+                stops,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['race', 'pilot', 'stop'],
+                update_fields=['lap', 'duration_ms'],
+            )
+            self._touch_races({stop.race_id for stop in stops})
+        self._stream('pit_stops', write)
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pilots', '0001_initial'),
+        ('races', '0002_racestrategy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LapTime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lap', models.PositiveIntegerField(verbose_name='Tour')),
+                ('milliseconds', models.PositiveIntegerField(verbose_name='Temps (ms)')),
+                ('pilot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lap_times', to='pilots.pilote', verbose_name='Pilote')),
+                ('race', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lap_times', to='races.race', verbose_name='Course')),
+            ],
+            options={
+                'verbose_name': 'Temps au tour',
+                'verbose_name_plural': 'Temps au tour',
+                'ordering': ['race', 'pilot', 'lap'],
+                'indexes': [models.Index(fields=['race', 'pilot', 'lap'], name='laptime_race_pilot_lap_idx')],
+                'constraints': [models.UniqueConstraint(fields=('race', 'pilot', 'lap'), name='unique_lap_time')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PitStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stop', models.PositiveIntegerField(verbose_name="Numéro d'arrêt")),
+                ('lap', models.PositiveIntegerField(verbose_name='Tour')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Durée (ms)')),
+                ('pilot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pit_stops', to='pilots.pilote', verbose_name='Pilote')),
+                ('race', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pit_stops', to='races.race', verbose_name='Course')),
+            ],
+            options={
+                'verbose_name': 'Arrêt au stand',
+                'verbose_name_plural': 'Arrêts au stand',
+                'ordering': ['race', 'pilot', 'stop'],
+                'indexes': [models.Index(fields=['race', 'pilot', 'lap'], name='pitstop_race_pilot_lap_idx')],
+                'constraints': [models.UniqueConstraint(fields=('race', 'pilot', 'stop'), name='unique_pit_stop')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('races', '0003_laptime_pitstop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='race',
+            name='ergast_id',
+            field=models.PositiveIntegerField(blank=True, null=True, unique=True, verbose_name='Identifiant Ergast'),
+        ),
+        migrations.AddField(
+            model_name='raceresult',
+            name='grid_position',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Position de départ'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('races', '0004_ergast_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='raceresult',
+            name='constructor_ref',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Écurie (constructorRef Ergast)'),
+        ),
+    ]
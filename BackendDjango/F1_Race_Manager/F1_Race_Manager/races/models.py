@@ -41,6 +41,7 @@ class Race(models.Model):
     meteo = models.CharField(max_length=20, choices=METEO_CHOICES, default='ensoleille', verbose_name="Météo")
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='planifie', verbose_name="Statut")
     numero_manche = models.PositiveIntegerField(verbose_name="Numéro de manche", help_text="Position dans le calendrier")
+    ergast_id = models.PositiveIntegerField(unique=True, blank=True, null=True, verbose_name="Identifiant Ergast")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -129,6 +130,7 @@ class RaceResult(models.Model):
     race = models.ForeignKey(Race, on_delete=models.CASCADE, related_name='results', verbose_name="Course")
     pilot = models.ForeignKey(Pilote, on_delete=models.CASCADE, related_name='race_results', verbose_name="Pilote")
     position = models.PositiveIntegerField(verbose_name="Position finale")
+    grid_position = models.PositiveIntegerField(blank=True, null=True, verbose_name="Position de départ")
     points = models.PositiveIntegerField(default=0, verbose_name="Points marqués")
     temps_total = models.CharField(max_length=20, blank=True, null=True, verbose_name="Temps total")
     meilleur_tour = models.CharField(max_length=20, blank=True, null=True, verbose_name="Meilleur tour")
@@ -139,6 +141,7 @@ class RaceResult(models.Model):
         verbose_name="Statut",
         help_text="Terminé, Abandon, DNF, etc."
     )
+    constructor_ref = models.CharField(max_length=100, blank=True, default='', verbose_name="Écurie (constructorRef Ergast)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -179,4 +182,48 @@ class Championship(models.Model):
         unique_together = ['season', 'pilot']
     
     def __str__(self):
-        return f"{self.pilot.nom} - Saison {self.season.annee} (P{self.position})"
\ No newline at end of file
+        return f"{self.pilot.nom} - Saison {self.season.annee} (P{self.position})"
+
+class LapTime(models.Model):
+    """Temps au tour d'un pilote"""
+    race = models.ForeignKey(Race, on_delete=models.CASCADE, related_name='lap_times', verbose_name="Course")
+    pilot = models.ForeignKey(Pilote, on_delete=models.CASCADE, related_name='lap_times', verbose_name="Pilote")
+    lap = models.PositiveIntegerField(verbose_name="Tour")
+    milliseconds = models.PositiveIntegerField(verbose_name="Temps (ms)")
+    
+    class Meta:
+        verbose_name = "Temps au tour"
+        verbose_name_plural = "Temps au tour"
+        ordering = ['race', 'pilot', 'lap']
+        constraints = [
+            models.UniqueConstraint(fields=['race', 'pilot', 'lap'], name='unique_lap_time'),
+        ]
+        indexes = [
+            models.Index(fields=['race', 'pilot', 'lap'], name='laptime_race_pilot_lap_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pilot.nom} - {self.race.nom} (tour {self.lap}: {self.milliseconds} ms)"
+
+
+class PitStop(models.Model):
+    """Arrêt au stand d'un pilote"""
+    race = models.ForeignKey(Race, on_delete=models.CASCADE, related_name='pit_stops', verbose_name="Course")
+    pilot = models.ForeignKey(Pilote, on_delete=models.CASCADE, related_name='pit_stops', verbose_name="Pilote")
+    stop = models.PositiveIntegerField(verbose_name="Numéro d'arrêt")
+    lap = models.PositiveIntegerField(verbose_name="Tour")
+    duration_ms = models.PositiveIntegerField(blank=True, null=True, verbose_name="Durée (ms)")
+    
+    class Meta:
+        verbose_name = "Arrêt au stand"
+        verbose_name_plural = "Arrêts au stand"
+        ordering = ['race', 'pilot', 'stop']
+        constraints = [
+            models.UniqueConstraint(fields=['race', 'pilot', 'stop'], name='unique_pit_stop'),
+        ]
+        indexes = [
+            models.Index(fields=['race', 'pilot', 'lap'], name='pitstop_race_pilot_lap_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pilot.nom} - {self.race.nom} (arrêt {self.stop}, tour {self.lap})"
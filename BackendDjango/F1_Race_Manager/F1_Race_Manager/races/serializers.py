@@ -41,7 +41,7 @@ class RaceResultSerializer(serializers.ModelSerializer):
         model = RaceResult
         fields = [
             'id', 'race', 'pilot', 'pilot_nom', 'pilot_prenom', 'pilot_numero',
-            'position', 'points', 'temps_total', 'meilleur_tour',
+            'position', 'grid_position', 'points', 'temps_total', 'meilleur_tour',
             'tours_completés', 'statut_course', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'points', 'created_at', 'updated_at']
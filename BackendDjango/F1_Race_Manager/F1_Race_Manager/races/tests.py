@@ -1,3 +1,161 @@
+import datetime
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from circuits.models import Circuit
+from pilots.models import Pilote
+
+from .models import LapTime, PitStop, Race, RaceResult, Season
+
+
+class IngestLapsTests(TestCase):
+
+    def setUp(self):
+        season = Season.objects.create(annee=2023)
+        circuit = Circuit.objects.create(nom='Monaco', pays='Monaco', longueur=Decimal('3.337'), nombre_tours=78)
+        self.race = Race.objects.create(nom='Grand Prix de Monaco', season=season, circuit=circuit,
+                                        date=datetime.date(2023, 5, 28), numero_manche=7)
+        self.pilot = Pilote.objects.create(nom='Max Verstappen', equipe='Red Bull', nationalite='Néerlandaise', age=25)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('ingest'))
+        self.url = f'/api/races/{self.race.id}/ingest_laps/'
+
+    def test_upsert(self):
+        body = {
+            'laps': [{'pilot': self.pilot.id, 'lap': lap, 'milliseconds': 78000 + lap} for lap in (1, 2, 3)],
+            'pit_stops': [{'pilot': self.pilot.id, 'stop': 1, 'lap': 2, 'duration_ms': 2300}],
+        }
+        response = self.client.post(self.url, body, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'laps': 3, 'pit_stops': 1})
+
+        updated_at = Race.objects.get(id=self.race.id).updated_at
+        body = {
+            'laps': [{'pilot': self.pilot.id, 'lap': 2, 'milliseconds': 90000}],
+            'pit_stops': [{'pilot': self.pilot.id, 'stop': 1, 'lap': 3, 'duration_ms': None}],
+        }
+        self.assertEqual(self.client.post(self.url, body, format='json').status_code, 201)
+
+        self.assertEqual(
+            list(LapTime.objects.filter(race=self.race).order_by('lap').values_list('lap', 'milliseconds')),
+            [(1, 78001), (2, 90000), (3, 78003)],
+        )
+        self.assertEqual(list(PitStop.objects.filter(race=self.race).values_list('lap', 'duration_ms')), [(3, None)])
+        self.assertGreater(Race.objects.get(id=self.race.id).updated_at, updated_at)
+
+    def test_invalid_bodies(self):
+        for body in (
+            {'laps': [{'pilot': self.pilot.id, 'lap': 1}]},
+            {'laps': [{'pilot': self.pilot.id, 'lap': 'un', 'milliseconds': 78000}]},
+            [{'pilot': self.pilot.id, 'lap': 1, 'milliseconds': 78000}],
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(self.url, body, format='json').status_code, 400)
+        self.assertFalse(LapTime.objects.exists())
+
+
+class ImportErgastTests(TestCase):
+
+    # raceId 2 court avant raceId 1 : l'écurie actuelle se décide par date, pas par id
+    CSV = {
+        'circuits.csv': 'circuitId,circuitRef,name,location,country\n'
+                        '1,monaco,Circuit de Monaco,Monte-Carlo,Monaco\n2,spa,Spa-Francorchamps,Spa,Belgium\n',
+        'drivers.csv': 'driverId,driverRef,forename,surname,dob,nationality\n'
+                       '1,hamilton,Lewis,Hamilton,1985-01-07,British\n2,max_verstappen,Max,Verstappen,\\N,Dutch\n',
+        'constructors.csv': 'constructorId,constructorRef,name\n1,mercedes,Mercedes\n2,ferrari,Ferrari\n3,red_bull,Red Bull\n',
+        'status.csv': 'statusId,status\n1,Finished\n2,Engine\n',
+        'races.csv': 'raceId,year,round,circuitId,name,date,time\n'
+                     '1,2025,8,1,Monaco Grand Prix,2025-05-25,13:00:00\n'
+                     '2,2024,13,2,Belgian Grand Prix,2024-07-28,\\N\n',
+        'results.csv': 'resultId,raceId,driverId,constructorId,grid,positionOrder,points,laps,time,fastestLapTime,statusId\n'
+                       '1,1,1,2,3,1,25,78,1:40:33.843,1:14.165,1\n'
+                       '2,1,2,3,0,2,18,78,\\N,\\N,1\n'
+                       '3,2,1,1,1,1,25,44,1:19:57.566,\\N,1\n'
+                       '4,2,2,3,\\N,20,0,12,\\N,\\N,2\n',
+        'lap_times.csv': 'raceId,driverId,lap,position,time,milliseconds\n'
+                         '1,1,1,1,1:18.000,78000\n1,1,2,1,1:17.500,77500\n'
+                         '1,2,1,2,1:18.500,"78,500"\n1,2,2,2,1:17.000,23.227.199\n1,9,1,9,1:20.000,80000\n',
+        'pit_stops.csv': 'raceId,driverId,stop,lap,time,duration,milliseconds\n1,1,1,30,14:05:00,22.1,22100\n',
+    }
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.directory = self._tmp.name
+        for name, text in self.CSV.items():
+            self._write(name, text)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _import(self, *args):
+        call_command('import_ergast', self.directory, *args, stdout=StringIO())
+
+    def test_full_import(self):
+        self._import('--chunk-size', '2')
+
+        self.assertEqual(Circuit.objects.count(), 2)
+        self.assertEqual(Race.objects.count(), 2)
+        self.assertEqual(list(Season.objects.order_by('annee').values_list('annee', flat=True)), [2024, 2025])
+        self.assertIsNone(Race.objects.get(ergast_id=2).heure)
+
+        results = {
+            (r.race.ergast_id, r.pilot.ergast_ref): r
+            for r in RaceResult.objects.select_related('race', 'pilot')
+        }
+        self.assertEqual(
+            {key: r.constructor_ref for key, r in results.items()},
+            {(1, 'hamilton'): 'ferrari', (1, 'max_verstappen'): 'red_bull',
+             (2, 'hamilton'): 'mercedes', (2, 'max_verstappen'): 'red_bull'},
+        )
+        self.assertIsNone(results[(2, 'max_verstappen')].grid_position)
+        self.assertEqual(results[(2, 'max_verstappen')].statut_course, 'Engine')
+
+        # Écurie de la course la plus récente (2025) malgré un raceId plus petit
+        hamilton = Pilote.objects.get(ergast_ref='hamilton')
+        self.assertEqual((hamilton.equipe_ref, hamilton.equipe), ('ferrari', 'Ferrari'))
+        self.assertEqual(Pilote.objects.get(ergast_ref='max_verstappen').age, 0)
+
+        # Millisecondes mal formées nettoyées, pilote inconnu ignoré
+        self.assertEqual(
+            sorted(LapTime.objects.values_list('pilot__ergast_ref', 'lap', 'milliseconds')),
+            [('hamilton', 1, 78000), ('hamilton', 2, 77500), ('max_verstappen', 1, 78500), ('max_verstappen', 2, 23227199)],
+        )
+        self.assertEqual(PitStop.objects.get().duration_ms, 22100)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, '.import_ergast_state.json')))
+
+    def test_reimport_updates_in_place_and_bumps_race(self):
+        self._import()
+        race = Race.objects.get(ergast_id=1)
+        updated_at = race.updated_at
+
+        self._write('results.csv', self.CSV['results.csv'].replace('1,1,1,2,3,1,25', '1,1,1,2,3,2,18'))
+        self._import('--only', 'results')
+
+        self.assertEqual(RaceResult.objects.count(), 4)
+        self.assertEqual(RaceResult.objects.get(race=race, pilot__ergast_ref='hamilton').position, 2)
+        race.refresh_from_db()
+        self.assertGreater(race.updated_at, updated_at)
+
+    def test_resume_skips_committed_chunks(self):
+        self._import('--only', 'circuits', 'drivers', 'races')
+        with open(os.path.join(self.directory, '.import_ergast_state.json'), 'w') as f:
+            json.dump({'lap_times': 2}, f)
+
+        self._import('--only', 'lap_times', '--chunk-size', '2')
+        self.assertEqual(LapTime.objects.filter(pilot__ergast_ref='hamilton').count(), 0)
+        self.assertEqual(LapTime.objects.count(), 2)
 
-# Create your tests here.
+        with open(os.path.join(self.directory, '.import_ergast_state.json'), 'w') as f:
+            json.dump({'lap_times': 2}, f)
+        self._import('--only', 'lap_times', '--restart')
+        self.assertEqual(LapTime.objects.count(), 4)
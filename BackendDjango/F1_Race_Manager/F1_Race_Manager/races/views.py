@@ -3,8 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Sum, Count, Q
-from .models import Season, Race, RaceResult, Championship, RaceStrategy
+from .models import Season, Race, RaceResult, Championship, RaceStrategy, LapTime, PitStop
 from .serializers import (
     SeasonSerializer, RaceSerializer, RaceListSerializer,
     RaceResultSerializer, ChampionshipSerializer, RaceStrategySerializer
@@ -76,6 +77,68 @@ class RaceViewSet(viewsets.ModelViewSet):
         serializer = RaceResultSerializer(results, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'])
+    def ingest_laps(self, request, pk=None):
+        """
+        Import en masse des temps au tour et arrêts au stand d'une course
+        
+        Body: {
+            'laps': [{'pilot': id, 'lap': n, 'milliseconds': ms}, ...],
+            'pit_stops': [{'pilot': id, 'stop': n, 'lap': n, 'duration_ms': ms}, ...]
+        }
+        Les lignes existantes (même course, pilote, tour/arrêt) sont mises à jour.
+        """
+        race = self.get_object()
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Objet JSON attendu'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            laps = [
+                LapTime(
+                    race=race,
+                    pilot_id=int(row['pilot']),
+                    lap=int(row['lap']),
+                    milliseconds=int(row['milliseconds'])
+                )
+                for row in request.data.get('laps', [])
+            ]
+            pit_stops = [
+                PitStop(
+                    race=race,
+                    pilot_id=int(row['pilot']),
+                    stop=int(row['stop']),
+                    lap=int(row['lap']),
+                    duration_ms=int(row['duration_ms']) if row.get('duration_ms') is not None else None
+                )
+                for row in request.data.get('pit_stops', [])
+            ]
+        except (KeyError, TypeError, ValueError) as e:
+            return Response({'error': f'Ligne invalide: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Une seule transaction, INSERT multi-lignes par lots
+        with transaction.atomic():
+            LapTime.objects.bulk_create(
+                laps,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['race', 'pilot', 'lap'],
+                update_fields=['milliseconds']
+            )
+            PitStop.objects.bulk_create(
+                pit_stops,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['race', 'pilot', 'stop'],
+                update_fields=['lap', 'duration_ms']
+            )
+            # Marque la course comme modifiée (empreinte du cache des prédictions)
+            race.save(update_fields=['updated_at'])
+        
+        return Response(
+            {'laps': len(laps), 'pit_stops': len(pit_stops)},
+            status=status.HTTP_201_CREATED
+        )
+    
     def _update_championship(self, season):
         """Met à jour le classement du championnat"""
         # Récupérer tous les résultats de la saison